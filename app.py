@@ -14,9 +14,16 @@ from contextlib import contextmanager
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
-from src.data_processor import DataProcessor
-from src.analyzer import Analyzer
-from src.report_generator import PDFReportGenerator
+# Exporters and the PDF generator pull in openpyxl/reportlab, so they are
+# imported inside the functions that use them to keep cold starts fast
+from src import instrumentation
+from src.pipeline import (PipelineResult, precheck_pipeline, run_pipeline, persist_upload, content_hash,
+                          grading_config_key)
+from src.result_query import QueryError, VIRTUAL_COLUMNS
+from src.dataset_store import get_store
+
+# Rows shown in upload previews; the full data is browsed page by page
+PREVIEW_ROWS = 100
 
 # Configure page
 st.set_page_config(
@@ -112,10 +119,12 @@ if 'processor' not in st.session_state:
     st.session_state.processor = None
 if 'analyzer' not in st.session_state:
     st.session_state.analyzer = None
-if 'charts' not in st.session_state:
-    st.session_state.charts = {}
+if 'pipeline' not in st.session_state:
+    st.session_state.pipeline = None
 if 'file_uploaded' not in st.session_state:
     st.session_state.file_uploaded = False
+if 'exports' not in st.session_state:
+    st.session_state.exports = {}
 
 
 def main():
@@ -137,6 +146,48 @@ def main():
         with glass_card("Generate Report", "Create and download a professional PDF report", icon="📄"):
             report_page()
 
+    diagnostics_panel()
+
+
+def diagnostics_panel():
+    """Optional sidebar panel showing per-stage timing and memory spans"""
+    with st.sidebar:
+        st.markdown('<div class="subheader-style">🩺 Diagnostics</div>', unsafe_allow_html=True)
+
+        store = get_store().metrics()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Datasets in memory", f"{store['resident_bytes'] / 1024 ** 2:.1f} MB",
+                      help=f"{store['entries']} datasets, {store['references']} session references, "
+                           f"budget {store['budget_bytes'] / 1024 ** 2:.0f} MB, {store['evictions']} evicted")
+        with col2:
+            st.metric("Dataset hit rate", f"{store['hit_rate']:.0%}",
+                      help=f"{store['hits']} hits, {store['misses']} misses")
+
+        # Tracing is a server setting: it covers every session and adds memory-tracing overhead to all of them
+        if not instrumentation.is_enabled():
+            st.caption("Stage timings are off. Start the server with RESULT_SYSTEM_TRACE=1 to record them.")
+            return
+        st.caption("Stage timings of every session on this server. Peak memory is only "
+                   "recorded while a single session is busy.")
+
+        spans = instrumentation.recent_spans(limit=200)
+        if not spans:
+            st.caption("No spans yet. Upload a new file or generate a report to record them.")
+            return
+
+        spans_df = pd.DataFrame(spans)
+        columns = [col for col in ['span', 'wall_s', 'cpu_s', 'peak_memory_bytes', 'parent', 'thread']
+                   if col in spans_df.columns]
+        st.dataframe(spans_df[columns].iloc[::-1], use_container_width=True)
+
+        totals = spans_df[spans_df['parent'].isna()].groupby('span')['wall_s'].sum().sort_values(ascending=False)
+        st.bar_chart(totals)
+
+        if st.button("🧹 Clear spans", key="clear_spans"):
+            instrumentation.clear()
+            st.rerun()
+
 
 def upload_and_validate_page():
     """File upload and data validation page"""
@@ -158,77 +209,152 @@ def upload_and_validate_page():
                 create_sample_excel()
                 st.success("Sample file created in /data/sample_marks.xlsx")
 
-        # File uploader
-        uploaded_file = st.file_uploader(
-            "Choose an Excel file",
+        # File uploader (several files, e.g. one per section, are merged into one cohort)
+        uploaded_files = st.file_uploader(
+            "Choose Excel files",
             type=['xlsx'],
-            help="Upload an Excel file with student marks"
+            accept_multiple_files=True,
+            help="Upload one or more Excel files with student marks"
         )
     
-        if uploaded_file is not None:
-            # Save uploaded file temporarily
-            temp_file_path = os.path.join("data", uploaded_file.name)
-            os.makedirs("data", exist_ok=True)
+        if uploaded_files:
+            st.success(f"✅ File uploaded: {', '.join(f.name for f in uploaded_files)}")
 
-            with open(temp_file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
+            # Load, validate and grade once per distinct upload and grading config
+            result = get_pipeline_result(uploaded_files)
 
-            st.success(f"✅ File uploaded: {uploaded_file.name}")
+            # Drop charts and exports that belong to a previous upload
+            if st.session_state.get("upload_key") != result.key:
+                st.session_state.upload_key = result.key
+                st.session_state.exports = {}
+                st.session_state.bundles = []
 
-            # Initialize processor and load file
-            processor = DataProcessor()
-            success, message = processor.load_excel(temp_file_path)
+            if st.button("💾 Save a copy of this upload", key="persist_upload"):
+                for uploaded_file in uploaded_files:
+                    saved_path = persist_upload(uploaded_file.getvalue(), uploaded_file.name, result.key)
+                    st.info(f"📍 Upload saved at: {saved_path}")
 
-            if success:
-                st.session_state.processor = processor
-                st.session_state.file_uploaded = True
+            st.session_state.pipeline = result
+            st.session_state.processor = result.processor
+            st.session_state.file_uploaded = result.ok
+            st.session_state.analyzer = result.analyzer if result.ok else None
 
+            if result.loaded:
                 # Display loaded data
                 st.markdown('<div class="subheader-style">Loaded Data Preview</div>', unsafe_allow_html=True)
-                st.dataframe(processor.df, use_container_width=True)
+                st.dataframe(result.raw_df.head(PREVIEW_ROWS), use_container_width=True)
+                if len(result.raw_df) > PREVIEW_ROWS:
+                    st.caption(f"Showing first {PREVIEW_ROWS} of {len(result.raw_df)} rows")
 
                 # Validate data
                 st.markdown('<div class="subheader-style">Data Validation</div>', unsafe_allow_html=True)
 
-                is_valid, errors = processor.validate_data()
-
-                if is_valid:
+                if result.is_valid:
                     st.success("✅ Data validation passed! All records are valid.")
-
-                    # Calculate grades
-                    st.info("🔄 Processing data and calculating grades...")
-                    df_processed = processor.calculate_grades()
                     st.success("✅ Grades calculated successfully!")
+                    df_processed = result.df
 
                     # Display processed data
                     st.markdown('<div class="subheader-style">Processed Results</div>', unsafe_allow_html=True)
 
                     # Create columns for display
                     display_cols = ['Student_Name', 'Roll_No', 'Average', 'Grade', 'GPA', 'Status']
-                    st.dataframe(df_processed[display_cols], use_container_width=True)
+                    st.dataframe(df_processed[display_cols].head(PREVIEW_ROWS), use_container_width=True)
 
                     # Summary statistics
                     st.markdown('<div class="subheader-style">Quick Summary</div>', unsafe_allow_html=True)
 
+                    stats = result.statistics
                     col1, col2, col3, col4 = st.columns(4)
                     with col1:
-                        st.metric("Total Students", len(df_processed))
+                        st.metric("Total Students", int(stats['Total Students']))
                     with col2:
-                        pass_count = len(df_processed[df_processed['Status'] == 'PASS'])
-                        st.metric("Pass Count", pass_count)
+                        st.metric("Pass Count", int(stats['Pass Count']))
                     with col3:
-                        fail_count = len(df_processed[df_processed['Status'] == 'FAIL'])
-                        st.metric("Fail Count", fail_count)
+                        st.metric("Fail Count", int(stats['Fail Count']))
                     with col4:
-                        class_avg = df_processed['Average'].mean()
-                        st.metric("Class Average", f"{class_avg:.2f}")
+                        st.metric("Class Average", f"{stats['Class Average']:.2f}")
+
+                    anomaly_view(result)
 
                 else:
                     st.error("❌ Data validation failed! Please fix the following errors:")
-                    for error in errors:
+                    for error in result.errors:
                         st.error(f"  • {error}")
             else:
-                st.error(f"❌ Error loading file: {message}")
+                st.error(f"❌ Error loading file: {result.message}")
+
+
+def anomaly_view(result: PipelineResult):
+    """Suspicious marks patterns flagged for the moderation committee"""
+    st.markdown('<div class="subheader-style">Moderation Checks</div>', unsafe_allow_html=True)
+    flags = result.anomalies
+    if flags.empty:
+        st.success("✅ No suspicious marks patterns found.")
+        return
+
+    counts = flags['Check'].value_counts()
+    st.warning("⚠️ Flagged for review: " + ", ".join(f"{check} ({count})" for check, count in counts.items()))
+    st.dataframe(flags.head(PREVIEW_ROWS), use_container_width=True)
+    if len(flags) > PREVIEW_ROWS:
+        st.caption(f"Showing the {PREVIEW_ROWS} most severe of {len(flags)} flags")
+
+    lazy_download_button(
+        "📥 Download flags (CSV)", "anomalies_csv",
+        lambda: flags.to_csv(index=False).encode('utf-8'),
+        "moderation_flags.csv", "text/csv"
+    )
+
+
+def get_pipeline_result(uploaded_files) -> PipelineResult:
+    """Return the processed result for an upload, hashing each file's contents once per upload"""
+    hashes = st.session_state.setdefault("upload_hashes", {})
+    file_hashes = []
+    for uploaded_file in uploaded_files:
+        upload_id = getattr(uploaded_file, "file_id", None) or uploaded_file.name
+        if upload_id not in hashes:
+            hashes[upload_id] = content_hash(uploaded_file.getvalue())
+        file_hashes.append(hashes[upload_id])
+
+    # A single file keeps its own hash; merged files are keyed by their hashes in upload order
+    upload_hash = file_hashes[0] if len(file_hashes) == 1 else content_hash("".join(file_hashes).encode())
+    key = f"{upload_hash}:{grading_config_key()}"
+
+    def source():
+        # Uploads are parsed straight from memory and never written to shared disk
+        if len(uploaded_files) == 1:
+            return uploaded_files[0].getvalue()
+        return [(f.name, f.getvalue()) for f in uploaded_files]
+
+    # Sessions opening the same upload share one dataset from the process-wide
+    # store; the handle keeps it resident until this session moves on or ends
+    handle = st.session_state.get("dataset_handle")
+    if handle is None or handle.key != key:
+        processor = None
+        if not get_store().contains(key):
+            # Quick check of the header and first rows before the full load,
+            # so broken files are rejected at once
+            checked = st.session_state.get("precheck")
+            if checked is None or checked[0] != key:
+                checked = (key, *precheck_pipeline(source(), key))
+                st.session_state.precheck = checked
+            _, processor, sample_errors, rejected = checked
+            if rejected is not None:
+                return rejected
+            if sample_errors:
+                st.warning(f"⚠️ Quick check found {len(sample_errors)} problem(s) in the first rows; "
+                           "validating the full file...")
+            else:
+                st.info("⚡ Quick check passed; validating the full file...")
+
+        with st.spinner("🔄 Processing data and calculating grades..."):
+            new_handle = get_store().acquire(key, lambda: run_pipeline(source(), key=key, processor=processor))
+        st.session_state.pop("precheck", None)
+        if handle is not None:
+            handle.release()
+        st.session_state.dataset_handle = handle = new_handle
+
+    return handle.value
 
 
 def analysis_page():
@@ -239,15 +365,11 @@ def analysis_page():
         st.warning("⚠️ Please upload and validate a file first on the 'Upload & Validate' page.")
         return
 
-    processor = st.session_state.processor
-    df = processor.get_processed_data()
-
-    # Initialize analyzer
-    analyzer = Analyzer(df)
-    st.session_state.analyzer = analyzer
+    result = st.session_state.pipeline
+    df = result.df
 
     # Overall Statistics - styled metric cards
-    stats = analyzer.get_statistics()
+    stats = result.statistics
 
     with glass_card("Overall Statistics", "High level class metrics", icon="✨"):
         cols = st.columns(4, gap='large')
@@ -287,8 +409,10 @@ def analysis_page():
     # Top Performers Tab
     with tab1:
         with glass_card("Top 10 Performers", "Top students by average score", icon="🏅"):
-            toppers = analyzer.get_toppers(top_n=10)
+            toppers = result.toppers(top_n=10)
             st.dataframe(toppers, use_container_width=True)
+        with glass_card("Merit List", "Rank every student with tie-breaking rules and export the list", icon="🏆"):
+            merit_list_view(result)
 
     # Subject Analysis Tab
     with tab2:
@@ -296,7 +420,7 @@ def analysis_page():
             col1, col2 = st.columns(2)
             with col1:
                 st.markdown('<div class="subheader-style">Strong Subjects</div>', unsafe_allow_html=True)
-                strong = analyzer.get_strong_subjects()
+                strong = result.strong_subjects
                 strong_df = pd.DataFrame([
                     {'Subject': k, 'Average Marks': f"{v:.2f}"}
                     for k, v in list(strong.items())[:5]
@@ -305,72 +429,322 @@ def analysis_page():
 
             with col2:
                 st.markdown('<div class="subheader-style">Weak Subjects</div>', unsafe_allow_html=True)
-                weak = analyzer.get_weak_subjects()
+                weak = result.weak_subjects
                 weak_df = pd.DataFrame([
                     {'Subject': k, 'Average Marks': f"{v:.2f}"}
                     for k, v in list(weak.items())[:5]
                 ])
                 st.dataframe(weak_df, use_container_width=True)
 
+        with glass_card("Relative Standing", "Percentile ranks and z-scores within this cohort", icon="📐"):
+            relative_standing_view(result)
+
     # Charts & Visualizations Tab
     with tab3:
         with glass_card("Charts & Visualizations", "Interactive charts and distributions", icon="📈"):
-            if not st.session_state.charts:
-                with st.spinner("🔄 Generating visualization charts..."):
-                    charts = analyzer.generate_all_charts()
-                    st.session_state.charts = charts
-
-            charts = st.session_state.charts
-            # Display charts in responsive grid
-            rcol1, rcol2 = st.columns(2)
-            with rcol1:
-                if 'grade_distribution' in charts:
-                    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-                    st.image(charts['grade_distribution'], caption="Grade Distribution", use_column_width=True)
-                    st.markdown("</div>", unsafe_allow_html=True)
-                if 'average_distribution' in charts:
-                    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-                    st.image(charts['average_distribution'], caption="Average Marks Distribution", use_column_width=True)
-                    st.markdown("</div>", unsafe_allow_html=True)
-
-            with rcol2:
-                if 'pass_fail_distribution' in charts:
-                    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-                    st.image(charts['pass_fail_distribution'], caption="Pass/Fail Distribution", use_column_width=True)
-                    st.markdown("</div>", unsafe_allow_html=True)
-                if 'gpa_distribution' in charts:
-                    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-                    st.image(charts['gpa_distribution'], caption="GPA Distribution", use_column_width=True)
-                    st.markdown("</div>", unsafe_allow_html=True)
-
-            if 'subject_performance' in charts:
-                st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-                st.image(charts['subject_performance'], caption="Subject-wise Performance", use_column_width=True)
-                st.markdown("</div>", unsafe_allow_html=True)
+            interactive = st.toggle(
+                "Interactive charts", value=True, key="interactive_charts",
+                help="Drawn in the browser from per-bar counts, so they load instantly and can be zoomed. "
+                     "Turn off to see the static images used in the PDF report."
+            )
+            if interactive:
+                interactive_charts_view(result)
+            else:
+                static_charts_view(result)
 
     # Full Student Data Tab
     with tab4:
+        with glass_card("Find a Student", "Look up one student's full record by roll number", icon="🔎"):
+            student_lookup_view(result)
         with glass_card("Complete Student Records", "Filter and export full student data", icon="📋"):
-            filter_status = st.selectbox(
-                "Filter by Status:",
-                ["All", "PASS", "FAIL"]
-            )
+            student_table_view(result)
+
+
+def interactive_charts_view(result: PipelineResult):
+    """Charts drawn by the browser from pre-aggregated counts; no images are rendered"""
+    data = result.chart_data
+    stats = result.statistics
+
+    rcol1, rcol2 = st.columns(2)
+    with rcol1:
+        st.markdown("**Grade Distribution**")
+        st.bar_chart(data['grade_distribution'], y='Students', sort=False)
+        st.markdown("**Average Marks Distribution**")
+        st.bar_chart(data['average_distribution'], y='Students')
+        st.caption(f"Class average: {stats['Class Average']:.2f}")
+
+    with rcol2:
+        st.markdown("**Pass/Fail Distribution**")
+        st.bar_chart(data['pass_fail_distribution'], y='Students', sort=False)
+        st.caption(f"Pass rate: {stats['Pass %']:.1f}%")
+        st.markdown("**GPA Distribution**")
+        st.bar_chart(data['gpa_distribution'], y='Students', horizontal=True, sort=False)
+
+    st.markdown("**Subject-wise Performance**")
+    st.bar_chart(data['subject_performance'], stack=False, sort=False)
+
+
+def static_charts_view(result: PipelineResult):
+    """Chart images rendered with matplotlib (the ones embedded in the PDF report)"""
+    with st.spinner("🔄 Generating visualization charts..."):
+        charts = result.charts()
+
+    # Display charts in responsive grid
+    rcol1, rcol2 = st.columns(2)
+    with rcol1:
+        if 'grade_distribution' in charts:
+            st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+            st.image(charts['grade_distribution'], caption="Grade Distribution", use_column_width=True)
+            st.markdown("</div>", unsafe_allow_html=True)
+        if 'average_distribution' in charts:
+            st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+            st.image(charts['average_distribution'], caption="Average Marks Distribution", use_column_width=True)
+            st.markdown("</div>", unsafe_allow_html=True)
+
+    with rcol2:
+        if 'pass_fail_distribution' in charts:
+            st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+            st.image(charts['pass_fail_distribution'], caption="Pass/Fail Distribution", use_column_width=True)
+            st.markdown("</div>", unsafe_allow_html=True)
+        if 'gpa_distribution' in charts:
+            st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+            st.image(charts['gpa_distribution'], caption="GPA Distribution", use_column_width=True)
+            st.markdown("</div>", unsafe_allow_html=True)
+
+    if 'subject_performance' in charts:
+        st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+        st.image(charts['subject_performance'], caption="Subject-wise Performance", use_column_width=True)
+        st.markdown("</div>", unsafe_allow_html=True)
 
-            if filter_status == "All":
-                display_df = df
-            else:
-                display_df = df[df['Status'] == filter_status]
 
-            st.dataframe(display_df, use_container_width=True)
+def relative_standing_view(result: PipelineResult):
+    """Percentile ranks and z-scores per subject and overall, computed on request"""
+    relative = result.processor.policy.relative
+    if relative:
+        st.caption(f"Grades are curved by {relative['method']} of the average: " +
+                   ", ".join(f"{band['grade']} ≥ {band['min']:g}" for band in relative['bands']))
+    else:
+        st.caption("Grades use absolute cutoffs; ranks below are for reference.")
 
-            # Download CSV option
-            csv = display_df.to_csv(index=False)
-            st.download_button(
-                label="📥 Download as CSV",
-                data=csv,
-                file_name="exam_results.csv",
-                mime="text/csv"
-            )
+    if not st.checkbox("Show percentile ranks and z-scores", key="show_relative_ranks"):
+        return
+
+    with st.spinner("🔄 Ranking students..."):
+        ranks = result.relative_ranks()
+    top = ranks.sort_values('Overall Percentile', ascending=False, kind='stable').head(PREVIEW_ROWS)
+    st.dataframe(top, use_container_width=True)
+    if len(ranks) > PREVIEW_ROWS:
+        st.caption(f"Showing top {PREVIEW_ROWS} of {len(ranks)} students")
+
+    lazy_download_button(
+        "📥 Download ranks (CSV)", "relative_ranks_csv",
+        lambda: ranks.to_csv(index=False).encode('utf-8'),
+        "relative_ranks.csv", "text/csv"
+    )
+
+
+def merit_list_view(result: PipelineResult):
+    """Ranked list with configurable tie-breaking; one page is shown and exports are streamed"""
+    from src.merit_list import PDF_ROWS_PER_VOLUME, TIE_RULES
+
+    subject_cols = result.processor.get_subject_columns()
+    identity = result.processor.get_results_model().identity
+
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        priority = st.multiselect(
+            "Subject priority for ties:", subject_cols, key="merit_priority",
+            help="Students with the same Average and GPA are ordered by these subjects' marks, in this order"
+        )
+    with col2:
+        tie_rule = st.selectbox(
+            "Tie rule:", TIE_RULES, key="merit_tie_rule",
+            help="competition: 1, 2, 2, 4 · dense: 1, 2, 2, 3 · ordinal: 1, 2, 3, 4 (roll number decides)"
+        )
+
+    filters = {}
+    col1, col2 = st.columns(2)
+    if 'Section' in identity.columns:
+        with col1:
+            sections = sorted(identity['Section'].dropna().unique().tolist())
+            filters['Section'] = st.multiselect("Sections:", sections, key="merit_sections")
+    with col2:
+        filters['Status'] = st.multiselect("Status:", ["PASS", "FAIL"], key="merit_status")
+
+    merit = result.merit_list(tuple(priority), tie_rule, filters)
+    st.caption(merit.describe())
+
+    page_count = max(1, -(-len(merit) // PREVIEW_ROWS))
+    page_number = st.number_input(f"Page (of {page_count}):", min_value=1, max_value=page_count, value=1,
+                                  key="merit_page")
+    page = merit.page(int(page_number), PREVIEW_ROWS)
+    st.dataframe(page.rows, use_container_width=True)
+    st.caption(f"Showing {len(page.rows)} of {page.total_rows} ranked students")
+
+    export_dir = os.path.join("outputs/merit_lists", result.key[:16])
+    export_key = f"merit_{hash((tuple(priority), tie_rule, tuple((k, tuple(v)) for k, v in filters.items())))}"
+
+    def build(fmt):
+        return lambda: merit.export(export_dir, [fmt], name=export_key)[0]
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        lazy_download_button("📥 Download as CSV", f"{export_key}_csv", build('csv'),
+                             file_name="merit_list.csv", mime="text/csv")
+    with col2:
+        lazy_download_button("📥 Download as Excel", f"{export_key}_xlsx", build('xlsx'),
+                             file_name="merit_list.xlsx",
+                             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    with col3:
+        if len(merit) <= PDF_ROWS_PER_VOLUME:
+            lazy_download_button("📥 Download as PDF", f"{export_key}_pdf", build('pdf'),
+                                 file_name="merit_list.pdf", mime="application/pdf")
+        else:
+            st.caption(f"Lists over {PDF_ROWS_PER_VOLUME:,} students are printed in volumes: "
+                       "`python -m src.merit_list <workbook> --format pdf`")
+
+
+def student_lookup_view(result: PipelineResult):
+    """Exact roll number lookup through the roll index (no table scan)"""
+    roll_no = st.text_input("Roll number:", key="student_lookup")
+    if not roll_no.strip():
+        return
+
+    record = result.student(roll_no)
+    if record is None:
+        st.warning(f"⚠️ No student with roll number {roll_no.strip()}")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Student", str(record['Student_Name']))
+    with col2:
+        st.metric("Average", f"{record['Average']:.2f}")
+    with col3:
+        st.metric("Grade", str(record['Grade']))
+    with col4:
+        st.metric("Status", str(record['Status']))
+    st.dataframe(pd.DataFrame([record]), use_container_width=True)
+
+
+def student_table_view(result: PipelineResult):
+    """Paginated student table; only the current page is sent to the browser"""
+    df = result.df
+    table = result.table
+    subject_cols = result.processor.get_subject_columns()
+
+    col1, col2, col3 = st.columns([1, 2, 2])
+    with col1:
+        filter_status = st.selectbox("Filter by Status:", ["All", "PASS", "FAIL"])
+    with col2:
+        grade_options = sorted(df['Grade'].unique())
+        filter_grades = st.multiselect("Filter by Grade:", grade_options)
+    with col3:
+        search = st.text_input("Search name or roll number:")
+
+    subject_ranges = {}
+    with st.expander("Subject mark ranges"):
+        range_cols = st.columns(min(len(subject_cols), 4) or 1)
+        for i, subject in enumerate(subject_cols):
+            with range_cols[i % len(range_cols)]:
+                low, high = st.slider(subject, 0, 100, (0, 100), key=f"range_{subject}")
+                if (low, high) != (0, 100):
+                    subject_ranges[subject] = (low, high)
+
+    expression = st.text_input(
+        "Query:", key="table_query",
+        placeholder="e.g. Math < 40 and Average > 60, failed_subjects >= 2, Grade in ('A', 'A+')",
+        help="Compare columns with < <= > >= == !=, combine with and / or / not. Quote text "
+             "('FAIL'); use backticks for column names with spaces. "
+             + " ".join(f"`{name}`: {text}." for name, text in VIRTUAL_COLUMNS.items())
+    ).strip()
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        sort_by = st.selectbox("Sort by:", ["File order"] + list(df.columns))
+    with col2:
+        ascending = st.radio("Order:", ["Ascending", "Descending"], horizontal=True) == "Ascending"
+    with col3:
+        page_size = st.selectbox("Rows per page:", [25, 50, 100, 250], index=1)
+
+    sort_by = None if sort_by == "File order" else sort_by
+    try:
+        mask = table.filter_mask(filter_status, filter_grades, subject_ranges, search, expression)
+    except QueryError as e:
+        st.error(f"❌ Invalid query: {e}")
+        expression = ""
+        mask = table.filter_mask(filter_status, filter_grades, subject_ranges, search)
+    total_rows = len(df) if mask is None else int(mask.sum())
+    page_count = max(1, -(-total_rows // page_size))
+    page_number = st.number_input(f"Page (of {page_count}):", min_value=1, max_value=page_count, value=1)
+
+    page = table.query(mask, sort_by, ascending, page=int(page_number), page_size=page_size)
+    st.caption(f"Showing {len(page.rows)} of {page.total_rows} matching students")
+    st.dataframe(page.rows, use_container_width=True)
+
+    # Exports are only built when requested, not on every rerun
+    filters = (filter_status, tuple(filter_grades), tuple(sorted(subject_ranges.items())), search, expression,
+               sort_by, ascending)
+    export_key = f"export_{hash(filters)}"
+
+    def select_rows():
+        return table.select(mask, sort_by, ascending)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        lazy_download_button(
+            "📥 Download as CSV", f"{export_key}_csv",
+            lambda: select_rows().to_csv(index=False).encode("utf-8"),
+            file_name="exam_results.csv", mime="text/csv"
+        )
+    with col2:
+        lazy_download_button(
+            "📥 Download as Excel", f"{export_key}_xlsx",
+            lambda: build_excel_export(select_rows(), result),
+            file_name="exam_results.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+
+    # Report of the students matching the query alone (other filters are not applied)
+    if expression and page.total_rows:
+        lazy_download_button(
+            "📥 Download PDF report for this query", f"query_report_{hash(expression)}",
+            lambda: result.selection_report(expression),
+            file_name="query_report.pdf", mime="application/pdf"
+        )
+
+
+def lazy_download_button(label: str, key: str, build, file_name: str, mime: str):
+    """Show a prepare button first and only build the download data on click
+
+    ``build`` returns either the file contents as bytes or a path to a file on disk.
+    """
+    exports = st.session_state.exports
+    if key not in exports:
+        if st.button(f"⚙️ Prepare {file_name}", key=f"prepare_{key}"):
+            with st.spinner(f"⏳ Preparing {file_name}..."):
+                exports[key] = build()
+        else:
+            return
+
+    data = exports[key]
+    if isinstance(data, str):
+        with open(data, "rb") as export_file:
+            data = export_file.read()
+    st.download_button(label=label, data=data, file_name=file_name, mime=mime, key=f"download_{key}")
+
+
+def build_excel_export(df: pd.DataFrame, result: PipelineResult) -> str:
+    """Stream results, statistics, subject statistics and toppers to an xlsx file"""
+    from src.excel_exporter import ExcelExporter
+
+    exporter = ExcelExporter()
+    return exporter.export(
+        df,
+        result.statistics,
+        result.subject_statistics,
+        result.toppers(top_n=10)
+    )
 
 
 def report_page():
@@ -398,23 +772,21 @@ def report_page():
     if st.button("🎯 Generate PDF Report", key="generate_report"):
         with st.spinner("⏳ Generating comprehensive PDF report..."):
             try:
-                processor = st.session_state.processor
-                analyzer = st.session_state.analyzer
+                result = st.session_state.pipeline
                 
                 # Get data for report
-                df = processor.get_processed_data()
-                stats = analyzer.get_statistics()
-                toppers = analyzer.get_toppers(top_n=5)
-                weak_subjects = analyzer.get_weak_subjects()
-                strong_subjects = analyzer.get_strong_subjects()
+                df = result.df
+                stats = result.statistics
+                toppers = result.toppers(top_n=5)
+                weak_subjects = result.weak_subjects
+                strong_subjects = result.strong_subjects
                 
                 # Generate charts if not already done
-                if not st.session_state.charts:
-                    charts = analyzer.generate_all_charts()
-                else:
-                    charts = st.session_state.charts
+                charts = result.charts()
                 
                 # Generate PDF
+                from src.report_generator import PDFReportGenerator
+
                 pdf_gen = PDFReportGenerator()
                 pdf_path = pdf_gen.generate_report(
                     df, stats, toppers, weak_subjects, 
@@ -440,6 +812,143 @@ def report_page():
             except Exception as e:
                 st.error(f"❌ Error generating report: {str(e)}")
 
+    report_card_bundles()
+    result_changes()
+
+
+def result_changes():
+    """Compare the current results with a revised upload (e.g. after revaluation)"""
+    with glass_card("Compare with Revised Results", "Upload the revised workbook to see what changed",
+                    icon="🔁"):
+        revised_file = st.file_uploader("Revised Excel file", type=['xlsx'], key="revised_upload")
+        if revised_file is None:
+            return
+
+        data = revised_file.getvalue()
+        key = f"{content_hash(data)}:{grading_config_key()}"
+        handle = st.session_state.get("revised_handle")
+        if handle is None or handle.key != key:
+            with st.spinner("🔄 Processing the revised file..."):
+                new_handle = get_store().acquire(key, lambda: run_pipeline(data, key=key))
+            if handle is not None:
+                handle.release()
+            st.session_state.revised_handle = handle = new_handle
+        revised = handle.value
+        if not revised.ok:
+            st.error(f"❌ Revised file could not be used: {revised.message}")
+            for error in revised.errors[:10]:
+                st.error(f"  • {error}")
+            return
+
+        from src.result_diff import ResultDiff
+
+        current = st.session_state.pipeline
+        diff_key = (current.key, revised.key)
+        cached = st.session_state.get("result_diff")
+        if cached is None or cached[0] != diff_key:
+            cached = (diff_key, ResultDiff(current, revised))
+            st.session_state.result_diff = cached
+        diff = cached[1]
+
+        summary = diff.summary()
+        cols = st.columns(4)
+        for col, metric in zip(cols, ['Students Changed', 'Marks Changed', 'Grade Changes', 'Status Changes']):
+            with col:
+                st.metric(metric, f"{summary[metric]:,}")
+        st.caption(f"{summary['Matched Students']:,} students matched on roll number, "
+                   f"{summary['Added Students']:,} added, {summary['Removed Students']:,} removed; "
+                   f"{summary['FAIL to PASS']:,} moved from FAIL to PASS and "
+                   f"{summary['PASS to FAIL']:,} from PASS to FAIL")
+
+        stats = diff.statistics_delta()
+        cols = st.columns(4)
+        for col, metric in zip(cols, ['Class Average', 'Pass %', 'Class GPA', 'Fail Count']):
+            row = stats[stats['Metric'] == metric]
+            if row.empty:
+                continue
+            digits = 0 if 'Count' in metric else 2
+            with col:
+                st.metric(metric, f"{row['After'].iloc[0]:,.{digits}f}",
+                          delta=f"{row['Change'].iloc[0]:+,.{digits}f}",
+                          delta_color="inverse" if metric == 'Fail Count' else "normal")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown('<div class="subheader-style">Grade Changes</div>', unsafe_allow_html=True)
+            st.dataframe(diff.grade_transitions(), use_container_width=True)
+        with col2:
+            st.markdown('<div class="subheader-style">Subject Statistics</div>', unsafe_allow_html=True)
+            subject_delta = diff.subject_delta()
+            st.dataframe(subject_delta[subject_delta['Change'] != 0], use_container_width=True)
+
+        st.markdown('<div class="subheader-style">Changed Students</div>', unsafe_allow_html=True)
+        students = diff.students()
+        st.dataframe(students.head(PREVIEW_ROWS), use_container_width=True)
+        if len(students) > PREVIEW_ROWS:
+            st.caption(f"Showing first {PREVIEW_ROWS} of {len(students)} changed students")
+
+        export_dir = os.path.join("outputs/diffs", f"{current.key[:16]}_{revised.key[:16]}")
+        col1, col2 = st.columns(2)
+        with col1:
+            lazy_download_button(
+                "📥 Download change report (Excel)", f"diff_{hash(diff_key)}_xlsx",
+                lambda: diff.export(export_dir, ['xlsx'], name="result_changes")[0],
+                file_name="result_changes.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+        with col2:
+            lazy_download_button(
+                "📥 Download change report (PDF)", f"diff_{hash(diff_key)}_pdf",
+                lambda: diff.export(export_dir, ['pdf'], name="result_changes")[0],
+                file_name="result_changes.pdf", mime="application/pdf"
+            )
+
+
+def report_card_bundles():
+    """Per-student report card ZIP bundles"""
+    with glass_card("Report Card Bundles", "Download individual report cards as ZIP archives", icon="🗂️"):
+        processor = st.session_state.processor
+        df = processor.get_processed_data()
+
+        col1, col2 = st.columns(2)
+        with col1:
+            split_by_section = st.checkbox(
+                "One bundle per section",
+                value='Section' in df.columns,
+                disabled='Section' not in df.columns
+            )
+        with col2:
+            max_mb = st.number_input("Maximum bundle size (MB, 0 = no limit)", min_value=0, value=0, step=10)
+
+        if st.button("🗂️ Build Report Card Bundles", key="build_bundles"):
+            progress = st.progress(0.0)
+
+            def on_progress(done, total, bundle_path):
+                progress.progress(done / total, text=f"{done}/{total} report cards → {os.path.basename(bundle_path)}")
+
+            from src.bundle_exporter import ReportBundleExporter
+
+            exporter = ReportBundleExporter(
+                split_by_section=split_by_section,
+                max_bundle_bytes=int(max_mb * 1024 * 1024) or None,
+                progress_callback=on_progress
+            )
+            try:
+                st.session_state.bundles = exporter.export(df, processor.get_subject_columns())
+                st.success(f"✅ Built {len(st.session_state.bundles)} bundle(s)")
+            except Exception as e:
+                st.error(f"❌ Error building bundles: {str(e)}")
+
+        for bundle_path in st.session_state.get("bundles", []):
+            with open(bundle_path, "rb") as bundle_file:
+                st.download_button(
+                    label=f"📥 {os.path.basename(bundle_path)}",
+                    data=bundle_file,
+                    file_name=os.path.basename(bundle_path),
+                    mime="application/zip",
+                    key=f"download_{bundle_path}"
+                )
+
 
 def create_sample_excel():
     """Create a sample Excel file for users"""
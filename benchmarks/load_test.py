@@ -0,0 +1,346 @@
+"""
+Load Test
+Drives app.py headlessly with Streamlit's app testing API: N concurrent
+sessions each upload a workbook, switch to the static charts and build the
+PDF report. Records per-step latency percentiles and process memory growth
+for every concurrency level, to size containers and catch regressions when
+sessions contend for the same server
+
+All sessions share one process, like the users of one Streamlit server, so
+they share the dataset store and the chart lock. The testing API renders
+every tab on each run, so the upload step includes the first render of the
+analysis tabs.
+
+Needs Streamlit 1.66 or later (the version in requirements.txt): earlier
+releases either cannot simulate uploads (AppTest.file_uploader arrived in
+1.56) or share script-runner state between tests running at the same time.
+
+Usage:
+    python benchmarks/load_test.py --sessions 1 2 4 8 --students 10000 \
+        [--distinct-uploads] [--output load.json] [--max-p95-ms 30000]
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+
+from src.dataset_store import get_store
+from src.synthetic import generate_cohort, write_workbook
+
+DEFAULT_SESSIONS = [1, 2, 4, 8]
+
+# Steps of one simulated session, in order
+STEPS = ['first_render', 'upload', 'analysis', 'report']
+
+PERCENTILES = [50, 90, 95, 99]
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Oldest Streamlit whose app testing API supports concurrent uploads
+MIN_STREAMLIT_VERSION = "1.66"
+
+# Interval between resident memory samples while a level runs
+MEMORY_SAMPLE_SECONDS = 0.05
+
+
+def rss_bytes() -> int:
+    """
+    Current resident memory of this process
+
+    Returns:
+        Bytes from /proc/self/statm, or the peak so far where /proc is missing
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@contextmanager
+def shared_test_runtime():
+    """
+    Let app tests run concurrently in one process
+
+    Relies on Streamlit internals (Runtime._instance) as of
+    MIN_STREAMLIT_VERSION; main() refuses older versions. Every AppTest run installs its own test Runtime as Streamlit's global
+    instance and clears it when the run ends, which breaks runs still going
+    in other threads. Inside this context the most recently installed
+    Runtime stays visible until a new one replaces it.
+    """
+    from streamlit.runtime import Runtime
+
+    original = Runtime.__dict__['instance'], Runtime.__dict__['exists']
+    latest = []
+
+    def current(cls):
+        if cls._instance is not None:
+            latest[:] = [cls._instance]
+        return latest[0] if latest else None
+
+    def instance(cls):
+        runtime = current(cls)
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return runtime
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: current(cls) is not None)
+    try:
+        yield
+    finally:
+        Runtime.instance, Runtime.exists = original
+
+
+def percentiles(samples: list) -> dict:
+    """
+    Summarize step latencies
+
+    Args:
+        samples: Durations in seconds
+
+    Returns:
+        Dictionary with the count and p50/p90/p95/p99/max in milliseconds
+    """
+    if not samples:
+        return {'count': 0}
+    values = np.asarray(samples) * 1000
+    summary = {f'p{p}_ms': round(float(np.percentile(values, p)), 1) for p in PERCENTILES}
+    summary['max_ms'] = round(float(values.max()), 1)
+    summary['count'] = len(samples)
+    return summary
+
+
+def build_workbooks(count: int, args) -> list:
+    """
+    Generate the workbooks the sessions upload
+
+    Args:
+        count: Number of sessions
+        args: Parsed command line arguments
+
+    Returns:
+        List of workbook bytes, one per session (the same object for every
+        session unless --distinct-uploads is given)
+    """
+    def workbook(seed):
+        cohort = generate_cohort(students=args.students, subjects=args.subjects, sections=args.sections, seed=seed)
+        buffer = io.BytesIO()
+        write_workbook(cohort, buffer)
+        return buffer.getvalue()
+
+    if args.distinct_uploads:
+        return [workbook(args.seed + i) for i in range(count)]
+    return [workbook(args.seed)] * count
+
+
+def run_session(workbook: bytes, timeout: float, barrier: threading.Barrier) -> dict:
+    """
+    Simulate one user: open the app, upload, view analysis, build the report
+
+    Args:
+        workbook: Workbook to upload
+        timeout: Seconds allowed for each script run
+        barrier: Released once every session of the level is ready
+
+    Returns:
+        Dictionary of step name to seconds, plus the error that ended the
+        session early (None when every step succeeded)
+    """
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT_DIR, 'app.py'), default_timeout=timeout)
+    actions = {
+        'first_render': lambda: at.run(),
+        'upload': lambda: at.file_uploader[0].set_value(("load_test.xlsx", workbook, XLSX_MIME)).run(),
+        'analysis': lambda: at.toggle(key="interactive_charts").set_value(False).run(),
+        'report': lambda: at.button(key="generate_report").click().run(),
+    }
+
+    timings = {'error': None}
+    barrier.wait()
+    for step in STEPS:
+        start = time.perf_counter()
+        try:
+            actions[step]()
+        except Exception as e:
+            timings['error'] = f"{step}: {type(e).__name__}: {e}"
+            break
+        timings[step] = time.perf_counter() - start
+        if at.exception:
+            timings['error'] = f"{step}: {at.exception[0].value}"
+            break
+        if step == 'upload' and not at.session_state['file_uploaded']:
+            timings['error'] = "upload: the workbook was not processed"
+            break
+    return timings
+
+
+def run_level(sessions: int, workbooks: list, args) -> dict:
+    """
+    Run one concurrency level
+
+    Unreferenced datasets are cleared from the store first, so each level
+    starts cold.
+
+    Args:
+        sessions: Number of concurrent sessions
+        workbooks: Workbook bytes per session
+        args: Parsed command line arguments
+
+    Returns:
+        Dictionary with step latency percentiles, errors, wall time and memory
+    """
+    # Sessions of earlier levels release their datasets when collected
+    gc.collect()
+    get_store().clear()
+    baseline = rss_bytes()
+
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample_memory():
+        while not done.wait(MEMORY_SAMPLE_SECONDS):
+            peak[0] = max(peak[0], rss_bytes())
+
+    results = [None] * sessions
+    barrier = threading.Barrier(sessions)
+
+    def worker(index):
+        results[index] = run_session(workbooks[index], args.timeout, barrier)
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    threads = [threading.Thread(target=worker, args=(i,), name=f"session-{i}") for i in range(sessions)]
+    sampler.start()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    done.set()
+    sampler.join()
+
+    store = get_store().metrics()
+    gc.collect()
+    after = rss_bytes()
+
+    errors = [result['error'] for result in results if result['error']]
+    completed = sessions - len(errors)
+    mb = 1024 * 1024
+    return {
+        'sessions': sessions,
+        'completed': completed,
+        'errors': errors,
+        'wall_s': round(wall, 3),
+        'sessions_per_minute': round(completed * 60 / wall, 2) if wall else None,
+        'steps': {step: percentiles([result[step] for result in results if step in result]) for step in STEPS},
+        'memory': {
+            'rss_before_mb': round(baseline / mb, 1),
+            'rss_peak_mb': round(peak[0] / mb, 1),
+            'rss_after_mb': round(after / mb, 1),
+            'growth_mb': round((after - baseline) / mb, 1),
+            'store_resident_mb': round(store['resident_bytes'] / mb, 1),
+            'store_entries': store['entries']
+        }
+    }
+
+
+def main(argv=None) -> int:
+    """Run the load test and report failures through the exit code"""
+    parser = argparse.ArgumentParser(description="Load-test app.py with concurrent simulated sessions")
+    parser.add_argument('--sessions', type=int, nargs='+', default=DEFAULT_SESSIONS,
+                        help="concurrency levels to run (sessions at once)")
+    parser.add_argument('--students', type=int, default=1000, help="students per uploaded workbook")
+    parser.add_argument('--subjects', type=int, default=5, help="subjects per student")
+    parser.add_argument('--sections', type=int, default=4, help="number of sections")
+    parser.add_argument('--seed', type=int, default=42, help="random seed")
+    parser.add_argument('--distinct-uploads', action='store_true',
+                        help="give every session its own workbook (default: all upload the same one)")
+    parser.add_argument('--timeout', type=float, default=600, help="seconds allowed per script run")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    parser.add_argument('--no-warmup', action='store_true',
+                        help="skip the unmeasured session that loads charting and PDF modules first")
+    parser.add_argument('--max-p95-ms', type=float, help="fail when any step's p95 latency exceeds this")
+    parser.add_argument('--max-growth-mb', type=float,
+                        help="fail when memory retained after a level grows by more than this")
+    args = parser.parse_args(argv)
+
+    from packaging.version import Version
+    import streamlit
+
+    if Version(streamlit.__version__) < Version(MIN_STREAMLIT_VERSION):
+        print(f"The load test needs Streamlit {MIN_STREAMLIT_VERSION} or later (found {streamlit.__version__}); "
+              "install requirements.txt", file=sys.stderr)
+        return 2
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'streamlit': streamlit.__version__,
+            'students': args.students,
+            'subjects': args.subjects,
+            'distinct_uploads': args.distinct_uploads,
+            'warmup': not args.no_warmup,
+            'store_budget_mb': round(get_store().metrics()['budget_bytes'] / (1024 * 1024), 1)
+        },
+        'levels': {}
+    }
+
+    # Charts, reports and exports are written relative to the working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir, shared_test_runtime():
+        os.chdir(work_dir)
+        try:
+            if not args.no_warmup:
+                # Module imports and first-use caches would otherwise count as growth of the first level
+                print("Warming up...", file=sys.stderr)
+                run_session(build_workbooks(1, args)[0], args.timeout, threading.Barrier(1))
+            for sessions in args.sessions:
+                print(f"Running {sessions} concurrent session(s)...", file=sys.stderr)
+                workbooks = build_workbooks(sessions, args)
+                report['levels'][str(sessions)] = run_level(sessions, workbooks, args)
+        finally:
+            os.chdir(cwd)
+
+    failures = []
+    for sessions, level in report['levels'].items():
+        if level['errors']:
+            failures.append(f"{sessions} sessions: {len(level['errors'])} failed ({level['errors'][0]})")
+        for step, summary in level['steps'].items():
+            if args.max_p95_ms and summary.get('p95_ms', 0) > args.max_p95_ms:
+                failures.append(f"{sessions} sessions: {step} p95 {summary['p95_ms']} ms exceeds "
+                                f"{args.max_p95_ms} ms")
+        if args.max_growth_mb and level['memory']['growth_mb'] > args.max_growth_mb:
+            failures.append(f"{sessions} sessions: memory grew {level['memory']['growth_mb']} MB "
+                            f"(limit {args.max_growth_mb} MB)")
+    report['failures'] = failures
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Pipeline Benchmark
+Times every pipeline stage on deterministic synthetic cohorts and writes a
+JSON report that can be diffed against a previous run
+
+Usage:
+    python benchmarks/pipeline_benchmark.py --sizes 1000 10000 100000 1000000 \
+        --output bench.json [--compare baseline.json --threshold 1.25]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+import pandas as pd
+
+from src.data_processor import DataProcessor
+from src.analyzer import Analyzer
+from src.report_generator import PDFReportGenerator
+from src.synthetic import generate_cohort, write_workbook
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+
+def time_call(func, repeat: int):
+    """
+    Time a callable several times
+
+    Args:
+        func: Callable to time
+        repeat: Number of runs
+
+    Returns:
+        Tuple of (timing summary in seconds, value returned by the last run)
+    """
+    samples = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        samples.append(time.perf_counter() - start)
+    summary = {
+        'min_s': round(min(samples), 6),
+        'median_s': round(statistics.median(samples), 6),
+        'max_s': round(max(samples), 6)
+    }
+    return summary, value
+
+
+def benchmark_size(size: int, args, work_dir: str) -> dict:
+    """
+    Run every stage for one cohort size
+
+    Args:
+        size: Number of students
+        args: Parsed command line arguments
+        work_dir: Scratch directory for workbooks, charts and reports
+
+    Returns:
+        Dictionary of stage name to timing summary
+    """
+    cohort = generate_cohort(students=size, subjects=args.subjects,
+                             invalid_rate=args.invalid_rate, sections=args.sections, seed=args.seed)
+    results = {}
+
+    processor = DataProcessor()
+    if size <= args.max_excel_rows:
+        workbook = io.BytesIO()
+        write_workbook(cohort, workbook)
+        path = os.path.join(work_dir, f"cohort_{size}.xlsx")
+        with open(path, 'wb') as f:
+            f.write(workbook.getvalue())
+        results['load_excel'], _ = time_call(lambda: processor.load_excel(path), args.repeat)
+    else:
+        results['load_excel'] = {'skipped': f"more than --max-excel-rows ({args.max_excel_rows}) rows"}
+        processor.df = cohort
+
+    raw_df = processor.df
+    results['validate_data'], _ = time_call(processor.validate_data, args.repeat)
+
+    def grade():
+        processor.df = raw_df
+        return processor.calculate_grades()
+
+    results['calculate_grades'], df = time_call(grade, args.repeat)
+
+    analyzer = Analyzer(df, output_dir=os.path.join(work_dir, f"charts_{size}"))
+    results['get_toppers'], toppers = time_call(lambda: analyzer.get_toppers(top_n=5), args.repeat)
+    results['get_weak_subjects'], weak = time_call(analyzer.get_weak_subjects, args.repeat)
+    results['get_strong_subjects'], strong = time_call(analyzer.get_strong_subjects, args.repeat)
+    results['get_statistics'], stats = time_call(analyzer.get_statistics, args.repeat)
+    results['get_subject_statistics'], _ = time_call(analyzer.get_subject_statistics, args.repeat)
+    results['generate_all_charts'], charts = time_call(analyzer.generate_all_charts, args.chart_repeat)
+
+    pdf_gen = PDFReportGenerator(output_dir=os.path.join(work_dir, f"reports_{size}"))
+    results['generate_report'], _ = time_call(
+        lambda: pdf_gen.generate_report(df, stats, toppers, weak, strong, charts), args.chart_repeat
+    )
+    return results
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compare median timings against a baseline report
+
+    Args:
+        report: Current benchmark report
+        baseline: Previous benchmark report
+        threshold: Slowdown ratio that counts as a regression
+
+    Returns:
+        List of regression dictionaries
+    """
+    regressions = []
+    for size, stages in report['results'].items():
+        for stage, timing in stages.items():
+            old = baseline.get('results', {}).get(size, {}).get(stage, {})
+            if 'median_s' not in timing or not old.get('median_s'):
+                continue
+            ratio = timing['median_s'] / old['median_s']
+            timing['baseline_median_s'] = old['median_s']
+            timing['ratio'] = round(ratio, 3)
+            if ratio > threshold:
+                regressions.append({'size': size, 'stage': stage, 'ratio': round(ratio, 3)})
+    return regressions
+
+
+def main(argv=None) -> int:
+    """Run the benchmark suite"""
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic cohorts")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="cohort sizes (rows)")
+    parser.add_argument('--subjects', type=int, default=5, help="subjects per student")
+    parser.add_argument('--sections', type=int, default=0, help="number of sections")
+    parser.add_argument('--invalid-rate', type=float, default=0.0, help="fraction of invalid rows")
+    parser.add_argument('--seed', type=int, default=42, help="random seed")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per data stage")
+    parser.add_argument('--chart-repeat', type=int, default=1, help="runs for charts and the PDF report")
+    parser.add_argument('--max-excel-rows', type=int, default=100000,
+                        help="largest cohort written to and loaded from xlsx")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    parser.add_argument('--compare', help="baseline JSON report to compare against")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="slowdown ratio reported as a regression (default: 1.25)")
+    args = parser.parse_args(argv)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'subjects': args.subjects,
+            'sections': args.sections,
+            'invalid_rate': args.invalid_rate,
+            'seed': args.seed
+        },
+        'results': {}
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            print(f"Benchmarking {size} students...", file=sys.stderr)
+            report['results'][str(size)] = benchmark_size(size, args, work_dir)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
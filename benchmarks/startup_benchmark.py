@@ -0,0 +1,168 @@
+"""
+Startup Benchmark
+Measures cold import time of the project modules and the time it takes
+the Streamlit app to render its first page, each in a fresh interpreter
+
+Usage:
+    python benchmarks/startup_benchmark.py [--repeat 3] [--output startup.json]
+                                           [--max-first-render-ms 4000]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be loaded until a chart, report or export is requested
+HEAVY_MODULES = ['matplotlib.pyplot', 'reportlab.platypus', 'openpyxl']
+
+# Modules timed on their own, in import order of a typical session
+MODULES = [
+    'src',
+    'src.data_processor',
+    'src.pipeline',
+    'src.analyzer',
+    'src.excel_exporter',
+    'src.report_generator',
+]
+
+IMPORT_SCRIPT = """
+import importlib, json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+importlib.import_module({module!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy_loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+FIRST_RENDER_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.run()
+rendered = time.perf_counter()
+print(json.dumps({{
+    'streamlit_import_seconds': imported - start,
+    'first_render_seconds': rendered - imported,
+    'exception': len(at.exception) > 0,
+    'heavy_loaded': [m for m in {heavy!r} if m in sys.modules]
+}}))
+"""
+
+
+def run_script(script: str) -> dict:
+    """
+    Run a snippet in a fresh interpreter and parse its JSON output
+
+    Args:
+        script: Python source printing one JSON object on its last line
+
+    Returns:
+        Parsed JSON object
+    """
+    completed = subprocess.run(
+        [sys.executable, '-c', script], cwd=ROOT_DIR,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: list) -> dict:
+    """
+    Summarize timing samples in milliseconds
+
+    Args:
+        samples: Durations in seconds
+
+    Returns:
+        Dictionary with min, median and max in milliseconds
+    """
+    return {
+        'min_ms': round(min(samples) * 1000, 1),
+        'median_ms': round(statistics.median(samples) * 1000, 1),
+        'max_ms': round(max(samples) * 1000, 1)
+    }
+
+
+def benchmark_imports(repeat: int) -> dict:
+    """
+    Time each project module import in a cold interpreter
+
+    Args:
+        repeat: Number of fresh interpreters per module
+
+    Returns:
+        Dictionary of module name to timing summary and heavy modules loaded
+    """
+    results = {}
+    for module in MODULES:
+        runs = [run_script(IMPORT_SCRIPT.format(root=ROOT_DIR, module=module, heavy=HEAVY_MODULES))
+                for _ in range(repeat)]
+        results[module] = summarize([run['seconds'] for run in runs])
+        results[module]['heavy_loaded'] = runs[-1]['heavy_loaded']
+    return results
+
+
+def benchmark_first_render(repeat: int) -> dict:
+    """
+    Time the first render of app.py with Streamlit's app testing API
+
+    Args:
+        repeat: Number of fresh interpreters
+
+    Returns:
+        Timing summary of the first render plus heavy modules loaded
+    """
+    app_path = os.path.join(ROOT_DIR, 'app.py')
+    runs = [run_script(FIRST_RENDER_SCRIPT.format(root=ROOT_DIR, app=app_path, heavy=HEAVY_MODULES))
+            for _ in range(repeat)]
+    result = summarize([run['first_render_seconds'] for run in runs])
+    result['streamlit_import'] = summarize([run['streamlit_import_seconds'] for run in runs])
+    result['exception'] = any(run['exception'] for run in runs)
+    result['heavy_loaded'] = runs[-1]['heavy_loaded']
+    return result
+
+
+def main(argv=None) -> int:
+    """Run the startup benchmark and report regressions through the exit code"""
+    parser = argparse.ArgumentParser(description="Measure import and first-render time")
+    parser.add_argument('--repeat', type=int, default=3, help="fresh interpreters per measurement")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    parser.add_argument('--max-first-render-ms', type=float,
+                        help="fail when the median first render is slower than this")
+    args = parser.parse_args(argv)
+
+    report = {
+        'python': sys.version.split()[0],
+        'imports': benchmark_imports(args.repeat),
+        'first_render': benchmark_first_render(args.repeat)
+    }
+
+    failures = []
+    if report['first_render']['exception']:
+        failures.append("app.py raised an exception on first render")
+    if report['first_render']['heavy_loaded']:
+        failures.append(f"heavy modules loaded on first render: {report['first_render']['heavy_loaded']}")
+    if args.max_first_render_ms and report['first_render']['median_ms'] > args.max_first_render_ms:
+        failures.append(f"first render {report['first_render']['median_ms']} ms exceeds "
+                        f"{args.max_first_render_ms} ms")
+    report['failures'] = failures
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
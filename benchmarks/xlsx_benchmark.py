@@ -0,0 +1,117 @@
+"""
+XLSX Reader Benchmark
+Compares pandas.read_excel with the parallel reader in src/fast_xlsx.py on
+synthetic workbooks, for several worker counts, and checks both return the
+same frame
+
+Usage:
+    python benchmarks/xlsx_benchmark.py --sizes 10000 100000 1000000 \
+        --workers 1 2 4 8 [--output xlsx_bench.json]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.pipeline_benchmark import time_call
+from src.fast_xlsx import read_sheet
+from src.synthetic import generate_cohort, write_workbook
+
+DEFAULT_SIZES = [10000, 100000]
+
+
+def default_workers() -> list:
+    """Worker counts 1, 2, 4, ... up to the CPU count"""
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != (os.cpu_count() or 1):
+        counts.append(os.cpu_count() or 1)
+    return counts
+
+
+def benchmark_size(size: int, args) -> dict:
+    """
+    Time both readers on one workbook
+
+    Args:
+        size: Number of students
+        args: Parsed command line arguments
+
+    Returns:
+        Dictionary of reader name to timing summary, with the speedup over
+        pandas and whether the frames matched
+    """
+    cohort = generate_cohort(students=size, subjects=args.subjects, sections=args.sections, seed=args.seed)
+    workbook = io.BytesIO()
+    write_workbook(cohort, workbook)
+    data = workbook.getvalue()
+
+    results = {'workbook_mb': round(len(data) / (1024 * 1024), 2)}
+    results['pandas'], expected = time_call(lambda: pd.read_excel(io.BytesIO(data)), args.repeat)
+    for workers in args.workers:
+        timing, frame = time_call(lambda: read_sheet(data, workers=workers), args.repeat)
+        try:
+            pd.testing.assert_frame_equal(frame, expected)
+            timing['matches_pandas'] = True
+        except AssertionError:
+            timing['matches_pandas'] = False
+        timing['speedup'] = round(results['pandas']['median_s'] / timing['median_s'], 2)
+        results[f'fast_xlsx_{workers}_workers'] = timing
+    return results
+
+
+def main(argv=None) -> int:
+    """Run the reader benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark the parallel xlsx reader against pandas")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="cohort sizes (rows)")
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers(),
+                        help="worker process counts to time (default: 1, 2, 4, ... CPU count)")
+    parser.add_argument('--subjects', type=int, default=5, help="subjects per student")
+    parser.add_argument('--sections', type=int, default=4, help="number of sections")
+    parser.add_argument('--seed', type=int, default=42, help="random seed")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per reader")
+    parser.add_argument('--output', help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'subjects': args.subjects,
+            'sections': args.sections,
+            'seed': args.seed
+        },
+        'results': {}
+    }
+
+    for size in args.sizes:
+        print(f"Benchmarking {size} students...", file=sys.stderr)
+        report['results'][str(size)] = benchmark_size(size, args)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+    mismatched = [size for size, results in report['results'].items()
+                  if any(timing.get('matches_pandas') is False for timing in results.values()
+                         if isinstance(timing, dict))]
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
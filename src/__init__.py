@@ -1,5 +1,34 @@
 """
 Exam Result Processing System - Source Module
+
+Public classes are resolved on first attribute access, so ``import src``
+does not load pandas, matplotlib or reportlab until they are needed.
 """
 
+import importlib
+
 __version__ = "1.0.0"
+
+# Public name -> defining submodule
+_LAZY_EXPORTS = {
+    'DataProcessor': 'src.data_processor',
+    'Analyzer': 'src.analyzer',
+    'PDFReportGenerator': 'src.report_generator',
+    'ExcelExporter': 'src.excel_exporter',
+    'ReportBundleExporter': 'src.bundle_exporter',
+    'StudentTable': 'src.table_query',
+    'ResultsQuery': 'src.result_query',
+    'run_pipeline': 'src.pipeline',
+    'DatasetStore': 'src.dataset_store',
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name):
+    """Import public classes from their submodule on first access"""
+    if name in _LAZY_EXPORTS:
+        value = getattr(importlib.import_module(_LAZY_EXPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,26 +5,102 @@ Performs student-wise and subject-wise analysis with visualizations
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import os
 
+from src.data_processor import NON_SUBJECT_COLUMNS, RESULT_COLUMNS
+from src.grading_policy import GradingPolicy, get_grading_policy
+from src.results_model import ResultsModel
+from src.instrumentation import instrumented
+
+# Anomaly detection: robust z-scores use MAD_SCALE * median absolute deviation
+# as the standard deviation, and scores of every check share the
+# OUTLIER_SCORE cut-off (Iglewicz-Hoaglin modified z-score)
+MAD_SCALE = 1.4826
+OUTLIER_SCORE = 3.5
+MIN_OUTLIER_GAP = 20          # marks between a subject and the student's usual level
+SECTION_SHIFT = 1.0           # robust standard deviations between section and cohort medians
+MIN_SECTION_SIZE = 10
+MIN_ANOMALY_SUBJECTS = 3      # subjects needed to judge a student against themselves
+IDENTICAL_MARKS_SCORE = 7.0
+
+# Bins of the average marks histogram (same as the PNG chart)
+HISTOGRAM_BINS = 15
+ANOMALY_COLUMNS = ['Check', 'Student_Name', 'Roll_No', 'Section', 'Subject',
+                   'Mark', 'Expected', 'Score', 'Detail']
+
+
+def _pyplot():
+    """
+    Import matplotlib on first use so that loading the analyzer stays cheap
+    
+    Returns:
+        The matplotlib.pyplot module (using the non-interactive Agg backend)
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _leave_one_out_medians(matrix: np.ndarray) -> np.ndarray:
+    """
+    Median of every row without each of its own entries
+    
+    Rows are sorted once; the median of the other entries is then read off
+    the sorted row at the positions around the entry's own rank. Rows with
+    missing values fall back to the median of the whole row.
+    
+    Args:
+        matrix: (rows x columns) float matrix with at least 2 columns
+        
+    Returns:
+        Matrix of the same shape
+    """
+    n = matrix.shape[1]
+    order = np.argsort(matrix, axis=1, kind='stable')
+    ordered = np.take_along_axis(matrix, order, axis=1)
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(n)[None, :], axis=1)
+    
+    # The other n-1 entries, in order, are ordered[:, i] for i < rank and ordered[:, i + 1] after it
+    low, high = (n - 2) // 2, (n - 1) // 2
+    pick_low = np.take_along_axis(ordered, np.where(low < rank, low, low + 1), axis=1)
+    pick_high = np.take_along_axis(ordered, np.where(high < rank, high, high + 1), axis=1)
+    medians = (pick_low + pick_high) / 2
+    
+    missing = np.isnan(matrix).any(axis=1)
+    if missing.any():
+        medians[missing] = np.nanmedian(matrix[missing], axis=1)[:, None]
+    return medians
+
 
 class Analyzer:
     """Perform analytics on exam results"""
     
-    def __init__(self, df: pd.DataFrame, output_dir: str = "outputs/charts"):
+    def __init__(self, df: pd.DataFrame, output_dir: str = "outputs/charts",
+                 model: ResultsModel = None, policy: GradingPolicy = None):
         """
         Initialize analyzer
         
         Args:
             df: Processed DataFrame with calculations
             output_dir: Directory to save charts
+            model: Results model behind the frame (built from it, without
+                copying marks, when not given)
+            policy: Grading policy the data was graded with (defaults to
+                the configured policy)
         """
         self.df = df
+        self.policy = policy or get_grading_policy()
+        if model is None:
+            subject_cols = [col for col in df.columns if col not in NON_SUBJECT_COLUMNS]
+            model = ResultsModel.from_frame(df, subject_cols, RESULT_COLUMNS)
+        self.model = model
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
     
+    @instrumented()
     def get_toppers(self, top_n: int = 5) -> pd.DataFrame:
         """
         Get top performing students
@@ -39,6 +115,16 @@ class Analyzer:
             ['Student_Name', 'Roll_No', 'Average', 'Grade', 'GPA', 'Status']
         ]
     
+    def _subject_averages(self) -> Dict[str, float]:
+        """
+        Average marks of every subject, reduced on the marks matrix
+        
+        Returns:
+            Dictionary of subject name to average, in column order
+        """
+        return dict(zip(self.model.subjects, self.model.subject_means().tolist()))
+    
+    @instrumented()
     def get_weak_subjects(self) -> Dict[str, float]:
         """
         Identify subjects with lowest average marks
@@ -46,16 +132,12 @@ class Analyzer:
         Returns:
             Dictionary with subject names and their averages
         """
-        subject_cols = [col for col in self.df.columns 
-                       if col not in ['Student_Name', 'Roll_No', 'Average', 'GPA', 'Grade', 'Status']]
-        
-        subject_avgs = {}
-        for subject in subject_cols:
-            subject_avgs[subject] = self.df[subject].mean()
+        subject_avgs = self._subject_averages()
         
         # Sort by average (lowest first)
         return dict(sorted(subject_avgs.items(), key=lambda x: x[1]))
     
+    @instrumented()
     def get_strong_subjects(self) -> Dict[str, float]:
         """
         Identify subjects with highest average marks
@@ -63,16 +145,26 @@ class Analyzer:
         Returns:
             Dictionary with subject names and their averages
         """
-        subject_cols = [col for col in self.df.columns 
-                       if col not in ['Student_Name', 'Roll_No', 'Average', 'GPA', 'Grade', 'Status']]
-        
-        subject_avgs = {}
-        for subject in subject_cols:
-            subject_avgs[subject] = self.df[subject].mean()
+        subject_avgs = self._subject_averages()
         
         # Sort by average (highest first)
         return dict(sorted(subject_avgs.items(), key=lambda x: x[1], reverse=True))
     
+    @instrumented()
+    def get_subject_statistics(self) -> pd.DataFrame:
+        """
+        Get per-subject summary statistics
+        
+        Returns:
+            DataFrame with one row per subject (mean, median, min, max,
+            standard deviation and pass count)
+        """
+        return pd.DataFrame({
+            'Subject': self.model.subjects,
+            **self.model.subject_statistics(self.policy.pass_marks_for(self.model.subjects))
+        })
+    
+    @instrumented()
     def get_statistics(self) -> Dict[str, float]:
         """
         Get overall statistics
@@ -80,18 +172,211 @@ class Analyzer:
         Returns:
             Dictionary with statistics
         """
+        derived = self.model.derived
+        total = len(self.model)
+        pass_count = int((derived['Status'] == 'PASS').sum())
+        fail_count = int((derived['Status'] == 'FAIL').sum())
+        average = derived['Average']
+        
         return {
-            'Total Students': len(self.df),
-            'Pass Count': len(self.df[self.df['Status'] == 'PASS']),
-            'Fail Count': len(self.df[self.df['Status'] == 'FAIL']),
-            'Pass %': (len(self.df[self.df['Status'] == 'PASS']) / len(self.df) * 100),
-            'Fail %': (len(self.df[self.df['Status'] == 'FAIL']) / len(self.df) * 100),
-            'Class Average': self.df['Average'].mean(),
-            'Highest Score': self.df['Average'].max(),
-            'Lowest Score': self.df['Average'].min(),
-            'Class GPA': self.df['GPA'].mean()
+            'Total Students': total,
+            'Pass Count': pass_count,
+            'Fail Count': fail_count,
+            'Pass %': pass_count / total * 100,
+            'Fail %': fail_count / total * 100,
+            'Class Average': np.nanmean(average),
+            'Highest Score': np.nanmax(average),
+            'Lowest Score': np.nanmin(average),
+            'Class GPA': derived['GPA'].mean()
         }
     
+    def get_statistics_totals(self) -> Dict:
+        """
+        Get the additive totals behind the overall statistics
+        
+        Totals of several cohorts can be combined with combine_statistics()
+        without keeping their rows, e.g. to update a combined view when one
+        of many workbooks changes.
+        
+        Returns:
+            Dictionary of counts, sums and extremes (JSON serializable)
+        """
+        derived = self.model.derived
+        average = derived['Average']
+        marks = self.model.marks
+        present = ~np.isnan(marks) if self.model.has_missing else np.ones(marks.shape, dtype=bool)
+        
+        return {
+            'Total Students': len(self.model),
+            'Pass Count': int((derived['Status'] == 'PASS').sum()),
+            'Fail Count': int((derived['Status'] == 'FAIL').sum()),
+            'Average Sum': float(np.nansum(average)),
+            'Average Count': int((~np.isnan(average)).sum()),
+            'Highest Score': float(np.nanmax(average)),
+            'Lowest Score': float(np.nanmin(average)),
+            'GPA Sum': float(derived['GPA'].sum()),
+            'Subject Sums': dict(zip(self.model.subjects, np.nansum(marks, axis=0).tolist())),
+            'Subject Counts': dict(zip(self.model.subjects, present.sum(axis=0).tolist()))
+        }
+    
+    @instrumented()
+    def detect_anomalies(self, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Flag suspicious marks patterns for moderation, most severe first
+        
+        Each check is a few vectorized passes over the marks matrix:
+        - Identical marks: the same mark in every subject
+        - Subject outlier: a mark far from the student's level in their other
+          subjects, allowing for how hard each subject is (the residual of
+          mark - subject median - median of the student's other subjects is
+          scored against its MAD)
+        - Section deviation: a section whose median in a subject is far from
+          the cohort median, in robust standard deviations
+        
+        Args:
+            limit: Keep only the most severe flags
+            
+        Returns:
+            DataFrame with Check, Student_Name, Roll_No, Section, Subject,
+            Mark, Expected, Score and Detail columns, highest Score first
+        """
+        model = self.model
+        marks = model.marks.astype(np.float64, copy=False)
+        median = np.nanmedian if model.has_missing else np.median
+        checks, rows, cols, values, expected, scores = [], [], [], [], [], []
+        
+        def add(check, row, col, value, typical, score):
+            checks.append(np.full(len(score), check, dtype=object))
+            rows.append(row)
+            cols.append(col)
+            values.append(value)
+            expected.append(typical)
+            scores.append(score)
+        
+        if len(model) and model.subjects:
+            subject_medians = median(marks, axis=0)
+            deviation = marks - subject_medians
+            
+            if len(model.subjects) >= MIN_ANOMALY_SUBJECTS:
+                highest = np.nanmax(marks, axis=1) if model.has_missing else marks.max(axis=1)
+                lowest = np.nanmin(marks, axis=1) if model.has_missing else marks.min(axis=1)
+                identical = np.flatnonzero(highest == lowest)
+                add('Identical marks', identical, np.full(len(identical), -1), highest[identical],
+                    np.full(len(identical), np.nan), np.full(len(identical), IDENTICAL_MARKS_SCORE))
+                
+                residual = deviation - _leave_one_out_medians(deviation)
+                scale = np.maximum(MAD_SCALE * median(np.abs(residual), axis=0), 1.0)
+                gap = np.abs(residual)
+                with np.errstate(invalid='ignore'):
+                    outlier = (gap >= MIN_OUTLIER_GAP) & (gap / scale >= OUTLIER_SCORE)
+                row, col = np.nonzero(outlier)
+                add('Subject outlier', row, col, marks[row, col], marks[row, col] - residual[row, col],
+                    gap[row, col] / scale[col])
+            
+            if 'Section' in model.identity.columns:
+                codes, sections = pd.factorize(model.identity['Section'], sort=True)
+                known = codes >= 0
+                grouped = pd.DataFrame(marks[known]).groupby(codes[known])
+                sizes = grouped.size().reindex(range(len(sections)), fill_value=0).to_numpy()
+                section_medians = grouped.median().reindex(range(len(sections))).to_numpy()
+                spread = np.maximum(MAD_SCALE * median(np.abs(deviation), axis=0), 1.0)
+                shift = (section_medians - subject_medians) / spread
+                with np.errstate(invalid='ignore'):
+                    flagged = (np.abs(shift) >= SECTION_SHIFT) & (sizes[:, None] >= MIN_SECTION_SIZE)
+                section, col = np.nonzero(flagged)
+                # Section flags point at the section (row -1 - code) rather than a student
+                add('Section deviation', -1 - section, col, section_medians[section, col],
+                    subject_medians[col], np.abs(shift[section, col]) * OUTLIER_SCORE / SECTION_SHIFT)
+        
+        if not checks:
+            return pd.DataFrame(columns=ANOMALY_COLUMNS)
+        
+        score = np.concatenate(scores)
+        order = np.argsort(-score, kind='stable')[:limit]
+        check = np.concatenate(checks)[order]
+        row = np.concatenate(rows)[order]
+        col = np.concatenate(cols)[order]
+        value = np.concatenate(values)[order]
+        typical = np.concatenate(expected)[order]
+        
+        student = row >= 0
+        positions = np.where(student, row, 0)
+        identity = model.identity
+        
+        def identity_column(name):
+            if name not in identity.columns or not len(identity):
+                return np.full(len(order), None, dtype=object)
+            return np.where(student, identity[name].iloc[positions].to_numpy(dtype=object), None)
+        
+        sections_column = identity_column('Section')
+        if not student.all():
+            sections_column[~student] = sections.to_numpy(dtype=object)[-1 - row[~student]]
+        subject_names = np.array(model.subjects + [None], dtype=object)[col]
+        
+        details = []
+        for kind, subject, mark, usual, size_row in zip(check, subject_names, value, typical, row):
+            if kind == 'Identical marks':
+                details.append(f"{mark:g} in all {len(model.subjects)} subjects")
+            elif kind == 'Subject outlier':
+                details.append(f"{mark:g} in {subject}, {'below' if mark < usual else 'above'} "
+                               f"the {usual:.0f} expected from the other subjects")
+            else:
+                details.append(f"Median {mark:g} in {subject} vs {usual:g} for the cohort "
+                               f"({sizes[-1 - size_row]} students)")
+        
+        return pd.DataFrame({
+            'Check': check,
+            'Student_Name': identity_column('Student_Name'),
+            'Roll_No': identity_column('Roll_No'),
+            'Section': sections_column,
+            'Subject': subject_names,
+            'Mark': value,
+            'Expected': np.round(typical, 1),
+            'Score': np.round(score[order], 2),
+            'Detail': details
+        })
+    
+    def _counts(self, column: str, order: List) -> pd.DataFrame:
+        """Count students per value of a derived column, in the given order"""
+        counts = pd.Series(self.model.derived[column]).value_counts()
+        order = list(order) + [value for value in counts.index if value not in set(order)]
+        return counts.reindex(order, fill_value=0).rename('Students').rename_axis(column).to_frame()
+    
+    @instrumented()
+    def get_chart_data(self) -> Dict[str, pd.DataFrame]:
+        """
+        Pre-aggregated data behind every analysis chart, for interactive charts
+        
+        Each frame has one row per bar (grade, status, histogram bin,
+        subject or GPA value), so its size does not grow with the number
+        of students and nothing is rendered here.
+        
+        Returns:
+            Dictionary with the same chart names as generate_all_charts()
+            mapped to small DataFrames indexed by the chart's categories
+        """
+        ladder = sorted(self.policy.grades, key=lambda g: g['min_average'], reverse=True)
+        average = self.model.derived['Average']
+        average = average[~np.isnan(average)]
+        counts, edges = np.histogram(average, bins=HISTOGRAM_BINS,
+                                     range=(self.policy.min_marks, self.policy.max_marks))
+        histogram = pd.DataFrame({'Students': counts},
+                                 index=pd.Index(np.round(edges[:-1], 1), name='Average (from)'))
+        subject_averages = self._subject_averages()
+        
+        return {
+            'grade_distribution': self._counts('Grade', [g['grade'] for g in ladder]),
+            'pass_fail_distribution': self._counts('Status', ['PASS', 'FAIL']),
+            'average_distribution': histogram,
+            'subject_performance': pd.DataFrame(
+                {'Average': list(subject_averages.values()),
+                 'Pass Marks': self.policy.pass_marks_for(list(subject_averages)).tolist()},
+                index=pd.Index(list(subject_averages), name='Subject')
+            ),
+            'gpa_distribution': self._counts('GPA', sorted({g['gpa'] for g in ladder}, reverse=True))
+        }
+    
+    @instrumented()
     def plot_grade_distribution(self) -> str:
         """
         Create grade distribution chart
@@ -99,6 +384,7 @@ class Analyzer:
         Returns:
             Path to saved chart
         """
+        plt = _pyplot()
         fig, ax = plt.subplots(figsize=(10, 6))
         
         grade_counts = self.df['Grade'].value_counts().sort_index(ascending=False)
@@ -117,6 +403,7 @@ class Analyzer:
         
         return file_path
     
+    @instrumented()
     def plot_pass_fail_distribution(self) -> str:
         """
         Create pass/fail distribution pie chart
@@ -124,6 +411,7 @@ class Analyzer:
         Returns:
             Path to saved chart
         """
+        plt = _pyplot()
         fig, ax = plt.subplots(figsize=(8, 6))
         
         status_counts = self.df['Status'].value_counts()
@@ -140,6 +428,7 @@ class Analyzer:
         
         return file_path
     
+    @instrumented()
     def plot_average_marks_distribution(self) -> str:
         """
         Create histogram of average marks distribution
@@ -147,13 +436,17 @@ class Analyzer:
         Returns:
             Path to saved chart
         """
+        plt = _pyplot()
         fig, ax = plt.subplots(figsize=(10, 6))
         
-        ax.hist(self.df['Average'], bins=15, color='skyblue', edgecolor='black', alpha=0.7)
-        ax.axvline(self.df['Average'].mean(), color='red', linestyle='--', 
-                   linewidth=2, label=f"Mean: {self.df['Average'].mean():.2f}")
-        ax.axvline(self.df['Average'].median(), color='green', linestyle='--', 
-                   linewidth=2, label=f"Median: {self.df['Average'].median():.2f}")
+        average = self.model.derived['Average']
+        mean, median = np.nanmean(average), np.nanmedian(average)
+        
+        ax.hist(average[~np.isnan(average)], bins=15, color='skyblue', edgecolor='black', alpha=0.7)
+        ax.axvline(mean, color='red', linestyle='--', 
+                   linewidth=2, label=f"Mean: {mean:.2f}")
+        ax.axvline(median, color='green', linestyle='--', 
+                   linewidth=2, label=f"Median: {median:.2f}")
         
         ax.set_title('Distribution of Average Marks', fontsize=14, fontweight='bold')
         ax.set_xlabel('Average Marks', fontsize=12)
@@ -168,6 +461,7 @@ class Analyzer:
         
         return file_path
     
+    @instrumented()
     def plot_subject_performance(self) -> str:
         """
         Create subject-wise performance comparison chart
@@ -175,12 +469,10 @@ class Analyzer:
         Returns:
             Path to saved chart
         """
-        subject_cols = [col for col in self.df.columns 
-                       if col not in ['Student_Name', 'Roll_No', 'Average', 'GPA', 'Grade', 'Status']]
-        
+        plt = _pyplot()
         fig, ax = plt.subplots(figsize=(12, 6))
         
-        subject_avgs = {subject: self.df[subject].mean() for subject in subject_cols}
+        subject_avgs = self._subject_averages()
         subjects = list(subject_avgs.keys())
         averages = list(subject_avgs.values())
         
@@ -188,7 +480,8 @@ class Analyzer:
                   for avg in averages]
         
         ax.bar(subjects, averages, color=colors, edgecolor='black', alpha=0.8)
-        ax.axhline(y=40, color='red', linestyle='--', linewidth=2, label='Pass Marks (40)')
+        pass_marks = self.policy.pass_marks
+        ax.axhline(y=pass_marks, color='red', linestyle='--', linewidth=2, label=f'Pass Marks ({pass_marks:g})')
         ax.set_title('Subject-wise Average Performance', fontsize=14, fontweight='bold')
         ax.set_xlabel('Subject', fontsize=12)
         ax.set_ylabel('Average Marks', fontsize=12)
@@ -204,6 +497,7 @@ class Analyzer:
         
         return file_path
     
+    @instrumented()
     def plot_gpa_distribution(self) -> str:
         """
         Create GPA distribution chart
@@ -211,6 +505,7 @@ class Analyzer:
         Returns:
             Path to saved chart
         """
+        plt = _pyplot()
         fig, ax = plt.subplots(figsize=(10, 6))
         
         gpa_counts = self.df['GPA'].value_counts().sort_index(ascending=False)
@@ -229,6 +524,7 @@ class Analyzer:
         
         return file_path
     
+    @instrumented()
     def generate_all_charts(self) -> Dict[str, str]:
         """
         Generate all analysis charts
@@ -245,3 +541,53 @@ class Analyzer:
         }
         
         return charts
+
+
+def combine_statistics(totals: List[Dict]) -> Dict[str, float]:
+    """
+    Combine the totals of several cohorts into overall statistics
+    
+    Args:
+        totals: Results of Analyzer.get_statistics_totals()
+        
+    Returns:
+        Dictionary with the same keys as Analyzer.get_statistics(), empty
+        when there are no students
+    """
+    students = sum(t['Total Students'] for t in totals)
+    if not students:
+        return {}
+    pass_count = sum(t['Pass Count'] for t in totals)
+    fail_count = sum(t['Fail Count'] for t in totals)
+    average_count = sum(t['Average Count'] for t in totals)
+    
+    return {
+        'Total Students': students,
+        'Pass Count': pass_count,
+        'Fail Count': fail_count,
+        'Pass %': pass_count / students * 100,
+        'Fail %': fail_count / students * 100,
+        'Class Average': sum(t['Average Sum'] for t in totals) / average_count if average_count else float('nan'),
+        'Highest Score': max(t['Highest Score'] for t in totals),
+        'Lowest Score': min(t['Lowest Score'] for t in totals),
+        'Class GPA': sum(t['GPA Sum'] for t in totals) / students
+    }
+
+
+def combine_subject_averages(totals: List[Dict]) -> Dict[str, float]:
+    """
+    Combine the per-subject totals of several cohorts into subject averages
+    
+    Args:
+        totals: Results of Analyzer.get_statistics_totals()
+        
+    Returns:
+        Dictionary of subject to average mark, highest first
+    """
+    sums, counts = {}, {}
+    for t in totals:
+        for subject, value in t['Subject Sums'].items():
+            sums[subject] = sums.get(subject, 0.0) + value
+            counts[subject] = counts.get(subject, 0) + t['Subject Counts'][subject]
+    averages = {subject: sums[subject] / counts[subject] for subject in sums if counts[subject]}
+    return dict(sorted(averages.items(), key=lambda x: x[1], reverse=True))
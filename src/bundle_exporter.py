@@ -0,0 +1,178 @@
+"""
+Report Bundle Export Module
+Streams per-student PDF report cards into ZIP archives
+"""
+
+import io
+import os
+import re
+import zipfile
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.data_processor import RESULT_COLUMNS
+from src.report_generator import PDFReportGenerator
+from src.results_model import ResultsModel
+
+# Bundle name for students without a section
+UNASSIGNED_SECTION = "Unassigned"
+
+
+class ReportBundleExporter:
+    """Build ZIP bundles of student report cards one PDF at a time"""
+
+    def __init__(self, report_generator: PDFReportGenerator = None,
+                 output_dir: str = "outputs/bundles",
+                 split_by_section: bool = False,
+                 max_bundle_bytes: Optional[int] = None,
+                 progress_callback: Optional[Callable[[int, int, str], None]] = None):
+        """
+        Initialize bundle exporter
+
+        Args:
+            report_generator: Generator used to render each report card
+            output_dir: Directory to save ZIP bundles
+            split_by_section: Write one bundle per value of the Section column
+            max_bundle_bytes: Start a new bundle part once a bundle would grow
+                past this many (compressed) bytes
+            progress_callback: Called as (done, total, bundle_path) after each
+                report card has been written
+        """
+        self.report_generator = report_generator or PDFReportGenerator()
+        self.output_dir = output_dir
+        self.split_by_section = split_by_section
+        self.max_bundle_bytes = max_bundle_bytes
+        self.progress_callback = progress_callback
+
+    def export(self, df: pd.DataFrame, subject_cols: List[str],
+               bundle_name: str = "report_cards") -> List[str]:
+        """
+        Generate report cards for every student and stream them into ZIP files
+
+        Only one rendered PDF is held in memory at a time; each card is
+        written to the open archive on disk before the next one is built.
+
+        Args:
+            df: Processed DataFrame
+            subject_cols: Subject columns to include on each report card
+            bundle_name: Prefix for the bundle file names
+
+        Returns:
+            List of paths to the written ZIP bundles
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        total = len(df)
+        done = 0
+        bundle_paths = []
+        model = ResultsModel.from_frame(df, subject_cols, RESULT_COLUMNS)
+
+        for group_name, positions in self._groups(df):
+            prefix = f"{bundle_name}_{group_name}" if group_name else bundle_name
+            part = 1
+            bundle_path, archive = self._open_bundle(prefix, timestamp, part)
+            bundle_paths.append(bundle_path)
+            bundle_bytes = 0
+
+            try:
+                for student in model.records(positions):
+                    pdf_data = self._render(student, subject_cols)
+
+                    if (self.max_bundle_bytes and archive.infolist()
+                            and bundle_bytes + len(pdf_data) > self.max_bundle_bytes):
+                        archive.close()
+                        part += 1
+                        bundle_path, archive = self._open_bundle(prefix, timestamp, part)
+                        bundle_paths.append(bundle_path)
+                        bundle_bytes = 0
+
+                    archive.writestr(self._entry_name(student), pdf_data)
+                    bundle_bytes += archive.infolist()[-1].compress_size
+
+                    done += 1
+                    if self.progress_callback:
+                        self.progress_callback(done, total, bundle_path)
+            finally:
+                archive.close()
+
+        return bundle_paths
+
+    def _groups(self, df: pd.DataFrame) -> Iterable[Tuple[str, np.ndarray]]:
+        """
+        Split the frame into the groups that get their own bundles
+
+        Args:
+            df: Processed DataFrame
+
+        Yields:
+            Tuple of (group name, row positions in the group)
+        """
+        if self.split_by_section and 'Section' in df.columns:
+            # Blank sections share one bundle; labels that sanitize alike (1 and '1') are merged
+            groups = {}
+            for section, positions in df.groupby('Section', dropna=False).indices.items():
+                blank = pd.isna(section) or not str(section).strip()
+                groups.setdefault(UNASSIGNED_SECTION if blank else self._safe_name(section), []).append(positions)
+            for name in sorted(groups, key=lambda name: (name == UNASSIGNED_SECTION, name)):
+                yield name, np.sort(np.concatenate(groups[name]))
+        else:
+            yield "", np.arange(len(df))
+
+    def _open_bundle(self, prefix: str, timestamp: str, part: int) -> Tuple[str, zipfile.ZipFile]:
+        """
+        Open a new ZIP bundle for writing
+
+        Args:
+            prefix: Bundle file name prefix
+            timestamp: Export timestamp shared by all parts
+            part: Part number (only added to the name when splitting by size)
+
+        Returns:
+            Tuple of (bundle path, open ZipFile)
+        """
+        suffix = f"_part{part}" if self.max_bundle_bytes else ""
+        bundle_path = os.path.join(self.output_dir, f"{prefix}_{timestamp}{suffix}.zip")
+        return bundle_path, zipfile.ZipFile(bundle_path, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def _render(self, student: Dict, subject_cols: List[str]) -> bytes:
+        """
+        Render one report card to bytes
+
+        Args:
+            student: Processed row for the student
+            subject_cols: Subject columns to include
+
+        Returns:
+            PDF file contents
+        """
+        buffer = io.BytesIO()
+        self.report_generator.generate_student_report(student, subject_cols, buffer)
+        return buffer.getvalue()
+
+    def _entry_name(self, student: Dict) -> str:
+        """
+        Build the file name of a report card inside the archive
+
+        Args:
+            student: Processed row for the student
+
+        Returns:
+            Archive entry name
+        """
+        return f"{self._safe_name(student['Roll_No'])}_{self._safe_name(student['Student_Name'])}.pdf"
+
+    @staticmethod
+    def _safe_name(value) -> str:
+        """
+        Make a value safe to use in file names
+
+        Args:
+            value: Raw value (roll number, name, section)
+
+        Returns:
+            Sanitized string
+        """
+        return re.sub(r'[^A-Za-z0-9_-]+', '_', str(value)).strip('_') or "unknown"
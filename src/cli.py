@@ -0,0 +1,268 @@
+"""
+Command Line Interface Module
+Runs DataProcessor -> Analyzer -> PDFReportGenerator on one or many
+workbooks without Streamlit and prints a JSON summary
+
+Usage:
+    python -m src.cli data/*.xlsx --output-dir outputs/batch --workers 4
+
+Exit codes:
+    0  every workbook processed successfully
+    1  at least one workbook failed validation
+    2  at least one workbook could not be loaded
+    3  processing failed unexpectedly for at least one workbook
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from src import instrumentation
+from src.performance import setting
+
+EXIT_OK = 0
+EXIT_INVALID = 1
+EXIT_LOAD_ERROR = 2
+EXIT_ERROR = 3
+
+
+def to_jsonable(value):
+    """
+    Convert numpy scalars and containers into JSON serializable values
+
+    Args:
+        value: Value to convert
+
+    Returns:
+        JSON serializable value
+    """
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+def output_name(file_path: str) -> str:
+    """
+    Name of a workbook's output directory
+
+    Args:
+        file_path: Path to the Excel file
+
+    Returns:
+        File name stem plus a short hash of the absolute path, so workbooks
+        with the same name in different folders never share outputs
+    """
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    digest = hashlib.sha256(os.path.abspath(file_path).encode()).hexdigest()[:8]
+    return f"{stem}_{digest}"
+
+
+def process_file(file_path: str, output_dir: str, charts: bool = True,
+                 report: bool = True, export: bool = True, trace: bool = False,
+                 data: Optional[bytes] = None, totals: bool = False) -> Dict:
+    """
+    Process one workbook and write its outputs
+
+    Runs in a worker process, so heavy modules are imported here.
+
+    Args:
+        file_path: Path to the Excel file
+        output_dir: Base output directory (a sub-directory per workbook is used)
+        charts: Whether to render charts
+        report: Whether to build the PDF report
+        export: Whether to write the Excel export
+        trace: Record instrumentation spans, log them to stderr and add
+            them to the result
+        data: Workbook contents already read by the caller (read from
+            file_path when not given)
+        totals: Add the additive statistics totals (see
+            Analyzer.get_statistics_totals) to the result
+
+    Returns:
+        Dictionary with status, statistics, per-stage timings and output paths
+    """
+    from src.data_processor import DataProcessor
+    from src.analyzer import Analyzer
+
+    if trace:
+        instrumentation.enable()
+        instrumentation.log_to_stream(sys.stderr)
+        instrumentation.clear()
+
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    file_output_dir = os.path.join(output_dir, output_name(file_path))
+    result = {'file': file_path, 'status': 'ok', 'message': '', 'errors': [],
+              'statistics': {}, 'timings': {}, 'outputs': {}}
+    timings = result['timings']
+    started = time.perf_counter()
+
+    def finish(result):
+        timings['total'] = round(time.perf_counter() - started, 4)
+        if trace:
+            result['spans'] = instrumentation.recent_spans()
+        return result
+
+    def timed(stage, func, *args, **kwargs):
+        stage_start = time.perf_counter()
+        value = func(*args, **kwargs)
+        timings[stage] = round(time.perf_counter() - stage_start, 4)
+        return value
+
+    processor = DataProcessor()
+    if data is None:
+        loaded, message = timed('load', processor.load_excel, file_path)
+    else:
+        loaded, message = timed('load', processor.load_buffer, data)
+    result['message'] = message
+    if not loaded:
+        result['status'] = 'load_error'
+        return finish(result)
+
+    is_valid, errors = timed('validate', processor.validate_data)
+    if not is_valid:
+        result['status'] = 'invalid'
+        result['errors'] = list(errors)
+        return finish(result)
+
+    df = timed('grade', processor.calculate_grades)
+
+    analyzer = Analyzer(df, output_dir=os.path.join(file_output_dir, 'charts'))
+    stats = timed('statistics', analyzer.get_statistics)
+    toppers = timed('toppers', analyzer.get_toppers, top_n=5)
+    weak_subjects = timed('weak_subjects', analyzer.get_weak_subjects)
+    strong_subjects = timed('strong_subjects', analyzer.get_strong_subjects)
+    result['statistics'] = to_jsonable(stats)
+    if totals:
+        result['totals'] = analyzer.get_statistics_totals()
+
+    chart_paths = {}
+    if charts:
+        chart_paths = timed('charts', analyzer.generate_all_charts)
+        result['outputs']['charts'] = chart_paths
+
+    if report:
+        from src.report_generator import PDFReportGenerator
+
+        pdf_gen = PDFReportGenerator(output_dir=file_output_dir)
+        result['outputs']['report'] = timed(
+            'report', pdf_gen.generate_report,
+            df, stats, toppers, weak_subjects, strong_subjects, chart_paths
+        )
+
+    if export:
+        from src.excel_exporter import ExcelExporter
+
+        exporter = ExcelExporter(output_dir=file_output_dir)
+        result['outputs']['export'] = timed(
+            'export', exporter.export,
+            df, stats, analyzer.get_subject_statistics(), toppers,
+            file_name=f"{name}_results.xlsx"
+        )
+
+    return finish(result)
+
+
+def collect(file_path: str, func, *args, **kwargs) -> Dict:
+    """
+    Call a processing function and turn unexpected exceptions into a result
+
+    Args:
+        file_path: Workbook the call belongs to
+        func: Callable returning a per-file result dictionary
+
+    Returns:
+        Per-file result dictionary
+    """
+    try:
+        return func(*args, **kwargs)
+    except Exception as e:
+        return {'file': file_path, 'status': 'error', 'message': f"Error processing file: {str(e)}",
+                'errors': [], 'statistics': {}, 'timings': {}, 'outputs': {}}
+
+
+def exit_code(results: List[Dict]) -> int:
+    """
+    Derive the process exit code from per-file results
+
+    Args:
+        results: Per-file result dictionaries
+
+    Returns:
+        Exit code
+    """
+    statuses = {result['status'] for result in results}
+    if 'error' in statuses:
+        return EXIT_ERROR
+    if 'load_error' in statuses:
+        return EXIT_LOAD_ERROR
+    if 'invalid' in statuses:
+        return EXIT_INVALID
+    return EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="Process exam result workbooks without the Streamlit UI"
+    )
+    parser.add_argument('files', nargs='+', help="Excel workbooks to process")
+    parser.add_argument('--output-dir', default="outputs/batch",
+                        help="directory for charts, reports and exports (default: outputs/batch)")
+    parser.add_argument('--workers', type=int, default=setting('workers'),
+                        help="number of worker processes (default: available CPUs, or the tuned setting)")
+    parser.add_argument('--no-charts', action='store_true', help="skip chart rendering")
+    parser.add_argument('--no-report', action='store_true', help="skip the PDF report")
+    parser.add_argument('--no-export', action='store_true', help="skip the Excel export")
+    parser.add_argument('--trace', action='store_true',
+                        help="record per-stage spans (wall, CPU, peak memory) as JSON lines on stderr")
+    parser.add_argument('--indent', type=int, default=None, help="indent the JSON output")
+    return parser
+
+
+def main(argv=None) -> int:
+    """Run the batch and print a JSON summary to stdout"""
+    args = build_parser().parse_args(argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    options = dict(output_dir=args.output_dir, charts=not args.no_charts,
+                   report=not args.no_report, export=not args.no_export, trace=args.trace)
+    workers = max(1, min(args.workers, len(args.files)))
+    started = time.perf_counter()
+
+    if workers == 1:
+        results = [collect(path, process_file, path, **options) for path in args.files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(process_file, path, **options) for path in args.files]
+            results = [collect(path, future.result) for path, future in zip(args.files, futures)]
+
+    code = exit_code(results)
+    summary = {
+        'files': results,
+        'summary': {
+            'processed': len(results),
+            'ok': sum(result['status'] == 'ok' for result in results),
+            'invalid': sum(result['status'] == 'invalid' for result in results),
+            'load_errors': sum(result['status'] == 'load_error' for result in results),
+            'errors': sum(result['status'] == 'error' for result in results),
+            'workers': workers,
+            'wall_seconds': round(time.perf_counter() - started, 4),
+            'exit_code': code
+        }
+    }
+    print(json.dumps(summary, indent=args.indent))
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
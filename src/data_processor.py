@@ -3,35 +3,69 @@ Data Processing Module
 Handles data validation, calculations for grades, GPA, and pass/fail status
 """
 
+import io
+import os
 import pandas as pd
 import numpy as np
-from typing import Tuple, Dict, List
+from typing import BinaryIO, Tuple, Dict, List, Optional, Union
 
-# Configuration constants
-PASS_MARKS = 40
-MIN_MARKS = 0
-MAX_MARKS = 100
+from src.instrumentation import instrumented
+from src.results_model import ResultsModel, marks_matrix, select_columns
+from src.relative_grading import percentile_ranks, z_scores
+from src.roll_index import RollIndex
+from src.fast_xlsx import UnsupportedWorkbook, read_head, read_sheet
+from src.performance import setting
+# Built-in grading constants are re-exported; the rules in effect come from the grading policy
+from src.grading_policy import (PASS_MARKS, MIN_MARKS, MAX_MARKS, GRADE_CUTOFFS,
+                                GPA_POINTS, GradingPolicy, get_grading_policy)
 
-# Grade cutoff points (in ascending order)
-GRADE_CUTOFFS = {
-    'A+': 90,
-    'A': 80,
-    'B+': 70,
-    'B': 60,
-    'C+': 50,
-    'C': 40,
-    'F': 0
-}
+# Identity columns (Section is optional) and columns added by calculate_grades
+ID_COLUMNS = ['Student_Name', 'Roll_No', 'Section']
+RESULT_COLUMNS = ['Average', 'GPA', 'Grade', 'Status']
+NON_SUBJECT_COLUMNS = ID_COLUMNS + RESULT_COLUMNS
+
+# Duplicate roll numbers listed in a validation message
+MAX_LISTED_DUPLICATES = 20
+
+# Tiered validation: rows checked by precheck() per file, and the share of
+# invalid sampled rows above which a file is rejected without a full pass
+PRECHECK_SAMPLE_ROWS = 1000
+MAX_SAMPLE_INVALID_SHARE = 0.5
+
+# Set to 1 to read workbooks with the parallel reader in src/fast_xlsx.py
+FAST_READER_ENV = 'RESULT_SYSTEM_FAST_XLSX'
 
 
 class DataProcessor:
     """Handle data validation and processing for exam results"""
     
-    def __init__(self):
-        """Initialize the data processor"""
+    def __init__(self, policy: GradingPolicy = None, fast_reader: Optional[bool] = None):
+        """
+        Initialize the data processor
+        
+        Args:
+            policy: Grading policy (defaults to the configured policy)
+            fast_reader: Read workbooks with the parallel XML reader (defaults
+                to the RESULT_SYSTEM_FAST_XLSX environment variable, then the
+                fast_xlsx performance setting)
+        """
+        self.policy = policy or get_grading_policy()
+        if fast_reader is None:
+            env = os.environ.get(FAST_READER_ENV, '').lower()
+            fast_reader = env not in ('0', 'false', 'no') if env else bool(setting('fast_xlsx'))
+        self.fast_reader = fast_reader
         self.df = None
+        self.model = None
+        self.relative_ranks = None
+        self.roll_index = None
+        self.row_sources = None
+        self.file_offsets = {}
+        self.prechecked = []
+        self.sample = None
+        self._precheck_source = None
         self.validation_errors = []
     
+    @instrumented()
     def load_excel(self, file_path: str) -> Tuple[bool, str]:
         """
         Load Excel file with validation
@@ -43,19 +77,238 @@ class DataProcessor:
             Tuple of (success: bool, message: str)
         """
         try:
-            self.df = pd.read_excel(file_path)
-            
-            # Basic validation
-            if self.df.empty:
-                return False, "File is empty"
-            
-            if 'Student_Name' not in self.df.columns or 'Roll_No' not in self.df.columns:
-                return False, "Required columns 'Student_Name' and 'Roll_No' not found"
+            self._keep_precheck(file_path)
+            self.df = self._read_workbook(file_path)
+            self.row_sources = None
+            return self._check_loaded()
+        except Exception as e:
+            return False, f"Error loading file: {str(e)}"
+    
+    @instrumented()
+    def load_buffer(self, data: Union[bytes, BinaryIO]) -> Tuple[bool, str]:
+        """
+        Load an Excel workbook held in memory, without touching the disk
+        
+        Args:
+            data: Workbook contents as bytes or a readable binary buffer
             
-            return True, "File loaded successfully"
+        Returns:
+            Tuple of (success: bool, message: str)
+        """
+        try:
+            self._keep_precheck(data)
+            self.df = self._read_workbook(self._as_buffer(data))
+            self.row_sources = None
+            return self._check_loaded()
         except Exception as e:
             return False, f"Error loading file: {str(e)}"
     
+    @instrumented()
+    def load_many(self, sources: List[Tuple[str, Union[str, bytes, BinaryIO]]]) -> Tuple[bool, str]:
+        """
+        Load several workbooks (e.g. one per section) as one cohort
+        
+        Args:
+            sources: List of (label, path or contents) pairs; labels name
+                the files in validation messages
+            
+        Returns:
+            Tuple of (success: bool, message: str)
+        """
+        self._keep_precheck(sources)
+        frames = []
+        for label, source in sources:
+            try:
+                if isinstance(source, (str, os.PathLike)):
+                    frame = self._read_workbook(source)
+                else:
+                    frame = self._read_workbook(self._as_buffer(source))
+            except Exception as e:
+                return False, f"Error loading file {label}: {str(e)}"
+            if frame.empty:
+                return False, f"File {label} is empty"
+            frames.append(frame)
+        
+        if not frames:
+            return False, "No files to load"
+        
+        self.df = pd.concat(frames, ignore_index=True)
+        self.row_sources = np.repeat(np.array([label for label, _ in sources], dtype=object),
+                                     [len(frame) for frame in frames])
+        starts = np.cumsum([0] + [len(frame) for frame in frames[:-1]])
+        self.file_offsets = {label: int(start) for (label, _), start in zip(sources, starts)}
+        loaded, message = self._check_loaded()
+        if loaded:
+            message = f"{len(frames)} files loaded successfully ({len(self.df)} students)"
+        return loaded, message
+    
+    @staticmethod
+    def _as_buffer(data: Union[bytes, BinaryIO]) -> BinaryIO:
+        """Wrap raw bytes in a buffer pandas can read"""
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return io.BytesIO(data)
+        return data
+    
+    def _read_workbook(self, source: Union[str, BinaryIO]) -> pd.DataFrame:
+        """
+        Read a workbook's first sheet
+        
+        Args:
+            source: Path or readable binary buffer
+            
+        Returns:
+            DataFrame as pandas.read_excel returns it
+        """
+        if self.fast_reader:
+            try:
+                return read_sheet(source)
+            except UnsupportedWorkbook:
+                pass  # e.g. date columns; pandas reads those
+        return pd.read_excel(source)
+    
+    @instrumented()
+    def precheck(self, source, sample_rows: int = PRECHECK_SAMPLE_ROWS) -> Tuple[bool, List[str]]:
+        """
+        Quick first tier of validation: schema and header check plus a
+        validation of the first rows, before the file is loaded in full
+        
+        Only the header and the first sample_rows rows of each file are
+        parsed, so this returns quickly however large the upload. Rows
+        checked here are skipped when validate_data() runs on the same
+        source afterwards, so both tiers together validate each row once.
+        
+        Args:
+            source: Path or contents (bytes or buffer), or a list of
+                (label, path or contents) pairs as for load_many()
+            sample_rows: Rows to validate from the start of each file
+            
+        Returns:
+            Tuple of (proceed: bool, errors: List[str]). proceed is False
+            when the upload is rejected outright (unreadable, wrong columns
+            or mostly invalid); errors found in the sample are reported
+            either way. The rows read are kept in self.sample once a
+            file's columns pass the schema check
+        """
+        self.prechecked = []
+        self.sample = None
+        self._precheck_source = source
+        sources = source if isinstance(source, list) else [(None, source)]
+        errors = []
+        
+        for label, item in sources:
+            prefix = f"{label}: " if label is not None else ""
+            self.sample = None
+            try:
+                sample = read_head(item, sample_rows)
+            except Exception:
+                # Not a plain workbook the streaming reader understands
+                try:
+                    sample = pd.read_excel(item if isinstance(item, (str, os.PathLike)) else self._as_buffer(item),
+                                           nrows=sample_rows)
+                except Exception as e:
+                    return False, [f"{prefix}Error loading file: {str(e)}"]
+                if hasattr(item, 'seek'):
+                    item.seek(0)
+            
+            if 'Student_Name' not in sample.columns or 'Roll_No' not in sample.columns:
+                return False, [f"{prefix}Required columns 'Student_Name' and 'Roll_No' not found"]
+            subject_cols = [col for col in sample.columns if col not in ID_COLUMNS]
+            if not subject_cols:
+                return False, [f"{prefix}No subject columns found (only Student_Name, Roll_No and Section)"]
+            if sample.empty:
+                return False, [f"{prefix}File is empty"]
+            non_numeric = [str(col) for col in subject_cols if not pd.api.types.is_numeric_dtype(sample[col])]
+            if non_numeric:
+                return False, [f"{prefix}Non-numeric marks in: {', '.join(non_numeric)}"]
+            
+            self.sample = sample
+            findings = self._row_findings(sample, subject_cols)
+            sample_errors = self._finding_messages(findings, sample['Student_Name'].to_numpy())
+            errors.extend(prefix + error for error in sample_errors)
+            
+            bad_rows = len(np.unique(np.concatenate(list(findings.values()))))
+            if bad_rows > MAX_SAMPLE_INVALID_SHARE * len(sample):
+                errors.insert(0, f"{prefix}{bad_rows} of the first {len(sample)} rows are invalid")
+                return False, errors
+            self.prechecked.append((label, len(sample), subject_cols, findings))
+        
+        return True, errors
+    
+    def _keep_precheck(self, source) -> None:
+        """Forget precheck() results when a different source is loaded"""
+        if self._precheck_source is not source and not self._same_source(source):
+            self.prechecked = []
+            self._precheck_source = None
+        self.file_offsets = {}
+    
+    def _same_source(self, source) -> bool:
+        """Whether source equals the prechecked source (paths or contents)"""
+        try:
+            return bool(source == self._precheck_source)
+        except Exception:
+            return False
+    
+    def _row_findings(self, frame: pd.DataFrame, subject_cols: List[str]) -> Dict[Optional[str], np.ndarray]:
+        """
+        Row-level checks: missing marks and marks outside the policy's range
+        
+        Args:
+            frame: Rows to check
+            subject_cols: Subject columns
+            
+        Returns:
+            Dictionary of None (missing marks) or subject name to the
+            positions of failing rows within frame
+        """
+        findings = {None: np.flatnonzero(frame[subject_cols].isna().any(axis=1).to_numpy())}
+        for col in subject_cols:
+            values = frame[col]
+            invalid = (values < self.policy.min_marks) | (values > self.policy.max_marks)
+            findings[col] = np.flatnonzero(invalid.to_numpy())
+        return findings
+    
+    @staticmethod
+    def _finding_messages(findings: Dict[Optional[str], np.ndarray], names: np.ndarray) -> List[str]:
+        """
+        Format row-level findings as validation errors
+        
+        Args:
+            findings: Result of _row_findings()
+            names: Student names, indexed like the findings' positions
+            
+        Returns:
+            List of error messages
+        """
+        messages = []
+        if len(findings[None]):
+            messages.append(f"Missing marks for students: {', '.join(names[findings[None]].tolist())}")
+        for col, positions in findings.items():
+            if col is not None and len(positions):
+                messages.append(f"Invalid marks in {col} for: {', '.join(names[positions].tolist())}")
+        return messages
+    
+    def _check_loaded(self) -> Tuple[bool, str]:
+        """
+        Basic checks on freshly loaded data
+        
+        Returns:
+            Tuple of (success: bool, message: str)
+        """
+        self.model = None
+        self.relative_ranks = None
+        self.roll_index = None
+        if self.df.empty:
+            return False, "File is empty"
+        
+        if 'Student_Name' not in self.df.columns or 'Roll_No' not in self.df.columns:
+            return False, "Required columns 'Student_Name' and 'Roll_No' not found"
+        
+        # Built once per load; used for duplicate checks and student lookup
+        self.roll_index = RollIndex(self.df['Roll_No'])
+        
+        return True, "File loaded successfully"
+    
+    @instrumented()
     def validate_data(self) -> Tuple[bool, List[str]]:
         """
         Validate data quality
@@ -69,32 +322,83 @@ class DataProcessor:
             return False, ["No data loaded"]
         
         # Check for required columns
-        required_cols = ['Student_Name', 'Roll_No']
-        subject_cols = [col for col in self.df.columns if col not in required_cols]
+        subject_cols = [col for col in self.df.columns if col not in ID_COLUMNS]
         
         if not subject_cols:
-            self.validation_errors.append("No subject columns found (only Student_Name and Roll_No)")
+            self.validation_errors.append("No subject columns found (only Student_Name, Roll_No and Section)")
             return False, self.validation_errors
         
-        # Check for missing values
-        missing_mask = self.df[subject_cols].isna().any(axis=1)
-        if missing_mask.any():
-            missing_students = self.df[missing_mask]['Student_Name'].tolist()
+        # Check for duplicate roll numbers (also across merged files)
+        duplicates = self.roll_index.duplicates() if self.roll_index is not None else {}
+        if duplicates:
             self.validation_errors.append(
-                f"Missing marks for students: {', '.join(missing_students)}"
+                f"Duplicate Roll_No values: {self._describe_duplicates(duplicates)}"
             )
         
-        # Check for invalid marks (not in 0-100 range)
-        for col in subject_cols:
-            invalid_mask = (self.df[col] < MIN_MARKS) | (self.df[col] > MAX_MARKS)
-            if invalid_mask.any():
-                invalid_students = self.df[invalid_mask]['Student_Name'].tolist()
-                self.validation_errors.append(
-                    f"Invalid marks in {col} for: {', '.join(invalid_students)}"
-                )
+        # Missing and out-of-range marks; rows already checked by precheck()
+        # are not checked again
+        findings = self._full_findings(subject_cols)
+        self.validation_errors.extend(self._finding_messages(findings, self.df['Student_Name'].to_numpy()))
         
         return len(self.validation_errors) == 0, self.validation_errors
     
+    def _full_findings(self, subject_cols: List[str]) -> Dict[Optional[str], np.ndarray]:
+        """
+        Row-level findings for the loaded data, reusing precheck() results
+        
+        Args:
+            subject_cols: Subject columns
+            
+        Returns:
+            Findings as from _row_findings(), with positions in self.df
+        """
+        n = len(self.df)
+        checked = []
+        for label, rows, columns, findings in self.prechecked:
+            start = 0 if label is None else self.file_offsets.get(label)
+            # Files lacking another file's subjects have missing marks the
+            # sample did not see, so those rows are checked again
+            if start is None or columns != subject_cols:
+                continue
+            checked.append((start, min(start + rows, n), findings))
+        checked.sort(key=lambda item: item[0])
+        
+        # Check the row ranges between the prechecked samples
+        parts = {col: [] for col in [None] + subject_cols}
+        position = 0
+        for start, stop, findings in checked + [(n, n, None)]:
+            if start > position:
+                for col, rows in self._row_findings(self.df.iloc[position:start], subject_cols).items():
+                    parts[col].append(rows + position)
+            if findings is not None:
+                for col in parts:
+                    parts[col].append(findings[col] + start)
+            position = max(position, stop)
+        
+        return {col: np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+                for col, rows in parts.items()}
+    
+    def _describe_duplicates(self, duplicates: Dict[str, np.ndarray]) -> str:
+        """
+        Describe duplicated roll numbers for a validation message
+        
+        Args:
+            duplicates: Roll number to row positions
+            
+        Returns:
+            Text such as "101 (Aarav Patel in a.xlsx, Bhavna Singh in b.xlsx)"
+        """
+        names = self.df['Student_Name'].to_numpy()
+        parts = []
+        for roll, positions in list(duplicates.items())[:MAX_LISTED_DUPLICATES]:
+            rows = [str(names[i]) if self.row_sources is None else f"{names[i]} in {self.row_sources[i]}"
+                    for i in positions]
+            parts.append(f"{roll} ({', '.join(rows)})")
+        if len(duplicates) > MAX_LISTED_DUPLICATES:
+            parts.append(f"and {len(duplicates) - MAX_LISTED_DUPLICATES} more")
+        return ", ".join(parts)
+    
+    @instrumented()
     def calculate_grades(self) -> pd.DataFrame:
         """
         Calculate grades for all students based on average marks
@@ -105,81 +409,98 @@ class DataProcessor:
         if self.df is None:
             return None
         
-        df_result = self.df.copy()
-        
-        # Get subject columns (all except Student_Name and Roll_No)
-        subject_cols = [col for col in df_result.columns 
-                       if col not in ['Student_Name', 'Roll_No']]
-        
-        # Calculate average marks
-        df_result['Average'] = df_result[subject_cols].mean(axis=1)
+        # Get subject columns (all except identity and result columns)
+        subject_cols = [col for col in self.df.columns 
+                       if col not in NON_SUBJECT_COLUMNS]
+        other_cols = [col for col in self.df.columns 
+                     if col not in subject_cols and col not in RESULT_COLUMNS]
         
-        # Calculate GPA (assuming 4.0 scale)
-        df_result['GPA'] = df_result['Average'].apply(self._calculate_gpa)
+        # Marks go into one matrix; the processed frame's subject columns are
+        # views of it, so the loaded frame is never duplicated
+        model = ResultsModel(select_columns(self.df, other_cols), subject_cols, marks_matrix(self.df, subject_cols))
         
-        # Assign grades
-        df_result['Grade'] = df_result['Average'].apply(self._get_grade)
+        # Average, grade, GPA and pass/fail from the grading policy
+        model.set_derived(self.policy.evaluate(model.marks, subject_cols))
         
-        # Determine pass/fail (average >= 40)
-        df_result['Status'] = df_result['Average'].apply(
-            lambda x: 'PASS' if x >= PASS_MARKS else 'FAIL'
-        )
-        
-        self.df = df_result
-        return df_result
+        self.model = model
+        self.relative_ranks = None
+        self.df = model.to_frame([col for col in self.df.columns if col not in RESULT_COLUMNS] + RESULT_COLUMNS)
+        return self.df
     
-    def _get_grade(self, marks: float) -> str:
+    @instrumented()
+    def get_relative_ranks(self) -> pd.DataFrame:
         """
-        Determine grade based on marks
+        Get every student's percentile rank and z-score in each subject and
+        overall (by average), computed once with one sort per column
+        
+        Kept apart from the processed data so its columns stay the same in
+        both grading modes. Percentiles use mid-ranks, so tied marks share a rank.
         
-        Args:
-            marks: Average marks
-            
         Returns:
-            Grade letter
+            DataFrame with Student_Name, Roll_No and '<Subject> Percentile',
+            '<Subject> Z-Score', 'Overall Percentile', 'Overall Z-Score'
+            columns, or None before grades are calculated
         """
-        for grade, cutoff in sorted(GRADE_CUTOFFS.items(), 
-                                   key=lambda x: x[1], reverse=True):
-            if marks >= cutoff:
-                return grade
-        return 'F'
+        if self.model is None:
+            return None
+        
+        if self.relative_ranks is None:
+            model = self.model
+            average = model.derived['Average']
+            percentiles = percentile_ranks(model.marks)
+            scores = z_scores(model.marks)
+            
+            columns = {col: model.identity[col].to_numpy()
+                       for col in ['Student_Name', 'Roll_No'] if col in model.identity.columns}
+            for j, subject in enumerate(model.subjects):
+                columns[f"{subject} Percentile"] = percentiles[:, j]
+                columns[f"{subject} Z-Score"] = scores[:, j]
+            columns['Overall Percentile'] = percentile_ranks(average)
+            columns['Overall Z-Score'] = z_scores(average)
+            self.relative_ranks = pd.DataFrame(columns)
+        
+        return self.relative_ranks
     
-    def _calculate_gpa(self, marks: float) -> float:
+    def get_student(self, roll_no) -> Optional[Dict]:
         """
-        Calculate GPA on 4.0 scale (90-100: 4.0, 0-10: 0.0)
+        Look up one student's full record by roll number (hash lookup)
         
         Args:
-            marks: Average marks
+            roll_no: Roll number (101, '101' and 101.0 match the same student)
             
         Returns:
-            GPA value
-        """
-        if marks >= 90:
-            return 4.0
-        elif marks >= 80:
-            return 3.5
-        elif marks >= 70:
-            return 3.0
-        elif marks >= 60:
-            return 2.5
-        elif marks >= 50:
-            return 2.0
-        elif marks >= 40:
-            return 1.5
-        else:
-            return 0.0
+            Dictionary of the student's columns, or None when not found
+            (the first row is returned if the roll is duplicated)
+        """
+        if self.roll_index is None:
+            return None
+        positions = self.roll_index.lookup(roll_no)
+        if not len(positions):
+            return None
+        return self.df.iloc[int(positions[0])].to_dict()
     
     def get_subject_columns(self) -> List[str]:
         """
-        Get list of subject columns (excluding Student_Name and Roll_No)
+        Get list of subject columns (excluding identity and result columns)
         
         Returns:
             List of subject column names
         """
+        if self.model is not None:
+            return list(self.model.subjects)
         if self.df is None:
             return []
         return [col for col in self.df.columns 
-               if col not in ['Student_Name', 'Roll_No', 'Average', 'GPA', 'Grade', 'Status']]
+               if col not in NON_SUBJECT_COLUMNS]
+    
+    def get_results_model(self) -> ResultsModel:
+        """
+        Get the numeric results model behind the processed data
+        
+        Returns:
+            ResultsModel, or None before grades are calculated
+        """
+        return self.model
     
     def get_processed_data(self) -> pd.DataFrame:
         """
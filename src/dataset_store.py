@@ -0,0 +1,266 @@
+"""
+Dataset Store Module
+Process-wide store sharing one processed dataset between every session
+that opens the same upload, with reference counting, a memory budget
+and LRU eviction of unreferenced datasets
+"""
+
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from src.performance import setting
+
+# Default memory budget, overridable with RESULT_SYSTEM_STORE_BUDGET_MB
+DEFAULT_BUDGET_MB = 1024
+
+
+def estimate_bytes(value: Any) -> int:
+    """
+    Estimate the memory held by a stored dataset
+
+    Uses the value's own memory_bytes() when it has one.
+
+    Args:
+        value: Stored dataset
+
+    Returns:
+        Estimated size in bytes
+    """
+    if hasattr(value, 'memory_bytes'):
+        return int(value.memory_bytes())
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage(deep=True).sum())
+    return 0
+
+
+class _Entry:
+    """One stored dataset"""
+
+    __slots__ = ('value', 'size', 'refcount')
+
+    def __init__(self, value: Any, size: int):
+        self.value = value
+        self.size = size
+        self.refcount = 0
+
+
+class DatasetHandle:
+    """
+    A session's reference to a stored dataset
+
+    The reference is released by release() or, failing that, when the
+    handle is garbage collected together with the session that held it.
+    """
+
+    def __init__(self, store: 'DatasetStore', key: str, value: Any):
+        """
+        Initialize handle
+
+        Args:
+            store: Store the dataset lives in
+            key: Dataset key
+            value: The shared dataset (treat as read-only)
+        """
+        self.key = key
+        self.value = value
+        self._finalizer = weakref.finalize(self, store._release, key)
+
+    def release(self) -> None:
+        """Drop this reference (safe to call more than once)"""
+        self._finalizer()
+
+
+class DatasetStore:
+    """Share immutable processed datasets across sessions within a memory budget"""
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_MB * 1024 * 1024,
+                 size_of: Callable[[Any], int] = estimate_bytes):
+        """
+        Initialize dataset store
+
+        Args:
+            budget_bytes: Resident bytes above which unreferenced datasets are evicted
+            size_of: Function estimating the size of a dataset
+        """
+        self.budget_bytes = budget_bytes
+        self._size_of = size_of
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+        self._resident_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def acquire(self, key: str, loader: Callable[[], Any]) -> DatasetHandle:
+        """
+        Get a referenced handle to a dataset, building it on a miss
+
+        Concurrent acquires of the same missing key build it only once;
+        the other callers wait and then share the result.
+
+        Args:
+            key: Dataset key (e.g. content hash and grading config)
+            loader: Builds the dataset when it is not stored
+
+        Returns:
+            DatasetHandle keeping the dataset resident until released
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                entry.refcount += 1
+                return DatasetHandle(self, key, entry.value)
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    # Built by a concurrent caller while this one waited
+                    self._misses -= 1
+                    self._hits += 1
+                    self._entries.move_to_end(key)
+                    entry.refcount += 1
+                    return DatasetHandle(self, key, entry.value)
+            try:
+                value = loader()
+                size = self._size_of(value)
+            except BaseException:
+                with self._lock:
+                    self._building.pop(key, None)
+                raise
+
+            # The entry must be visible before the key leaves _building, or a
+            # caller arriving in between would build it a second time
+            with self._lock:
+                entry = _Entry(value, size)
+                entry.refcount = 1
+                self._entries[key] = entry
+                self._resident_bytes += size
+                self._building.pop(key, None)
+                self._evict()
+        return DatasetHandle(self, key, value)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a stored dataset without holding a reference to it
+
+        Args:
+            key: Dataset key
+
+        Returns:
+            The dataset, or None when it is not stored
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            return entry.value if entry is not None else None
+
+    def contains(self, key: str) -> bool:
+        """
+        Check whether a dataset is stored, without counting a lookup or
+        changing its recency
+
+        Args:
+            key: Dataset key
+
+        Returns:
+            True when the dataset is resident
+        """
+        with self._lock:
+            return key in self._entries
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Report store metrics
+
+        Returns:
+            Dictionary with entries, resident bytes, budget, hits, misses,
+            hit rate, evictions and referenced entries
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'referenced_entries': sum(1 for entry in self._entries.values() if entry.refcount),
+                'references': sum(entry.refcount for entry in self._entries.values()),
+                'resident_bytes': self._resident_bytes,
+                'budget_bytes': self.budget_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions
+            }
+
+    def clear(self) -> None:
+        """Drop every unreferenced dataset"""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if not entry.refcount]:
+                self._remove(key)
+
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        """Find an entry, mark it recently used and count the lookup (lock held)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self._hits += 1
+        else:
+            self._misses += 1
+        return entry
+
+    def _release(self, key: str) -> None:
+        """Drop one reference to a dataset, re-measure it and evict if over budget"""
+        with self._lock:
+            entry = self._entries.get(key)
+            value = entry.value if entry is not None else None
+
+        # Datasets grow as sessions cache analysis on them; measure outside the lock
+        size = self._size_of(value) if value is not None else None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if size is not None and entry.value is value:
+                    self._resident_bytes += size - entry.size
+                    entry.size = size
+                if entry.refcount > 0:
+                    entry.refcount -= 1
+            self._evict()
+
+    def _evict(self) -> None:
+        """Evict least recently used unreferenced datasets until within budget (lock held)"""
+        if self._resident_bytes <= self.budget_bytes:
+            return
+        for key in [key for key, entry in self._entries.items() if not entry.refcount]:
+            if self._resident_bytes <= self.budget_bytes:
+                break
+            self._remove(key)
+            self._evictions += 1
+
+    def _remove(self, key: str) -> None:
+        """Remove an entry (lock held)"""
+        entry = self._entries.pop(key)
+        self._resident_bytes -= entry.size
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> DatasetStore:
+    """
+    Get the process-wide dataset store
+
+    Returns:
+        The shared DatasetStore (budget from RESULT_SYSTEM_STORE_BUDGET_MB or
+        the performance settings)
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            budget_mb = float(os.environ.get('RESULT_SYSTEM_STORE_BUDGET_MB') or setting('store_budget_mb'))
+            _store = DatasetStore(budget_bytes=int(budget_mb * 1024 * 1024))
+        return _store
@@ -0,0 +1,172 @@
+"""
+Excel Export Module
+Streams processed results, statistics, subject statistics and toppers
+into a multi-sheet Excel workbook
+"""
+
+import os
+import math
+import threading
+import uuid
+import pandas as pd
+from datetime import datetime
+from typing import Any, BinaryIO, Iterable, Optional, Sequence, Union
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from src.performance import setting
+
+
+class ExcelExporter:
+    """Export exam results to a multi-sheet xlsx using openpyxl write-only mode"""
+
+    def __init__(self, output_dir: str = "outputs/exports", chunk_size: Optional[int] = None):
+        """
+        Initialize Excel exporter
+
+        Args:
+            output_dir: Directory to save exported workbooks
+            chunk_size: Number of rows pulled out of the DataFrame at a time
+                (defaults to the export_chunk_rows performance setting)
+        """
+        self.output_dir = output_dir
+        self.chunk_size = chunk_size or setting('export_chunk_rows')
+
+    def export(self, df: pd.DataFrame, stats: dict, subject_stats: pd.DataFrame,
+               toppers: pd.DataFrame, file_name: str = None) -> str:
+        """
+        Export results to an xlsx file in the output directory
+
+        Args:
+            df: Processed DataFrame
+            stats: Statistics dictionary
+            subject_stats: Per-subject statistics DataFrame
+            toppers: Top performers DataFrame
+            file_name: Optional file name (a unique timestamped name is used
+                otherwise, so concurrent exports never share a file)
+
+        Returns:
+            Path to the exported workbook
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        if file_name is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            file_name = f"exam_results_{timestamp}_{uuid.uuid4().hex[:8]}.xlsx"
+
+        # Readers only ever see a complete workbook
+        file_path = os.path.join(self.output_dir, file_name)
+        temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            self.write(temp_path, df, stats, subject_stats, toppers)
+            os.replace(temp_path, file_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return file_path
+
+    def write(self, target: Union[str, BinaryIO], df: pd.DataFrame, stats: dict,
+              subject_stats: pd.DataFrame, toppers: pd.DataFrame) -> None:
+        """
+        Write results to a path or binary buffer
+
+        Rows are appended to write-only worksheets, which openpyxl spools to
+        disk as they arrive, so memory use does not grow with the row count.
+
+        Args:
+            target: File path or writable binary buffer
+            df: Processed DataFrame
+            stats: Statistics dictionary
+            subject_stats: Per-subject statistics DataFrame
+            toppers: Top performers DataFrame
+        """
+        wb = Workbook(write_only=True)
+
+        self.write_sheet(wb, 'Results', df)
+
+        ws = wb.create_sheet('Statistics')
+        ws.append(self._header(ws, ['Metric', 'Value']))
+        for metric, value in stats.items():
+            ws.append([metric, self._to_cell_value(value)])
+
+        self.write_sheet(wb, 'Subject Statistics', subject_stats)
+        self.write_sheet(wb, 'Toppers', toppers)
+
+        wb.save(target)
+
+    def write_sheet(self, wb: Workbook, title: str, data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                    columns: Optional[Sequence[str]] = None) -> None:
+        """
+        Stream a DataFrame into a new worksheet chunk by chunk
+
+        Args:
+            wb: Write-only workbook (Workbook(write_only=True))
+            title: Worksheet title
+            data: DataFrame, or DataFrames with the same columns written one
+                after another (e.g. pages of a list too long to build at once)
+            columns: Header labels (defaults to the DataFrame's columns; pass
+                them with an iterable of DataFrames, which has no header)
+        """
+        if isinstance(data, pd.DataFrame):
+            columns = columns if columns is not None else [str(col) for col in data.columns]
+            data = [data]
+        ws = wb.create_sheet(title)
+        if columns is not None:
+            ws.append(self._header(ws, list(columns)))
+        for df in data:
+            for row in self._iter_rows(df):
+                ws.append(row)
+
+    def _iter_rows(self, df: pd.DataFrame) -> Iterable[list]:
+        """
+        Yield DataFrame rows as lists of plain cell values
+
+        Args:
+            df: DataFrame to iterate
+
+        Yields:
+            List of cell values for one row
+        """
+        for start in range(0, len(df), self.chunk_size):
+            chunk = df.iloc[start:start + self.chunk_size]
+            for row in chunk.itertuples(index=False, name=None):
+                yield [self._to_cell_value(value) for value in row]
+
+    @staticmethod
+    def _header(ws, names: list) -> list:
+        """
+        Build a bold header row for a write-only worksheet
+
+        Args:
+            ws: Worksheet the row belongs to
+            names: Header labels
+
+        Returns:
+            List of styled cells
+        """
+        cells = []
+        for name in names:
+            cell = WriteOnlyCell(ws, value=name)
+            cell.font = Font(bold=True)
+            cells.append(cell)
+        return cells
+
+    @staticmethod
+    def _to_cell_value(value: Any) -> Any:
+        """
+        Convert numpy scalars and missing values to Excel friendly values
+
+        Args:
+            value: Raw value from a DataFrame or statistics dictionary
+
+        Returns:
+            Value openpyxl can write
+        """
+        if hasattr(value, 'item'):
+            value = value.item()
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        if value is pd.NA or value is pd.NaT:
+            return None
+        return value
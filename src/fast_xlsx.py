@@ -0,0 +1,640 @@
+"""
+Fast XLSX Reader Module
+Streams worksheet XML straight out of the .xlsx archive: the first rows of a
+huge workbook can be read without parsing the rest of it, and a whole sheet
+can be parsed in parallel worker processes
+
+Both readers return the same frame as ``pandas.read_excel`` on the first
+sheet (column names, missing values and dtypes). Workbooks that use date
+formats are not supported by read_sheet() and raise UnsupportedWorkbook, so
+callers can fall back to pandas.
+"""
+
+import html
+import io
+import itertools
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
+
+from src.performance import setting
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Text read as missing, as with pandas' default na_values
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+# Worksheets smaller than this (uncompressed XML) are parsed in-process
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+# Worksheet XML is parsed in pieces of about this size, bounding the memory
+# each parsed tree takes
+PIECE_BYTES = 4 * 1024 * 1024
+
+# Built-in number formats that display dates or times
+DATE_FORMAT_IDS = frozenset(list(range(14, 23)) + list(range(27, 37)) + [45, 46, 47] + list(range(50, 59)))
+
+_INTEGER = re.compile(r'-?\d+$')
+# Rows and cells in the layout spreadsheet writers produce, decoded without
+# building an element tree; other layouts fall back to ElementTree
+_FAST_TOKENS = re.compile(
+    rb'<row\b[^>]*?\sr="(\d+)"[^>]*>'
+    rb'|<c r="([A-Z]+)\d+"(?: s="\d+")?(?: t="(n|s|b|str|inlineStr)")?(?: s="\d+")?'
+    rb'(?:/>|>(?:<v>([^<]*)</v>|<is><t(?: xml:space="preserve")?>([^<]*)</t></is>)?</c>)')
+_FAST_ROW_NUMBER = re.compile(rb'<row\b[^>]*?\sr="\d+"')
+_ROW_START = re.compile(rb'<row[\s/>]')
+_FORMAT_LITERAL = re.compile(r'"[^"]*"|\[[^\]]*\]|\\.')
+
+_ROW = f'{MAIN_NS}row'
+_CELL = f'{MAIN_NS}c'
+_VALUE = f'{MAIN_NS}v'
+_DIGITS = '0123456789'
+
+# Column letters already converted by column_index()
+_COLUMN_INDEXES: Dict[str, int] = {}
+_BYTE_COLUMN_INDEXES: Dict[bytes, int] = {}
+
+# Sheet rows as (row number, cell values)
+Rows = Iterable[Tuple[int, List]]
+
+
+class UnsupportedWorkbook(ValueError):
+    """Raised for workbooks the fast reader cannot read the way pandas does"""
+
+
+def _open_archive(source: Union[str, bytes, BinaryIO]) -> zipfile.ZipFile:
+    """Open a workbook given as a path, bytes or a binary buffer"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif hasattr(source, 'seek'):
+        source.seek(0)
+    return zipfile.ZipFile(source)
+
+
+def first_sheet_path(archive: zipfile.ZipFile) -> str:
+    """
+    Find the archive member holding the workbook's first worksheet
+
+    Args:
+        archive: Open workbook archive
+
+    Returns:
+        Member name, e.g. 'xl/worksheets/sheet1.xml'
+    """
+    try:
+        workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+        sheet = workbook.find(f'{MAIN_NS}sheets/{MAIN_NS}sheet')
+        rel_id = sheet.get(f'{REL_NS}id')
+        rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        for rel in rels.iter(f'{PKG_REL_NS}Relationship'):
+            if rel.get('Id') == rel_id:
+                target = rel.get('Target')
+                return target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+    except (KeyError, AttributeError, ET.ParseError):
+        pass
+    return 'xl/worksheets/sheet1.xml'
+
+
+def column_index(letters: str) -> int:
+    """
+    Convert a column reference to a 0-based index ('A' -> 0, 'AA' -> 26)
+
+    Args:
+        letters: Column letters
+
+    Returns:
+        Column index
+    """
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _text(element: ET.Element) -> str:
+    """Concatenate the text runs of a string item, skipping phonetic hints"""
+    if element.find(f'{MAIN_NS}t') is not None and element.find(f'{MAIN_NS}r') is None:
+        return element.find(f'{MAIN_NS}t').text or ''
+    return ''.join(t.text or '' for r in element.iter(f'{MAIN_NS}r') for t in r.iter(f'{MAIN_NS}t'))
+
+
+def _cell_value(cell: ET.Element):
+    """
+    Decode one cell the way pandas converts openpyxl values
+
+    Returns:
+        Number (integral numbers as int), text, bool, shared-string
+        reference (tuple) or None for empty and error cells
+    """
+    kind = cell.get('t', 'n')
+    if kind == 'inlineStr':
+        item = cell.find(f'{MAIN_NS}is')
+        return _text(item) if item is not None else None
+    value = cell.find(f'{MAIN_NS}v')
+    if value is None or value.text is None or kind == 'e':
+        return None
+    text = value.text
+    if kind == 's':
+        return ('shared', int(text))
+    if kind == 'b':
+        return text == '1'
+    if kind in ('str', 'd'):
+        return text
+    if _INTEGER.match(text):
+        return int(text)
+    number = float(text)
+    return int(number) if number.is_integer() else number
+
+
+def _row_values(row: ET.Element) -> List:
+    """Decode the cells of a row element, with gaps as None"""
+    values = []
+    for cell in row:
+        if cell.tag != _CELL:
+            continue
+        reference = cell.get('r')
+        if reference:
+            letters = reference.rstrip(_DIGITS)
+            index = _COLUMN_INDEXES.get(letters)
+            if index is None:
+                index = _COLUMN_INDEXES[letters] = column_index(letters)
+            if index > len(values):
+                values.extend([None] * (index - len(values)))
+        kind = cell.get('t')
+        if kind is None or kind == 'n':
+            # Numbers are most cells; decode them without the general path
+            text = cell.findtext(_VALUE)
+            if not text:
+                value = None
+            elif '.' in text or 'E' in text or 'e' in text:
+                value = float(text)
+                if value.is_integer():
+                    value = int(value)
+            else:
+                value = int(text)
+        else:
+            value = _cell_value(cell)
+        if reference and index < len(values):
+            values[index] = value
+        else:
+            values.append(value)
+    return values
+
+
+def _iter_rows(stream: BinaryIO) -> Rows:
+    """Stream (row number, values) pairs from worksheet XML"""
+    number = 0
+    for _, element in ET.iterparse(stream, events=('end',)):
+        if element.tag != _ROW:
+            continue
+        number = int(element.get('r') or number + 1)
+        values = _row_values(element)
+        element.clear()
+        yield number, values
+
+
+def _tree_rows(documents: List[bytes]) -> Rows:
+    """Parse whole worksheet XML documents and yield (row number, values) pairs"""
+    number = 0
+    for document in documents:
+        for row in ET.fromstring(document).iter(_ROW):
+            number = int(row.get('r') or number + 1)
+            yield number, _row_values(row)
+
+
+def iter_rows(archive: zipfile.ZipFile, sheet_path: str, limit: Optional[int] = None):
+    """
+    Stream the rows of a worksheet as lists of cell values
+
+    Args:
+        archive: Open workbook archive
+        sheet_path: Worksheet member name
+        limit: Stop after this many rows
+
+    Yields:
+        List of values (shared strings unresolved) per row, with gaps as None
+    """
+    with archive.open(sheet_path) as stream:
+        for _, values in itertools.islice(_iter_rows(stream), limit):
+            yield values
+
+
+def shared_strings(archive: zipfile.ZipFile, needed: Optional[int] = None) -> List[str]:
+    """
+    Read the shared strings table
+
+    Args:
+        archive: Open workbook archive
+        needed: Stop once this many strings are read (all when None)
+
+    Returns:
+        List of strings in table order
+    """
+    strings = []
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return strings
+    if needed is not None and needed <= 0:
+        return strings
+    with archive.open('xl/sharedStrings.xml') as stream:
+        for _, element in ET.iterparse(stream, events=('end',)):
+            if element.tag != f'{MAIN_NS}si':
+                continue
+            strings.append(_text(element))
+            element.clear()
+            if needed is not None and len(strings) >= needed:
+                break
+    return strings
+
+
+def _uses_date_formats(archive: zipfile.ZipFile) -> bool:
+    """Whether any cell style of the workbook displays dates or times"""
+    try:
+        styles = ET.fromstring(archive.read('xl/styles.xml'))
+    except (KeyError, ET.ParseError):
+        return False
+    date_ids = set(DATE_FORMAT_IDS)
+    for number_format in styles.iter(f'{MAIN_NS}numFmt'):
+        code = _FORMAT_LITERAL.sub('', number_format.get('formatCode', '')).lower()
+        if any(letter in code for letter in 'dmyhs'):
+            date_ids.add(int(number_format.get('numFmtId', -1)))
+    cell_formats = styles.find(f'{MAIN_NS}cellXfs')
+    if cell_formats is None:
+        return False
+    return any(int(xf.get('numFmtId', 0)) in date_ids for xf in cell_formats.iter(f'{MAIN_NS}xf'))
+
+
+def _column_piece(values: List) -> Tuple[str, object]:
+    """
+    Store one column of a chunk compactly
+
+    Args:
+        values: Cell values of the column
+
+    Returns:
+        Tuple of (kind, data): 'int' and 'float' hold numeric arrays,
+        'shared' shared-string indexes (-1 for missing), 'none' the row
+        count of an empty column and 'object' an object array
+    """
+    types = set(map(type, values))
+    missing = type(None) in types
+    types.discard(type(None))
+    if not types:
+        return 'none', len(values)
+    if types == {int} and not missing:
+        try:
+            return 'int', np.array(values, dtype=np.int64)
+        except OverflowError:
+            pass
+    if types <= {int, float}:
+        return 'float', np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    if types == {tuple}:
+        return 'shared', np.array([-1 if value is None else value[1] for value in values], dtype=np.int64)
+    data = np.empty(len(values), dtype=object)
+    data[:] = values
+    return 'object', data
+
+
+def _collect(rows: Rows, with_header: bool) -> Dict:
+    """
+    Turn rows into column pieces
+
+    Args:
+        rows: (row number, values) pairs
+        with_header: Whether the first row is the sheet's header
+
+    Returns:
+        Dictionary with the header values and row number (None without a
+        header), data row numbers, which rows hold any value, and the
+        column pieces by column index
+    """
+    header = header_number = None
+    numbers, table = [], []
+    for number, values in rows:
+        while values and values[-1] is None:
+            values.pop()
+        if with_header and header is None:
+            header, header_number = values, number
+            continue
+        numbers.append(number)
+        table.append(values)
+
+    width = max((len(values) for values in table), default=0)
+    columns = list(itertools.zip_longest(*table)) if table else []
+    return {
+        'header': header,
+        'header_number': header_number,
+        'numbers': np.array(numbers, dtype=np.int64),
+        'filled': np.array([bool(values) for values in table], dtype=bool),
+        'columns': {index: _column_piece(list(columns[index])) for index in range(width)},
+    }
+
+
+def _xml_text(raw: bytes) -> str:
+    """Decode character data matched in raw XML"""
+    text = raw.decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return html.unescape(text) if '&' in text else text
+
+
+def _scan_rows(document: bytes) -> Optional[List[Tuple[int, List]]]:
+    """
+    Decode rows with one regular expression scan instead of an element tree
+
+    Args:
+        document: Worksheet XML holding a range of rows
+
+    Returns:
+        List of (row number, values), or None when the document has rows
+        or cells this fast path does not understand (formulas, errors,
+        unusual markup)
+    """
+    tokens = _FAST_TOKENS.findall(document)
+    cells = document.count(b'<c ') + document.count(b'<c>')
+    if len(tokens) != cells + document.count(b'<row ') + document.count(b'<row>'):
+        return None
+
+    rows = []
+    values = None
+    for row_number, letters, kind, number_text, text in tokens:
+        if row_number:
+            values = []
+            rows.append((int(row_number), values))
+            continue
+        index = _BYTE_COLUMN_INDEXES.get(letters)
+        if index is None:
+            index = _BYTE_COLUMN_INDEXES[letters] = column_index(letters.decode())
+        if index > len(values):
+            values.extend([None] * (index - len(values)))
+        if kind == b'' or kind == b'n':
+            if not number_text:
+                value = None
+            elif b'.' in number_text or b'E' in number_text or b'e' in number_text:
+                value = float(number_text)
+                if value.is_integer():
+                    value = int(value)
+            else:
+                value = int(number_text)
+        elif kind == b's':
+            value = ('shared', int(number_text)) if number_text else None
+        elif kind == b'inlineStr':
+            value = _xml_text(text)
+        elif kind == b'b':
+            value = number_text == b'1' if number_text else None
+        else:
+            value = _xml_text(number_text)
+        if index < len(values):
+            values[index] = value
+        else:
+            values.append(value)
+    return rows
+
+
+def _document_rows(document: bytes) -> Rows:
+    """Decode one worksheet XML document, using the fast path when it applies"""
+    rows = _scan_rows(document)
+    return rows if rows is not None else _tree_rows([document])
+
+
+def _parse_chunk(documents: List[bytes], with_header: bool) -> Dict:
+    """Parse worksheet XML documents holding consecutive rows (runs in a worker process)"""
+    return _collect(itertools.chain.from_iterable(map(_document_rows, documents)), with_header)
+
+
+def _split_sheet(xml: bytes, parts: int) -> List[bytes]:
+    """
+    Split worksheet XML into documents holding consecutive ranges of rows
+
+    Each document keeps the worksheet's opening and closing XML, so the
+    namespace declarations stay in scope.
+
+    Args:
+        xml: Worksheet XML
+        parts: Number of documents wanted
+
+    Returns:
+        List of XML documents in row order
+    """
+    start = xml.find(b'<sheetData')
+    if start < 0:
+        raise UnsupportedWorkbook("Worksheet has no <sheetData> element")
+    body_start = xml.index(b'>', start) + 1
+    if xml[body_start - 2:body_start] == b'/>':
+        return [xml]
+    body_end = xml.rfind(b'</sheetData>')
+    prefix, suffix = xml[:body_start], xml[body_end:]
+    if _FAST_ROW_NUMBER.match(xml, body_start) is None:
+        return [xml]  # rows are numbered by position, which needs one document
+
+    bounds = [body_start]
+    step = max(1, (body_end - body_start) // parts)
+    for i in range(1, parts):
+        match = _ROW_START.search(xml, max(body_start + i * step, bounds[-1] + 1), body_end)
+        if match is None:
+            break
+        bounds.append(match.start())
+    bounds.append(body_end)
+    return [prefix + xml[a:b] + suffix for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _resolve(values: np.ndarray, strings: List[str]) -> np.ndarray:
+    """Replace shared-string references in an object array with their text"""
+    for i, value in enumerate(values):
+        if type(value) is tuple:
+            values[i] = strings[value[1]]
+    return values
+
+
+def _as_objects(kind: str, data, table: np.ndarray, strings: List[str]) -> np.ndarray:
+    """Convert a column piece to an object array with None for missing values"""
+    if kind == 'none':
+        return np.full(data, None, dtype=object)
+    if kind == 'shared':
+        return table.take(data)
+    if kind == 'object':
+        return _resolve(data, strings)
+    values = data.astype(object)
+    if kind == 'float':
+        values[np.isnan(data)] = None
+    return values
+
+
+def _convert_text(values: np.ndarray):
+    """
+    Type a column holding text the way pandas' parser does
+
+    NA strings become missing, columns of numbers stored as text become
+    numeric and boolean columns stay boolean unless values are missing.
+    """
+    missing = pd.isna(values)
+    text = pd.Series(values, dtype=object)
+    missing |= text.isin(NA_STRINGS).to_numpy()
+    values = np.where(missing, None, values)
+
+    types = set(map(type, values[~missing]))
+    if types == {bool}:
+        return values.astype(bool) if not missing.any() else np.where(missing, np.nan, values).astype(np.float64)
+    try:
+        return pd.to_numeric(values)
+    except (TypeError, ValueError):
+        return values
+
+
+def _column(pieces: List[Tuple[str, object]], table: np.ndarray, strings: List[str]):
+    """Join one column's pieces from consecutive chunks into a typed array"""
+    kinds = {kind for kind, _ in pieces}
+    if kinds == {'int'}:
+        return np.concatenate([data for _, data in pieces])
+    if kinds <= {'int', 'float', 'none'}:
+        return np.concatenate([np.full(data, np.nan) if kind == 'none' else data.astype(np.float64)
+                               for kind, data in pieces])
+    return _convert_text(np.concatenate([_as_objects(kind, data, table, strings) for kind, data in pieces]))
+
+
+def _column_names(header: List, width: int) -> List:
+    """Name columns like pandas: blanks become 'Unnamed: i', repeats get '.1', '.2'"""
+    header = list(header) + [None] * (width - len(header))
+    names = [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+    counts = {}
+    for i, name in enumerate(names):
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        names[i] = name
+    return names
+
+
+def _frame(chunks: List[Dict], strings: List[str]) -> pd.DataFrame:
+    """
+    Stitch parsed chunks into a DataFrame
+
+    Args:
+        chunks: Results of _collect() in row order, the first with the header
+        strings: Shared strings table
+
+    Returns:
+        DataFrame as pandas.read_excel builds it
+    """
+    header = chunks[0]['header']
+    if header is None:
+        return pd.DataFrame()
+    table = np.empty(len(strings) + 1, dtype=object)
+    table[:len(strings)] = strings
+    header = [strings[value[1]] if type(value) is tuple else value for value in header]
+
+    numbers = np.concatenate([chunk['numbers'] for chunk in chunks])
+    filled = np.concatenate([chunk['filled'] for chunk in chunks])
+    # Trailing rows with no values are dropped, as pandas does
+    count = int(np.flatnonzero(filled)[-1]) + 1 if filled.any() else 0
+    width = max([len(header)] + [max(chunk['columns'], default=-1) + 1 for chunk in chunks])
+
+    # Rows missing from the XML are blank rows, kept as missing values
+    positions = numbers[:count] - chunks[0]['header_number'] - 1
+    gaps = bool(count) and positions[-1] != count - 1
+
+    columns = {}
+    for index in range(width):
+        pieces = [chunk['columns'].get(index, ('none', len(chunk['numbers']))) for chunk in chunks]
+        values = _column(pieces, table, strings)[:count]
+        if gaps:
+            if values.dtype.kind in 'ib':
+                values = values.astype(np.float64)
+            full = np.full(positions[-1] + 1, np.nan if values.dtype.kind == 'f' else None, dtype=values.dtype)
+            full[positions] = values
+            values = _convert_text(full) if values.dtype == object else full
+        columns[index] = values
+
+    frame = pd.DataFrame(columns)
+    frame.columns = _column_names(header, width)
+    return frame.infer_objects()
+
+
+def read_head(source: Union[str, bytes, BinaryIO], nrows: int) -> pd.DataFrame:
+    """
+    Read the header and the first rows of a workbook's first sheet
+
+    Only the start of the worksheet XML is parsed (and the shared strings
+    those rows use), so the time taken does not grow with the file size.
+
+    Args:
+        source: Path to the workbook, its contents as bytes, or a binary buffer
+        nrows: Number of data rows to read (0 reads the header only)
+
+    Returns:
+        DataFrame with the header as columns
+    """
+    with _open_archive(source) as archive:
+        with archive.open(first_sheet_path(archive)) as stream:
+            chunk = _collect(itertools.islice(_iter_rows(stream), nrows + 1), with_header=True)
+        references = [value[1] for value in chunk['header'] or [] if type(value) is tuple]
+        for kind, data in chunk['columns'].values():
+            if kind == 'shared' and len(data):
+                references.append(int(data.max()))
+            elif kind == 'object':
+                references.extend(value[1] for value in data if type(value) is tuple)
+        strings = shared_strings(archive, needed=max(references) + 1) if references else []
+
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return _frame([chunk], strings)
+
+
+def read_sheet(source: Union[str, bytes, BinaryIO], workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Read a workbook's first sheet, parsing row ranges in parallel
+
+    The worksheet XML is split at row boundaries and each range of rows is
+    parsed into typed column arrays by a worker process while the shared
+    strings are read once here; the ranges are then joined column by column.
+
+    Args:
+        source: Path to the workbook, its contents as bytes, or a binary buffer
+        workers: Worker processes (defaults to the xlsx_workers performance
+            setting, one per available CPU unless tuned; 1 parses in-process)
+
+    Returns:
+        The same DataFrame as pandas.read_excel(source)
+
+    Raises:
+        UnsupportedWorkbook: When the workbook uses date formats or a
+            worksheet layout the reader does not handle
+    """
+    workers = workers or setting('xlsx_workers')
+    with _open_archive(source) as archive:
+        if _uses_date_formats(archive):
+            raise UnsupportedWorkbook("Workbook uses date formats")
+        xml = archive.read(first_sheet_path(archive))
+        documents = _split_sheet(xml, -(-len(xml) // PIECE_BYTES))
+        workers = min(workers, len(documents)) if len(xml) >= PARALLEL_MIN_BYTES else 1
+        del xml
+        # Each worker parses one run of consecutive pieces
+        bounds = np.linspace(0, len(documents), workers + 1).astype(int)
+        groups = [documents[a:b] for a, b in zip(bounds, bounds[1:])]
+        del documents
+
+        if workers == 1:
+            chunks = [_parse_chunk(groups[0], True)]
+            strings = shared_strings(archive)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_parse_chunk, group, i == 0) for i, group in enumerate(groups)]
+                del groups
+                strings = shared_strings(archive)
+                chunks = [future.result() for future in futures]
+
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return _frame(chunks, strings)
@@ -0,0 +1,412 @@
+"""
+Grading Policy Module
+Declarative grading rules (pass marks, grade ladder, pass-all rule, grace
+and bonus marks) loaded from a JSON config file and evaluated as
+vectorized operations over the marks matrix
+"""
+
+import hashlib
+import json
+import os
+import threading
+import warnings
+import numpy as np
+from typing import Dict, List, Optional, Sequence
+
+from src.relative_grading import percentile_ranks, z_scores
+
+# Built-in grading rules, used when no policy file exists
+PASS_MARKS = 40
+MIN_MARKS = 0
+MAX_MARKS = 100
+
+# Grade cutoff points (minimum average for each grade)
+GRADE_CUTOFFS = {
+    'A+': 90,
+    'A': 80,
+    'B+': 70,
+    'B': 60,
+    'C+': 50,
+    'C': 40,
+    'F': 0
+}
+
+# GPA points (4.0 scale) for each grade
+GPA_POINTS = {
+    'A+': 4.0,
+    'A': 3.5,
+    'B+': 3.0,
+    'B': 2.5,
+    'C+': 2.0,
+    'C': 1.5,
+    'F': 0.0
+}
+
+# Scores relative grading bands can be based on
+RELATIVE_METHODS = ('percentile', 'zscore')
+
+# Policy file read by get_grading_policy(), overridable with RESULT_SYSTEM_GRADING_POLICY
+DEFAULT_POLICY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   'config', 'grading_policy.json')
+
+
+class GradingPolicy:
+    """Grading rules compiled into lookup tables for vectorized evaluation"""
+
+    def __init__(self, pass_marks: float = PASS_MARKS,
+                 grades: Optional[List[Dict]] = None,
+                 min_marks: float = MIN_MARKS,
+                 max_marks: float = MAX_MARKS,
+                 subject_pass_marks: Optional[Dict[str, float]] = None,
+                 default_subject_pass_marks: Optional[float] = None,
+                 require_pass_all_subjects: bool = False,
+                 fail_grade: Optional[str] = None,
+                 bonus: Optional[List[Dict]] = None,
+                 grace: Optional[Dict] = None,
+                 relative: Optional[Dict] = None,
+                 name: str = "default"):
+        """
+        Initialize grading policy
+
+        Args:
+            pass_marks: Minimum average to pass
+            grades: Grade ladder as [{'grade', 'min_average', 'gpa'}, ...]
+                (defaults to GRADE_CUTOFFS and GPA_POINTS)
+            min_marks: Lowest valid mark
+            max_marks: Highest valid mark
+            subject_pass_marks: Pass marks of individual subjects
+            default_subject_pass_marks: Pass marks of other subjects
+                (defaults to pass_marks)
+            require_pass_all_subjects: Fail students who fail any subject,
+                whatever their average
+            fail_grade: Grade given to failing students (None keeps the
+                grade earned by the average)
+            bonus: Bonus rules as [{'marks', 'subjects', 'min_marks'}, ...];
+                'subjects' defaults to all, 'min_marks' to any mark
+            grace: Grace rule {'max_per_subject', 'max_subjects', 'max_total'}
+                raising a student's failed subjects to their pass marks when
+                every shortfall is within the limits
+            relative: Relative grading {'method', 'bands'}: grades come from
+                each student's percentile rank or z-score of the average
+                within the cohort instead of the ladder's cutoffs; bands are
+                [{'grade', 'min'}, ...] and take GPA points from the ladder
+            name: Display name
+
+        Raises:
+            ValueError: If the rules are inconsistent
+        """
+        if grades is None:
+            grades = [{'grade': grade, 'min_average': cutoff, 'gpa': GPA_POINTS[grade]}
+                      for grade, cutoff in GRADE_CUTOFFS.items()]
+        if not grades:
+            raise ValueError("The grade ladder is empty")
+        if min_marks >= max_marks:
+            raise ValueError("min_marks must be below max_marks")
+
+        self.name = name
+        self.pass_marks = float(pass_marks)
+        self.min_marks = min_marks
+        self.max_marks = max_marks
+        self.subject_pass_marks = {str(k): float(v) for k, v in (subject_pass_marks or {}).items()}
+        self.default_subject_pass_marks = float(pass_marks if default_subject_pass_marks is None
+                                                else default_subject_pass_marks)
+        self.require_pass_all_subjects = bool(require_pass_all_subjects)
+        self.bonus = [self._check_bonus(rule) for rule in (bonus or [])]
+        self.grace = self._check_grace(grace) if grace else None
+
+        ladder = sorted(grades, key=lambda g: g['min_average'])
+        self.grades = [{'grade': str(g['grade']), 'min_average': float(g['min_average']),
+                        'gpa': float(g['gpa'])} for g in reversed(ladder)]
+        self._cutoffs = np.array([g['min_average'] for g in ladder], dtype=np.float64)
+        self._labels = np.array([str(g['grade']) for g in ladder], dtype=object)
+        self._gpas = np.array([g['gpa'] for g in ladder], dtype=np.float64)
+
+        self.fail_grade = fail_grade
+        self._fail_position = None
+        if fail_grade is not None:
+            if fail_grade not in self._labels:
+                raise ValueError(f"fail_grade '{fail_grade}' is not in the grade ladder")
+            self._fail_position = int(np.flatnonzero(self._labels == fail_grade)[0])
+
+        self.relative = None
+        if relative:
+            self.relative = self._check_relative(relative)
+            bands = sorted(self.relative['bands'], key=lambda b: b['min'])
+            self._band_mins = np.array([b['min'] for b in bands], dtype=np.float64)
+            self._band_positions = np.array([int(np.flatnonzero(self._labels == b['grade'])[0])
+                                             for b in bands])
+
+        self._pass_vectors = {}
+
+    def _check_relative(self, rule: Dict) -> Dict:
+        """Validate the relative grading rule"""
+        method = rule.get('method', 'percentile')
+        if method not in RELATIVE_METHODS:
+            raise ValueError(f"Relative grading method must be one of {', '.join(RELATIVE_METHODS)}")
+        bands = rule.get('bands') or []
+        if not bands:
+            raise ValueError("Relative grading needs at least one band")
+        for band in bands:
+            if band.get('grade') not in self._labels:
+                raise ValueError(f"Relative grading band grade '{band.get('grade')}' is not in the grade ladder")
+        return {'method': method,
+                'bands': sorted(({'grade': str(b['grade']), 'min': float(b['min'])} for b in bands),
+                                key=lambda b: b['min'], reverse=True)}
+
+    @staticmethod
+    def _check_bonus(rule: Dict) -> Dict:
+        """Validate one bonus rule"""
+        if 'marks' not in rule:
+            raise ValueError("Bonus rules need 'marks'")
+        return {'marks': float(rule['marks']),
+                'subjects': list(rule['subjects']) if rule.get('subjects') else None,
+                'min_marks': float(rule['min_marks']) if rule.get('min_marks') is not None else None}
+
+    @staticmethod
+    def _check_grace(rule: Dict) -> Dict:
+        """Validate the grace rule"""
+        if 'max_per_subject' not in rule:
+            raise ValueError("The grace rule needs 'max_per_subject'")
+        return {'max_per_subject': float(rule['max_per_subject']),
+                'max_subjects': int(rule['max_subjects']) if rule.get('max_subjects') is not None else None,
+                'max_total': float(rule['max_total']) if rule.get('max_total') is not None else None}
+
+    @classmethod
+    def from_dict(cls, config: Dict) -> 'GradingPolicy':
+        """
+        Build a policy from its config dictionary
+
+        Args:
+            config: Parsed policy file
+
+        Returns:
+            GradingPolicy
+
+        Raises:
+            ValueError: If the config has unknown keys or inconsistent rules
+        """
+        known = {'name', 'pass_marks', 'grades', 'min_marks', 'max_marks', 'subject_pass_marks',
+                 'default_subject_pass_marks', 'require_pass_all_subjects', 'fail_grade',
+                 'bonus', 'grace', 'relative'}
+        unknown = set(config) - known
+        if unknown:
+            raise ValueError(f"Unknown grading policy settings: {', '.join(sorted(unknown))}")
+        return cls(**config)
+
+    def to_dict(self) -> Dict:
+        """
+        Get the normalized policy as a config dictionary
+
+        Returns:
+            Dictionary accepted by from_dict()
+        """
+        return {
+            'name': self.name,
+            'pass_marks': self.pass_marks,
+            'min_marks': self.min_marks,
+            'max_marks': self.max_marks,
+            'grades': self.grades,
+            'subject_pass_marks': self.subject_pass_marks,
+            'default_subject_pass_marks': self.default_subject_pass_marks,
+            'require_pass_all_subjects': self.require_pass_all_subjects,
+            'fail_grade': self.fail_grade,
+            'bonus': self.bonus,
+            'grace': self.grace,
+            'relative': self.relative
+        }
+
+    def fingerprint(self) -> str:
+        """
+        Hash of the rules, changing whenever any rule changes
+
+        Returns:
+            16 hex characters
+        """
+        rules = self.to_dict()
+        rules.pop('name')
+        return hashlib.sha256(json.dumps(rules, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def grade_cutoffs(self) -> Dict[str, float]:
+        """Minimum average of each grade, highest grade first"""
+        return {g['grade']: g['min_average'] for g in self.grades}
+
+    def subject_pass_mark(self, subject: str) -> float:
+        """
+        Pass marks of one subject
+
+        Args:
+            subject: Subject name
+
+        Returns:
+            Marks needed to pass the subject
+        """
+        return self.subject_pass_marks.get(str(subject), self.default_subject_pass_marks)
+
+    def pass_marks_for(self, subjects: Sequence[str]) -> np.ndarray:
+        """
+        Pass marks of each subject, cached per subject list
+
+        Args:
+            subjects: Subject names in matrix column order
+
+        Returns:
+            Read-only array with one pass mark per subject
+        """
+        key = tuple(subjects)
+        vector = self._pass_vectors.get(key)
+        if vector is None:
+            vector = np.array([self.subject_pass_mark(subject) for subject in key], dtype=np.float64)
+            vector.flags.writeable = False
+            self._pass_vectors[key] = vector
+        return vector
+
+    def evaluate(self, marks: np.ndarray, subjects: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Grade every student
+
+        Args:
+            marks: (students x subjects) marks matrix (not modified)
+            subjects: Subject names in matrix column order
+
+        Returns:
+            Dictionary with the Average, GPA, Grade and Status arrays
+        """
+        marks = self.adjusted_marks(marks, subjects)
+
+        with warnings.catch_warnings():
+            # Students with every mark missing get a NaN average, as in pandas
+            warnings.simplefilter('ignore', RuntimeWarning)
+            missing = marks.dtype.kind == 'f' and np.isnan(marks).any()
+            average = np.nanmean(marks, axis=1) if missing else marks.mean(axis=1)
+
+        positions = self._grade_positions(average)
+
+        passed = average >= self.pass_marks
+        if self.require_pass_all_subjects:
+            passed &= (marks >= self.pass_marks_for(subjects)).all(axis=1)
+        if self._fail_position is not None:
+            positions[~passed] = self._fail_position
+
+        return {
+            'Average': average,
+            'GPA': self._gpas[positions],
+            'Grade': self._labels[positions],
+            'Status': np.where(passed, 'PASS', 'FAIL').astype(object)
+        }
+
+    def _grade_positions(self, average: np.ndarray) -> np.ndarray:
+        """
+        Find each student's grade in the ladder
+
+        Args:
+            average: Average marks
+
+        Returns:
+            Index into the ascending ladder (missing averages and scores
+            below every cutoff or band get the lowest grade)
+        """
+        if self.relative is None:
+            positions = np.searchsorted(self._cutoffs, average, side='right') - 1
+            positions[(positions < 0) | np.isnan(average)] = 0
+            return positions
+
+        score = percentile_ranks(average) if self.relative['method'] == 'percentile' else z_scores(average)
+        bands = np.searchsorted(self._band_mins, score, side='right') - 1
+        positions = self._band_positions[np.maximum(bands, 0)]
+        positions[(bands < 0) | np.isnan(score)] = 0
+        return positions
+
+    def adjusted_marks(self, marks: np.ndarray, subjects: Sequence[str]) -> np.ndarray:
+        """
+        Apply bonus and grace rules
+
+        Args:
+            marks: (students x subjects) marks matrix (not modified)
+            subjects: Subject names in matrix column order
+
+        Returns:
+            The marks matrix itself when no rule applies, otherwise an
+            adjusted copy
+        """
+        if not self.bonus and not self.grace:
+            return marks
+
+        adjusted = np.array(marks, dtype=np.float64, order='F')
+        index = {subject: j for j, subject in enumerate(subjects)}
+
+        for rule in self.bonus:
+            columns = (list(range(len(subjects))) if rule['subjects'] is None
+                       else [index[s] for s in rule['subjects'] if s in index])
+            if not columns:
+                continue
+            block = adjusted[:, columns]
+            raised = np.minimum(block + rule['marks'], self.max_marks)
+            if rule['min_marks'] is not None:
+                raised = np.where(block >= rule['min_marks'], raised, block)
+            adjusted[:, columns] = raised
+
+        if self.grace:
+            pass_marks = self.pass_marks_for(subjects)
+            shortfall = pass_marks - adjusted
+            failed = shortfall > 0
+            failed_count = failed.sum(axis=1)
+            granted = (failed_count > 0) & ~(failed & (shortfall > self.grace['max_per_subject'])).any(axis=1)
+            if self.grace['max_subjects'] is not None:
+                granted &= failed_count <= self.grace['max_subjects']
+            if self.grace['max_total'] is not None:
+                granted &= np.where(failed, shortfall, 0).sum(axis=1) <= self.grace['max_total']
+            adjusted = np.where(granted[:, None] & failed, pass_marks, adjusted)
+
+        return adjusted
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def load_policy(path: str) -> GradingPolicy:
+    """
+    Load a grading policy file (cached until the file changes)
+
+    Args:
+        path: Path to the JSON policy file
+
+    Returns:
+        GradingPolicy
+
+    Raises:
+        ValueError: If the file is not a valid policy
+    """
+    mtime = os.path.getmtime(path)
+    with _policies_lock:
+        cached = _policies.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    try:
+        with open(path, encoding='utf-8') as f:
+            policy = GradingPolicy.from_dict(json.load(f))
+    except (json.JSONDecodeError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid grading policy {path}: {e}") from e
+
+    with _policies_lock:
+        _policies[path] = (mtime, policy)
+    return policy
+
+
+def get_grading_policy() -> GradingPolicy:
+    """
+    Get the grading policy in effect
+
+    Returns:
+        Policy from RESULT_SYSTEM_GRADING_POLICY or config/grading_policy.json,
+        or the built-in rules when no policy file exists
+    """
+    path = os.environ.get('RESULT_SYSTEM_GRADING_POLICY', DEFAULT_POLICY_PATH)
+    if os.path.exists(path):
+        return load_policy(path)
+    with _policies_lock:
+        if None not in _policies:
+            _policies[None] = (None, GradingPolicy())
+        return _policies[None][1]
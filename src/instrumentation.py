@@ -0,0 +1,215 @@
+"""
+Instrumentation Module
+Timing, CPU and peak-memory spans around pipeline stages, emitted as
+structured JSON log lines
+
+Spans are off by default. Enable them with enable() or by setting the
+RESULT_SYSTEM_TRACE environment variable; while disabled, an instrumented
+call costs one flag check.
+
+tracemalloc counts the whole process, so one thread at a time measures
+memory: spans in other threads record time only, and a peak is dropped
+when another thread ran a span while it was measured. Peak memory is
+therefore only reported while a single session is busy.
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Number of finished spans kept for the diagnostics panel
+MAX_RECENT_SPANS = 500
+
+_enabled = False
+_trace_memory = False
+_local = threading.local()
+_recent = deque(maxlen=MAX_RECENT_SPANS)
+_recent_lock = threading.Lock()
+
+# Held by the thread whose spans are measuring memory
+_memory_lock = threading.Lock()
+
+# Threads inside a span, and a counter bumped whenever spans of two threads overlap
+_activity_lock = threading.Lock()
+_active_threads = 0
+_overlaps = 0
+
+
+def enable(trace_memory: bool = True) -> None:
+    """
+    Turn span recording on
+
+    Args:
+        trace_memory: Also track peak memory with tracemalloc (slows
+            allocations while enabled)
+    """
+    global _enabled, _trace_memory
+    _trace_memory = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+
+
+def disable() -> None:
+    """Turn span recording off and stop memory tracing"""
+    global _enabled, _trace_memory
+    _enabled = False
+    _trace_memory = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def log_to_stream(stream=None) -> None:
+    """
+    Print span records as JSON lines, one per finished span
+
+    Args:
+        stream: Stream to write to (defaults to stderr)
+    """
+    if any(getattr(handler, '_span_handler', False) for handler in logger.handlers):
+        return
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    handler._span_handler = True
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def is_enabled() -> bool:
+    """Whether spans are being recorded"""
+    return _enabled
+
+
+def recent_spans(limit: Optional[int] = None) -> List[Dict]:
+    """
+    Get the most recently finished spans, oldest first
+
+    Args:
+        limit: Maximum number of spans to return
+
+    Returns:
+        List of span records
+    """
+    with _recent_lock:
+        spans = list(_recent)
+    return spans[-limit:] if limit else spans
+
+
+def clear() -> None:
+    """Forget all recorded spans"""
+    with _recent_lock:
+        _recent.clear()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Measure wall time, CPU time and peak memory of a block
+
+    Args:
+        name: Span name, e.g. 'DataProcessor.calculate_grades'
+        **attributes: Extra fields added to the record (e.g. rows=1000)
+
+    Yields:
+        The span record, which the block may add attributes to
+    """
+    if not _enabled:
+        yield {}
+        return
+
+    global _active_threads, _overlaps
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+
+    record = {'span': name, 'parent': stack[-1]['span'] if stack else None,
+              'thread': threading.current_thread().name}
+    record.update(attributes)
+
+    if not stack:
+        with _activity_lock:
+            _active_threads += 1
+            if _active_threads > 1:
+                _overlaps += 1
+        _local.measuring = (_trace_memory and tracemalloc.is_tracing()
+                            and _memory_lock.acquire(blocking=False))
+
+    memory = _local.measuring and tracemalloc.is_tracing()
+    if memory:
+        # Another thread's span at any point during this one voids its peak
+        overlaps = _overlaps if _active_threads == 1 else None
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]['_peak'] = max(stack[-1].get('_peak', 0), peak)
+        tracemalloc.reset_peak()
+        record['_start_memory'] = record['_peak'] = current
+
+    stack.append(record)
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield record
+    finally:
+        record['wall_s'] = round(time.perf_counter() - wall_start, 6)
+        record['cpu_s'] = round(time.thread_time() - cpu_start, 6)
+        stack.pop()
+
+        start_memory = record.pop('_start_memory', None)
+        span_peak = record.pop('_peak', None)
+        if memory and start_memory is not None and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], span_peak)
+            if overlaps == _overlaps:
+                record['peak_memory_bytes'] = peak - start_memory
+            if stack:
+                stack[-1]['_peak'] = max(stack[-1].get('_peak', 0), peak)
+
+        if not stack:
+            if _local.measuring:
+                _local.measuring = False
+                _memory_lock.release()
+            with _activity_lock:
+                _active_threads -= 1
+
+        record['timestamp'] = round(time.time(), 3)
+        with _recent_lock:
+            _recent.append(record)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(record, default=str))
+
+
+def instrumented(name: Optional[str] = None) -> Callable:
+    """
+    Decorator wrapping a function or method in a span
+
+    Args:
+        name: Span name (defaults to the function's qualified name)
+
+    Returns:
+        Decorator
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+if os.environ.get('RESULT_SYSTEM_TRACE', '').lower() not in ('', '0', 'false', 'no'):
+    enable()
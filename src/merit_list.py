@@ -0,0 +1,474 @@
+"""
+Merit List Module
+Ranks a cohort with one multi-key lexicographic sort and configurable tie
+rules, and streams the list page by page to CSV, xlsx or PDF volumes
+
+Usage:
+    python -m src.merit_list data/sample_marks.xlsx --subjects Math Science \
+        --tie-rule dense --filter Section=A --format csv xlsx pdf
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from src.result_query import ResultsQuery
+from src.table_query import TablePage
+
+# Ranking keys used before the subject priority order (higher ranks first)
+DEFAULT_KEYS = ['Average', 'GPA']
+
+# How students with equal keys are ranked: competition 1,2,2,4; dense 1,2,2,3;
+# ordinal 1,2,3,4 (the tie-breaker decides)
+TIE_RULES = ('competition', 'dense', 'ordinal')
+
+# Rows per page when browsing the list; PDF pages hold as many as fit
+DEFAULT_PAGE_SIZE = 40
+
+# Rows per PDF volume; each volume is built and saved before the next starts
+PDF_ROWS_PER_VOLUME = 20000
+
+# Data rows per worksheet (Excel's limit is 1,048,576 rows including the header)
+XLSX_ROWS_PER_SHEET = 1048575
+
+EXPORT_FORMATS = ('csv', 'xlsx', 'pdf')
+
+# A ranking key: column name and whether higher values rank first
+Key = Union[str, Tuple[str, bool]]
+
+
+def _sort_codes(values: np.ndarray) -> np.ndarray:
+    """
+    Ascending sort codes for a column, with missing values last
+
+    Numbers sort numerically and text alphabetically (roll numbers stored
+    as text but all numeric sort as numbers).
+
+    Args:
+        values: Column values
+
+    Returns:
+        Float array usable as a lexsort key
+    """
+    values = np.asarray(values)
+    if values.dtype.kind not in 'iufb':
+        numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+        if np.isnan(numbers).sum() == pd.isna(values).sum():
+            values = numbers
+        else:
+            try:
+                codes, _ = pd.factorize(values, sort=True)
+            except TypeError:
+                codes, _ = pd.factorize(pd.Series(values).astype(str).to_numpy(), sort=True)
+            codes = codes.astype(np.float64)
+            codes[pd.isna(values)] = np.inf
+            return codes
+    codes = values.astype(np.float64)
+    codes[np.isnan(codes)] = np.inf
+    return codes
+
+
+class MeritList:
+    """Students of a cohort (or one category of it) in merit order, with ranks"""
+
+    def __init__(self, query: ResultsQuery, keys: Sequence[Key] = DEFAULT_KEYS,
+                 subject_priority: Sequence[str] = (), tie_rule: str = 'competition',
+                 tie_breaker: Optional[str] = 'Roll_No', filters: Optional[Dict[str, Sequence]] = None,
+                 expression: Optional[str] = None):
+        """
+        Rank students with one lexicographic sort over every key
+
+        Args:
+            query: Query engine of the processed cohort (resolves column names)
+            keys: Ranking columns, most significant first; a name ranks higher
+                values first, a (name, descending) pair sets the direction
+            subject_priority: Subjects whose marks break ties after the keys,
+                in priority order (higher marks rank first)
+            tie_rule: 'competition', 'dense' or 'ordinal' (see TIE_RULES)
+            tie_breaker: Column ordering students who tie on every key
+                (ascending; None keeps file order). It decides rank only
+                under the 'ordinal' rule
+            filters: Category filters as column -> allowed values, e.g.
+                {'Section': ['A'], 'Status': ['PASS']}
+            expression: Query expression further restricting the students
+
+        Raises:
+            ValueError: For an unknown tie rule
+            QueryError: For unknown columns or invalid expressions
+        """
+        if tie_rule not in TIE_RULES:
+            raise ValueError(f"Unknown tie rule {tie_rule!r} (use one of: {', '.join(TIE_RULES)})")
+        self.query = query
+        self.keys = [(key, True) if isinstance(key, str) else (key[0], bool(key[1])) for key in keys]
+        self.keys += [(subject, True) for subject in subject_priority]
+        self.tie_rule = tie_rule
+        self.tie_breaker = tie_breaker
+        self.filters = {column: list(values) for column, values in (filters or {}).items()}
+        self.expression = expression
+
+        mask = query.mask(expression)
+        mask = np.ones(len(query.model), dtype=bool) if mask is None else mask.copy()
+        for column, allowed in self.filters.items():
+            mask &= np.isin(query.column(column), allowed)
+        positions = np.flatnonzero(mask)
+
+        # np.lexsort treats its last key as the primary one
+        sort_keys = []
+        for column, descending in self.keys:
+            codes = _sort_codes(query.column(column)[positions])
+            if descending:
+                codes = np.where(np.isinf(codes), np.inf, -codes)
+            sort_keys.append(codes)
+        tie_codes = [_sort_codes(query.column(tie_breaker)[positions])] if tie_breaker else []
+        order = np.lexsort(tie_codes + sort_keys[::-1]) if sort_keys or tie_codes else np.arange(len(positions))
+
+        self.order = positions[order]
+        self.ranks = self._ranks([codes[order] for codes in sort_keys])
+
+    def _ranks(self, sorted_keys: List[np.ndarray]) -> np.ndarray:
+        """Rank students in merit order under the tie rule"""
+        count = len(self.order)
+        numbers = np.arange(1, count + 1)
+        if self.tie_rule == 'ordinal' or count == 0:
+            return numbers
+        new_group = np.zeros(count, dtype=bool)
+        new_group[0] = True
+        for codes in sorted_keys:
+            new_group[1:] |= codes[1:] != codes[:-1]
+        if self.tie_rule == 'dense':
+            return np.cumsum(new_group)
+        return np.maximum.accumulate(np.where(new_group, numbers, 0))
+
+    def __len__(self) -> int:
+        """Number of students on the list"""
+        return len(self.order)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the ranking (order and rank arrays)"""
+        return self.order.nbytes + self.ranks.nbytes
+
+    @property
+    def columns(self) -> List[str]:
+        """Columns of the published list"""
+        model = self.query.model
+        identity = [col for col in ('Student_Name', 'Roll_No', 'Section') if col in model.identity.columns]
+        keys = [column for column, _ in self.keys]
+        results = [col for col in ('Grade', 'Status') if col in model.derived and col not in keys]
+        return ['Rank'] + identity + list(dict.fromkeys(keys)) + results
+
+    def rows(self, start: int, stop: int) -> pd.DataFrame:
+        """
+        Get a slice of the list
+
+        Args:
+            start: First list position (0-based)
+            stop: Position after the last one
+
+        Returns:
+            DataFrame with the list's columns
+        """
+        positions = self.order[start:stop]
+        data = {'Rank': self.ranks[start:stop]}
+        for column in self.columns[1:]:
+            data[column] = self.query.column(column)[positions]
+        return pd.DataFrame(data)
+
+    def page(self, page: int, page_size: int = DEFAULT_PAGE_SIZE) -> TablePage:
+        """
+        Get one page of the list
+
+        Args:
+            page: Page number (1-based; clamped to the last page)
+            page_size: Rows per page
+
+        Returns:
+            TablePage
+        """
+        page_count = max(1, math.ceil(len(self) / page_size))
+        page = min(max(1, page), page_count)
+        start = (page - 1) * page_size
+        return TablePage(self.rows(start, start + page_size), len(self), page, page_size)
+
+    def iter_pages(self, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[pd.DataFrame]:
+        """
+        Yield the list one page at a time
+
+        Args:
+            page_size: Rows per page
+
+        Yields:
+            DataFrame of one page
+        """
+        for start in range(0, len(self), page_size):
+            yield self.rows(start, start + page_size)
+
+    def describe(self) -> str:
+        """One-line description of the ranking and the selected students"""
+        keys = ', '.join(column if descending else f"{column} (ascending)" for column, descending in self.keys)
+        parts = [f"Ranked by {keys}", f"ties: {self.tie_rule}"]
+        if self.tie_breaker:
+            parts.append(f"then {self.tie_breaker}")
+        parts += [f"{column} in {', '.join(map(str, values))}" for column, values in self.filters.items()]
+        if self.expression:
+            parts.append(f"where {self.expression}")
+        return '; '.join(parts)
+
+    def write_csv(self, target, page_size: int = 10000) -> None:
+        """
+        Stream the list to a CSV file
+
+        Args:
+            target: File path or writable text stream
+            page_size: Rows converted at a time
+        """
+        own = isinstance(target, (str, os.PathLike))
+        stream = open(target, 'w', newline='', encoding='utf-8') if own else target
+        try:
+            writer = csv.writer(stream)
+            writer.writerow(self.columns)
+            for rows in self.iter_pages(page_size):
+                rows.to_csv(stream, header=False, index=False)
+        finally:
+            if own:
+                stream.close()
+
+    def write_xlsx(self, target, page_size: int = 10000) -> None:
+        """
+        Stream the list into a workbook (openpyxl write-only mode)
+
+        Lists longer than an Excel sheet continue on further sheets.
+
+        Args:
+            target: File path or writable binary buffer
+            page_size: Rows converted at a time
+        """
+        from src.excel_exporter import ExcelExporter
+        from openpyxl import Workbook
+
+        exporter = ExcelExporter(chunk_size=page_size)
+        wb = Workbook(write_only=True)
+        sheets = max(1, math.ceil(len(self) / XLSX_ROWS_PER_SHEET))
+        for sheet in range(sheets):
+            start = sheet * XLSX_ROWS_PER_SHEET
+            stop = min(start + XLSX_ROWS_PER_SHEET, len(self))
+            pages = (self.rows(page_start, min(page_start + page_size, stop))
+                     for page_start in range(start, stop, page_size))
+            exporter.write_sheet(wb, 'Merit List' if sheets == 1 else f'Merit List {sheet + 1}', pages,
+                                 columns=self.columns)
+        wb.save(target)
+
+    def write_pdf(self, target, start: int = 0, stop: Optional[int] = None, title: str = "Merit List",
+                  page_size: Optional[int] = None) -> None:
+        """
+        Write part of the list as a PDF, one table per page
+
+        Args:
+            target: File path or writable binary buffer
+            start: First list position of this volume
+            stop: Position after the last one (defaults to the end)
+            title: Title on every page
+            page_size: Rows per PDF page (defaults to as many as fit below
+                the title)
+        """
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.units import inch
+        from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Table, TableStyle
+
+        stop = len(self) if stop is None else min(stop, len(self))
+        styles = getSampleStyleSheet()
+        description = Paragraph(self.describe().replace('&', '&amp;').replace('<', '&lt;'), styles['Normal'])
+        table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4788')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f2f5fa')]),
+        ])
+
+        doc = SimpleDocTemplate(target, pagesize=landscape(A4), topMargin=0.5 * inch, bottomMargin=0.5 * inch)
+        if page_size is None:
+            page_size = self._pdf_rows_per_page(doc, Paragraph(title, styles['Heading2']), description,
+                                                table_style, start, stop)
+
+        story = []
+        for page_start in range(start, max(stop, start + 1), page_size):
+            rows = self.rows(page_start, min(page_start + page_size, stop))
+            if story:
+                story.append(PageBreak())
+            story.append(Paragraph(title, styles['Heading2']))
+            story.append(description)
+            cells = [self.columns] + [[self._format(value) for value in row]
+                                      for row in rows.itertuples(index=False, name=None)]
+            table = Table(cells, repeatRows=1)
+            table.setStyle(table_style)
+            story.append(table)
+        doc.build(story)
+
+    def _pdf_rows_per_page(self, doc, heading, description, table_style, start: int, stop: int) -> int:
+        """
+        Count the table rows that fit on a PDF page below the title
+
+        Args:
+            doc: Document template the pages are built with
+            heading: Title paragraph
+            description: Description paragraph
+            table_style: Style of the table
+            start: First list position of the volume
+            stop: Position after the last one
+
+        Returns:
+            Rows per page (at least 1)
+        """
+        from reportlab.platypus import Table
+
+        # Frames pad their content by 6 points on each side
+        height = doc.height - 12
+        for flowable in (heading, description):
+            height -= flowable.wrap(doc.width - 12, height)[1] + flowable.getSpaceBefore() + flowable.getSpaceAfter()
+
+        # Rows are single-line, so one sample row gives every row's height
+        sample = self.rows(start, min(start + 1, stop))
+        row = [self._format(value) for value in next(sample.itertuples(index=False, name=None), ())]
+        table = Table([self.columns, row or [''] * len(self.columns)])
+        table.setStyle(table_style)
+        row_height = table.wrap(doc.width - 12, height)[1] / 2
+        return max(1, int(height // row_height) - 1)
+
+    @staticmethod
+    def _format(value) -> str:
+        """Format a cell for the PDF table"""
+        if isinstance(value, (float, np.floating)):
+            return '' if np.isnan(value) else f"{value:.2f}"
+        return '' if value is None else str(value)
+
+    def export(self, output_dir: str, formats: Sequence[str] = ('csv',), name: str = None,
+               pdf_rows_per_volume: int = PDF_ROWS_PER_VOLUME) -> List[str]:
+        """
+        Write the list in every requested format
+
+        PDFs are split into volumes of pdf_rows_per_volume rows, so memory
+        use does not grow with the list length; CSV and xlsx stream into a
+        single file each.
+
+        Args:
+            output_dir: Directory for the files
+            formats: Any of 'csv', 'xlsx' and 'pdf'
+            name: File name prefix (a timestamped name is used otherwise)
+            pdf_rows_per_volume: Rows per PDF volume
+
+        Returns:
+            List of written file paths
+        """
+        unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown format(s): {', '.join(unknown)} (use {', '.join(EXPORT_FORMATS)})")
+        os.makedirs(output_dir, exist_ok=True)
+        name = name or f"merit_list_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        paths = []
+
+        def write(file_name, writer, *args, **kwargs):
+            # Sessions exporting the same list share the path; readers only ever see a complete file
+            path = os.path.join(output_dir, file_name)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                writer(temp_path, *args, **kwargs)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            paths.append(path)
+
+        if 'csv' in formats:
+            write(f"{name}.csv", self.write_csv)
+        if 'xlsx' in formats:
+            write(f"{name}.xlsx", self.write_xlsx)
+        if 'pdf' in formats:
+            volumes = max(1, math.ceil(len(self) / pdf_rows_per_volume))
+            for volume in range(volumes):
+                suffix = f"_vol{volume + 1:03d}" if volumes > 1 else ""
+                title = "Merit List" if volumes == 1 else f"Merit List (volume {volume + 1} of {volumes})"
+                write(f"{name}{suffix}.pdf", self.write_pdf, volume * pdf_rows_per_volume,
+                      (volume + 1) * pdf_rows_per_volume, title=title)
+        return paths
+
+
+def parse_filters(items: Sequence[str]) -> Dict[str, List]:
+    """
+    Parse COLUMN=VALUE[,VALUE...] filter arguments
+
+    Values that look like numbers are matched as numbers.
+
+    Args:
+        items: Filter arguments
+
+    Returns:
+        Dictionary of column to allowed values
+    """
+    filters = {}
+    for item in items:
+        column, separator, values = item.partition('=')
+        if not separator or not column:
+            raise ValueError(f"Filter {item!r} must look like COLUMN=VALUE[,VALUE...]")
+        parsed = []
+        for value in values.split(','):
+            try:
+                parsed.append(float(value) if '.' in value else int(value))
+            except ValueError:
+                parsed.append(value)
+        filters.setdefault(column.strip(), []).extend(parsed)
+    return filters
+
+
+def main(argv=None) -> int:
+    """Parse arguments, rank a workbook and write the merit list"""
+    parser = argparse.ArgumentParser(prog="python -m src.merit_list",
+                                     description="Publish a merit list for an exam results workbook")
+    parser.add_argument('file', help="Excel workbook")
+    parser.add_argument('--keys', nargs='+', default=DEFAULT_KEYS,
+                        help=f"ranking columns, most significant first (default: {' '.join(DEFAULT_KEYS)})")
+    parser.add_argument('--subjects', nargs='*', default=[], help="subject priority order for ties")
+    parser.add_argument('--tie-rule', choices=TIE_RULES, default='competition', help="rank numbering for ties")
+    parser.add_argument('--tie-breaker', default='Roll_No', help="column ordering full ties ('none' for file order)")
+    parser.add_argument('--filter', action='append', default=[], metavar='COLUMN=VALUES',
+                        help="keep only these values, e.g. Section=A,B (repeatable)")
+    parser.add_argument('--where', help="query expression, e.g. \"Status == 'PASS'\"")
+    parser.add_argument('--format', nargs='+', choices=EXPORT_FORMATS, default=['csv'], dest='formats')
+    parser.add_argument('--output-dir', default="outputs/merit_lists", help="directory for the files")
+    parser.add_argument('--name', help="file name prefix")
+    args = parser.parse_args(argv)
+
+    from src.pipeline import content_hash, run_pipeline
+
+    with open(args.file, 'rb') as f:
+        data = f.read()
+    result = run_pipeline(data, key=content_hash(data))
+    if not result.ok:
+        print(json.dumps({'status': 'error', 'message': result.message, 'errors': result.errors}))
+        return 1
+    try:
+        merit = MeritList(result.query, keys=args.keys, subject_priority=args.subjects, tie_rule=args.tie_rule,
+                          tie_breaker=None if args.tie_breaker.lower() == 'none' else args.tie_breaker,
+                          filters=parse_filters(args.filter), expression=args.where)
+        paths = merit.export(args.output_dir, args.formats, name=args.name)
+    except ValueError as e:
+        print(json.dumps({'status': 'error', 'message': str(e), 'errors': []}))
+        return 2
+    print(json.dumps({'status': 'ok', 'students': len(merit), 'ranking': merit.describe(), 'files': paths}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
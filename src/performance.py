@@ -0,0 +1,203 @@
+"""
+Performance Settings Module
+Container CPU and memory limits, and the worker counts, chunk sizes and
+cache budgets tuned for this host by ``python startup_check.py --probe --save``
+
+Settings come from RESULT_SYSTEM_PERFORMANCE_CONFIG or
+config/performance.json, falling back to built-in defaults for anything
+the file does not set. Environment variables of the individual settings
+(e.g. RESULT_SYSTEM_STORE_BUDGET_MB) still take precedence.
+"""
+
+import json
+import math
+import os
+import threading
+from typing import Any, Dict, Optional
+
+# Settings file read by get_settings(), overridable with RESULT_SYSTEM_PERFORMANCE_CONFIG
+DEFAULT_SETTINGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'config', 'performance.json')
+
+# Built-in settings; a worker count of None means one per available CPU
+DEFAULT_SETTINGS = {
+    'workers': None,
+    'xlsx_workers': None,
+    'export_chunk_rows': 10000,
+    'store_budget_mb': 1024,
+    'fast_xlsx': False,
+}
+
+# cgroup memory limits at or above this are "no limit" (v1 reports a huge number)
+_UNLIMITED_BYTES = 1 << 60
+
+_settings = {}
+_settings_lock = threading.Lock()
+
+
+def _read(path: str) -> Optional[str]:
+    """Read a small system file, or None when it does not exist"""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_quota() -> Optional[float]:
+    """
+    CPU limit of this container
+
+    Returns:
+        Number of CPUs the cgroup quota allows (may be fractional), or None
+        when there is no quota
+    """
+    text = _read('/sys/fs/cgroup/cpu.max')
+    if text:
+        quota, _, period = text.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / int(period)
+        return None
+    quota = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def memory_limit() -> Optional[int]:
+    """
+    Memory limit of this container
+
+    Returns:
+        Limit in bytes, or None when there is no limit
+    """
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        text = _read(path)
+        if text and text != 'max':
+            limit = int(text)
+            return limit if limit < _UNLIMITED_BYTES else None
+    return None
+
+
+def physical_memory() -> Optional[int]:
+    """
+    Memory installed in the host
+
+    Returns:
+        Bytes, or None when it cannot be determined
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def available_cpus() -> int:
+    """
+    CPUs this process can actually use
+
+    os.cpu_count() reports the host's CPUs; the CPU affinity mask and the
+    container's quota can both allow fewer.
+
+    Returns:
+        Number of usable CPUs (at least 1)
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    quota = cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def host_limits() -> Dict[str, Any]:
+    """
+    Describe the CPU and memory available to this process
+
+    Returns:
+        Dictionary with cpu_count, available_cpus, cpu_quota,
+        memory_limit_bytes (container) and physical_memory_bytes
+    """
+    return {
+        'cpu_count': os.cpu_count() or 1,
+        'available_cpus': available_cpus(),
+        'cpu_quota': cpu_quota(),
+        'memory_limit_bytes': memory_limit(),
+        'physical_memory_bytes': physical_memory(),
+    }
+
+
+def settings_path() -> str:
+    """Path of the settings file in effect"""
+    return os.environ.get('RESULT_SYSTEM_PERFORMANCE_CONFIG', DEFAULT_SETTINGS_PATH)
+
+
+def get_settings() -> Dict[str, Any]:
+    """
+    Get the performance settings in effect
+
+    The file is re-read when it changes.
+
+    Returns:
+        DEFAULT_SETTINGS updated with the settings file's values
+    """
+    path = settings_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return dict(DEFAULT_SETTINGS)
+    with _settings_lock:
+        cached = _settings.get(path)
+        if cached is None or cached[0] != mtime:
+            with open(path) as f:
+                saved = json.load(f)
+            settings = dict(DEFAULT_SETTINGS)
+            settings.update({key: value for key, value in saved.items() if key in DEFAULT_SETTINGS})
+            cached = (mtime, settings)
+            _settings[path] = cached
+        return dict(cached[1])
+
+
+def setting(name: str) -> Any:
+    """
+    Get one performance setting
+
+    Args:
+        name: Key of DEFAULT_SETTINGS
+
+    Returns:
+        The setting; worker counts left unset resolve to available_cpus()
+    """
+    value = get_settings()[name]
+    if name in ('workers', 'xlsx_workers') and not value:
+        return available_cpus()
+    return value
+
+
+def save_settings(settings: Dict[str, Any], extra: Optional[Dict[str, Any]] = None,
+                  path: Optional[str] = None) -> str:
+    """
+    Write tuned settings to the settings file
+
+    Args:
+        settings: Values for keys of DEFAULT_SETTINGS
+        extra: Additional keys stored for reference (e.g. the measurements
+            the settings were derived from)
+        path: Target file (defaults to settings_path())
+
+    Returns:
+        Path of the written file
+    """
+    path = path or settings_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    content = {key: settings[key] for key in DEFAULT_SETTINGS if key in settings}
+    content.update(extra or {})
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(content, f, indent=2)
+        f.write('\n')
+    os.replace(temp_path, path)
+    return path
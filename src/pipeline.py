@@ -0,0 +1,412 @@
+"""
+Processing Pipeline Module
+Runs load, validation, grading and analysis for one workbook and keys the
+result by the workbook's content hash and the grading configuration
+"""
+
+import hashlib
+import os
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from functools import cached_property
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from src.data_processor import DataProcessor
+from src.grading_policy import get_grading_policy
+from src.analyzer import Analyzer
+from src.table_query import StudentTable
+from src.result_query import QueryError, ResultsQuery
+from src.instrumentation import instrumented
+
+# pyplot keeps global state, so charts from concurrent sessions are rendered one at a time
+_CHART_LOCK = threading.Lock()
+
+# Number of merit lists (ranking options) kept per dataset
+MAX_CACHED_MERIT_LISTS = 8
+
+
+def content_hash(data: bytes) -> str:
+    """
+    Hash workbook contents
+
+    Args:
+        data: Raw file bytes
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def grading_config_key() -> str:
+    """
+    Build a key that changes whenever the grading configuration changes
+
+    Returns:
+        Fingerprint of the grading policy in effect
+    """
+    return get_grading_policy().fingerprint()
+
+
+class PipelineResult:
+    """Outcome of processing one workbook, with analysis computed on first use"""
+
+    def __init__(self, key: str, processor: DataProcessor, loaded: bool, message: str,
+                 is_valid: bool, errors: List[str], raw_df: pd.DataFrame,
+                 chart_dir: str = "outputs/charts"):
+        """
+        Initialize pipeline result
+
+        Args:
+            key: Cache key (content hash and grading configuration)
+            processor: Processor holding the graded data
+            loaded: Whether the workbook could be loaded
+            message: Load message
+            is_valid: Whether validation passed
+            errors: Validation errors
+            raw_df: Data as loaded, before grading
+            chart_dir: Base directory for charts of this result
+        """
+        self.key = key
+        self.processor = processor
+        self.loaded = loaded
+        self.message = message
+        self.is_valid = is_valid
+        self.errors = errors
+        self.raw_df = raw_df
+        self.chart_dir = os.path.join(chart_dir, key[:16])
+        self._toppers = {}
+        self._merit_lists = OrderedDict()
+        self._merit_lock = threading.Lock()
+        self._charts = None
+        self._report = None
+        self._selection_reports = {}
+        self._report_lock = threading.Lock()
+
+    @property
+    def ok(self) -> bool:
+        """Whether the workbook loaded, validated and was graded"""
+        return self.loaded and self.is_valid
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Processed DataFrame"""
+        return self.processor.get_processed_data()
+
+    def memory_bytes(self) -> int:
+        """
+        Approximate memory held by the loaded frame, the processed frame and
+        the results model
+
+        Most processed columns are views of the loaded frame or the model,
+        so every column buffer is counted once.
+        """
+        counted = []
+        total = 0
+
+        def add(values, nbytes: int):
+            nonlocal total
+            for other in counted:
+                if values is other or (isinstance(values, np.ndarray) and isinstance(other, np.ndarray)
+                                       and np.may_share_memory(values, other)):
+                    return
+            counted.append(values)
+            total += nbytes
+
+        frames = [self.raw_df] if self.raw_df is not None else []
+        if self.processor.df is not None and self.processor.df is not self.raw_df:
+            frames.append(self.processor.df)
+        for frame in frames:
+            usage = frame.memory_usage(deep=True, index=False)
+            for position in range(frame.shape[1]):
+                column = frame.iloc[:, position]
+                values = column.to_numpy() if isinstance(column.dtype, np.dtype) else column.array
+                add(values, int(usage.iloc[position]))
+        model = self.processor.get_results_model()
+        if model is not None:
+            add(model.marks, model.marks.nbytes)
+            for values in model.derived.values():
+                add(values, values.nbytes)
+        with self._merit_lock:
+            total += sum(merit.nbytes for merit in self._merit_lists.values())
+        return total
+
+    @cached_property
+    def analyzer(self) -> Analyzer:
+        """Analyzer over the processed data"""
+        return Analyzer(self.df, output_dir=self.chart_dir, model=self.processor.get_results_model(),
+                        policy=self.processor.policy)
+
+    @cached_property
+    def query(self) -> ResultsQuery:
+        """Query expressions (e.g. "Math < 40 and Average > 60") over the processed data"""
+        return ResultsQuery(self.processor.get_results_model(), policy=self.processor.policy)
+
+    @cached_property
+    def table(self) -> StudentTable:
+        """Filterable, sortable and pageable view of the processed data"""
+        return StudentTable(self.df, query_engine=self.query)
+
+    @cached_property
+    def statistics(self) -> Dict[str, float]:
+        """Overall statistics"""
+        return self.analyzer.get_statistics()
+
+    @cached_property
+    def subject_statistics(self) -> pd.DataFrame:
+        """Per-subject statistics"""
+        return self.analyzer.get_subject_statistics()
+
+    @cached_property
+    def weak_subjects(self) -> Dict[str, float]:
+        """Subjects ordered from lowest to highest average"""
+        return self.analyzer.get_weak_subjects()
+
+    @cached_property
+    def strong_subjects(self) -> Dict[str, float]:
+        """Subjects ordered from highest to lowest average"""
+        return self.analyzer.get_strong_subjects()
+
+    @cached_property
+    def anomalies(self) -> pd.DataFrame:
+        """Suspicious marks patterns, most severe first"""
+        return self.analyzer.detect_anomalies()
+
+    def student(self, roll_no) -> Optional[Dict]:
+        """
+        Look up one student's processed record by roll number
+
+        Args:
+            roll_no: Roll number as typed
+
+        Returns:
+            Dictionary of the student's columns, or None when not found
+        """
+        return self.processor.get_student(roll_no)
+
+    def relative_ranks(self) -> pd.DataFrame:
+        """Per-subject and overall percentile ranks and z-scores (computed once)"""
+        return self.processor.get_relative_ranks()
+
+    def toppers(self, top_n: int = 5) -> pd.DataFrame:
+        """
+        Get top performing students
+
+        Args:
+            top_n: Number of top students to return
+
+        Returns:
+            DataFrame of top students
+        """
+        if top_n not in self._toppers:
+            self._toppers[top_n] = self.analyzer.get_toppers(top_n=top_n)
+        return self._toppers[top_n]
+
+    def merit_list(self, subject_priority: Tuple[str, ...] = (), tie_rule: str = 'competition',
+                   filters: Optional[Dict[str, Tuple]] = None, expression: Optional[str] = None):
+        """
+        Rank the cohort for a merit list
+
+        The most recently used MAX_CACHED_MERIT_LISTS lists are kept.
+
+        Args:
+            subject_priority: Subjects breaking ties after Average and GPA, in order
+            tie_rule: 'competition', 'dense' or 'ordinal'
+            filters: Category filters as column -> allowed values
+            expression: Query expression restricting the students
+
+        Returns:
+            MeritList
+
+        Raises:
+            QueryError: When a filter column or the expression is invalid
+        """
+        from src.merit_list import MeritList
+
+        expression = ' '.join(expression.split()) if expression else None
+        filters = {column: tuple(values) for column, values in (filters or {}).items() if len(values)}
+        options = (tuple(subject_priority), tie_rule, tuple(sorted(filters.items())), expression)
+        with self._merit_lock:
+            merit = self._merit_lists.get(options)
+            if merit is None:
+                merit = MeritList(self.query, subject_priority=subject_priority, tie_rule=tie_rule,
+                                  filters=filters, expression=expression)
+                if len(self._merit_lists) >= MAX_CACHED_MERIT_LISTS:
+                    self._merit_lists.popitem(last=False)
+                self._merit_lists[options] = merit
+            else:
+                self._merit_lists.move_to_end(options)
+            return merit
+
+    @cached_property
+    def chart_data(self) -> Dict[str, pd.DataFrame]:
+        """Pre-aggregated chart data (one row per bar) for interactive charts"""
+        return self.analyzer.get_chart_data()
+
+    def charts(self) -> Dict[str, str]:
+        """
+        Generate charts once and reuse the files afterwards
+
+        Returns:
+            Dictionary with chart names and file paths
+        """
+        with _CHART_LOCK:
+            if self._charts is None or not all(os.path.exists(path) for path in self._charts.values()):
+                self._charts = self.analyzer.generate_all_charts()
+            return self._charts
+
+    def report(self, output_dir: str = "outputs/reports") -> str:
+        """
+        Build the PDF report once and reuse the file afterwards
+
+        Args:
+            output_dir: Base directory for reports (a sub-directory per result is used)
+
+        Returns:
+            Path to the PDF report
+        """
+        from src.report_generator import PDFReportGenerator
+
+        charts = self.charts()
+        with self._report_lock:
+            if self._report is None or not os.path.exists(self._report):
+                pdf_gen = PDFReportGenerator(output_dir=os.path.join(output_dir, self.key[:16]),
+                                             policy=self.processor.policy)
+                self._report = pdf_gen.generate_report(
+                    self.df, self.statistics, self.toppers(top_n=5),
+                    self.weak_subjects, self.strong_subjects, charts
+                )
+            return self._report
+
+    def selection_report(self, expression: str, output_dir: str = "outputs/reports") -> str:
+        """
+        Build (once per expression) a PDF report of the students matching a query
+
+        Args:
+            expression: Query expression, e.g. "failed_subjects >= 2"
+            output_dir: Base directory for reports (a sub-directory per result is used)
+
+        Returns:
+            Path to the PDF report
+
+        Raises:
+            QueryError: When the expression is invalid or matches no student
+        """
+        from src.report_generator import PDFReportGenerator
+
+        expression = ' '.join(expression.split())
+        positions = self.query.positions(expression)
+        if not len(positions):
+            raise QueryError(f"No students match {expression!r}")
+        digest = content_hash(expression.encode('utf-8'))[:16]
+        with self._report_lock:
+            path = self._selection_reports.get(expression)
+            if path is None or not os.path.exists(path):
+                subset = self.df.iloc[positions].reset_index(drop=True)
+                analyzer = Analyzer(subset, output_dir=os.path.join(self.chart_dir, f"query_{digest}"),
+                                    policy=self.processor.policy)
+                with _CHART_LOCK:
+                    charts = analyzer.generate_all_charts()
+                pdf_gen = PDFReportGenerator(output_dir=os.path.join(output_dir, self.key[:16], f"query_{digest}"),
+                                             policy=self.processor.policy)
+                path = pdf_gen.generate_report(
+                    subset, analyzer.get_statistics(), analyzer.get_toppers(top_n=5),
+                    analyzer.get_weak_subjects(), analyzer.get_strong_subjects(), charts,
+                    selection=expression
+                )
+                self._selection_reports[expression] = path
+            return path
+
+
+def persist_upload(data: bytes, file_name: str, key: str, root: str = "data/uploads") -> str:
+    """
+    Save a raw upload under a directory named after its content hash
+
+    The file is written to a temporary name and renamed into place, so
+    concurrent saves of the same upload never expose a partial file.
+
+    Args:
+        data: Raw file bytes
+        file_name: Original file name
+        key: Content hash (or cache key) of the upload
+        root: Base directory for saved uploads
+
+    Returns:
+        Path to the saved file
+    """
+    upload_dir = os.path.join(root, key[:16])
+    os.makedirs(upload_dir, exist_ok=True)
+
+    safe_name = os.path.basename(file_name) or "upload.xlsx"
+    file_path = os.path.join(upload_dir, safe_name)
+    temp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, file_path)
+
+    return file_path
+
+
+@instrumented('pipeline.precheck')
+def precheck_pipeline(source: Union[str, bytes, BinaryIO, List[Tuple[str, Union[str, bytes]]]],
+                      key: str) -> Tuple[DataProcessor, List[str], Optional[PipelineResult]]:
+    """
+    First validation tier: check the header and the first rows of an upload
+
+    This returns within a fraction of a second however large the workbook,
+    so broken files are rejected before the full load. Pass the returned
+    processor to run_pipeline() for the full validation; the rows checked
+    here are not validated again.
+
+    Args:
+        source: As for run_pipeline()
+        key: Cache key for the result
+
+    Returns:
+        Tuple of (processor, errors found in the sampled rows, result when
+        the upload is rejected or None when it should be processed in full)
+    """
+    processor = DataProcessor()
+    proceed, errors = processor.precheck(source)
+    if proceed:
+        return processor, errors, None
+    if processor.sample is None:
+        return processor, errors, PipelineResult(key, processor, False, errors[0], False, [], None)
+    return processor, errors, PipelineResult(key, processor, True, "Rejected by the quick check",
+                                             False, errors, processor.sample)
+
+
+@instrumented('pipeline.run_pipeline')
+def run_pipeline(source: Union[str, bytes, BinaryIO, List[Tuple[str, Union[str, bytes]]]],
+                 key: str, processor: Optional[DataProcessor] = None) -> PipelineResult:
+    """
+    Load, validate and grade a workbook, or several merged into one cohort
+
+    Args:
+        source: Path to the Excel file, its contents as bytes or a buffer,
+            or a list of (file name, path or bytes) pairs to merge
+        key: Cache key for the result
+        processor: Processor that already ran precheck() on this source
+            (a new one is used when None)
+
+    Returns:
+        PipelineResult (check ``ok`` before using the analysis)
+    """
+    processor = processor or DataProcessor()
+    if isinstance(source, list):
+        loaded, message = processor.load_many(source)
+    elif isinstance(source, (str, os.PathLike)):
+        loaded, message = processor.load_excel(source)
+    else:
+        loaded, message = processor.load_buffer(source)
+    if not loaded:
+        return PipelineResult(key, processor, False, message, False, [], None)
+
+    raw_df = processor.df
+    is_valid, errors = processor.validate_data()
+    if is_valid:
+        processor.calculate_grades()
+
+    return PipelineResult(key, processor, True, message, is_valid, list(errors), raw_df)
@@ -0,0 +1,78 @@
+"""
+Relative Grading Module
+Percentile ranks and z-scores within a cohort, one sort per column
+"""
+
+import warnings
+import numpy as np
+
+
+def _as_columns(values: np.ndarray):
+    """Return values as a 2-D float matrix and whether the input was 1-D"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        return values.reshape(-1, 1), True
+    return values, False
+
+
+def percentile_ranks(values: np.ndarray) -> np.ndarray:
+    """
+    Percentile rank (0-100) of every value within its column
+
+    Uses the mid-rank definition: the share of the cohort scoring below a
+    value plus half the share scoring the same. Tied values always get the
+    same rank, whatever their row order. Each column is sorted once.
+
+    Args:
+        values: 1-D array or (students x subjects) matrix; NaN is ignored
+
+    Returns:
+        Array of the same shape (NaN where the value is missing)
+    """
+    matrix, flat = _as_columns(values)
+    ranks = np.full(matrix.shape, np.nan)
+
+    for j in range(matrix.shape[1]):
+        column = matrix[:, j]
+        valid = np.flatnonzero(~np.isnan(column))
+        n = len(valid)
+        if not n:
+            continue
+
+        order = valid[np.argsort(column[valid], kind='stable')]
+        ordered = column[order]
+
+        # Runs of equal values share the position of their first member
+        starts = np.empty(n, dtype=bool)
+        starts[0] = True
+        np.not_equal(ordered[1:], ordered[:-1], out=starts[1:])
+        first = np.flatnonzero(starts)
+        run = np.cumsum(starts) - 1
+        below = first[run]
+        equal = np.diff(np.append(first, n))[run]
+
+        ranks[order, j] = 100.0 * (below + equal / 2.0) / n
+
+    return ranks[:, 0] if flat else ranks
+
+
+def z_scores(values: np.ndarray) -> np.ndarray:
+    """
+    Standard score of every value within its column
+
+    Args:
+        values: 1-D array or (students x subjects) matrix; NaN is ignored
+
+    Returns:
+        Array of the same shape (0 for columns with no spread, NaN where
+        the value is missing)
+    """
+    matrix, flat = _as_columns(values)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(matrix, axis=0)
+        std = np.nanstd(matrix, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = np.where(std > 0, (matrix - mean) / np.where(std > 0, std, 1.0), 0.0)
+    scores[np.isnan(matrix)] = np.nan
+    return scores[:, 0] if flat else scores
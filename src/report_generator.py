@@ -5,6 +5,7 @@ Generates professional PDF reports with charts and analytics
 
 import os
 import pandas as pd
+from xml.sax.saxutils import escape
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -12,24 +13,36 @@ from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from datetime import datetime
+from typing import BinaryIO, List, Optional, Union
+
+from src.grading_policy import GradingPolicy, get_grading_policy
+from src.instrumentation import instrumented
+
+# Changed students listed individually in the change report
+CHANGE_REPORT_MAX_STUDENTS = 500
 
 
 class PDFReportGenerator:
     """Generate professional PDF reports for exam results"""
     
-    def __init__(self, output_dir: str = "outputs/reports"):
+    def __init__(self, output_dir: str = "outputs/reports", policy: GradingPolicy = None):
         """
         Initialize PDF generator
         
         Args:
             output_dir: Directory to save PDF reports
+            policy: Grading policy for per-subject results (defaults to the
+                configured policy)
         """
         self.output_dir = output_dir
+        self.policy = policy or get_grading_policy()
         os.makedirs(output_dir, exist_ok=True)
     
+    @instrumented()
     def generate_report(self, df: pd.DataFrame, stats: dict, 
                        toppers: pd.DataFrame, weak_subjects: dict,
-                       strong_subjects: dict, chart_paths: dict) -> str:
+                       strong_subjects: dict, chart_paths: dict,
+                       selection: Optional[str] = None) -> str:
         """
         Generate comprehensive PDF report
         
@@ -40,6 +53,8 @@ class PDFReportGenerator:
             weak_subjects: Dictionary of weak subjects
             strong_subjects: Dictionary of strong subjects
             chart_paths: Dictionary of chart file paths
+            selection: Query expression the students were selected with,
+                shown under the title (None for the whole cohort)
             
         Returns:
             Path to generated PDF file
@@ -54,28 +69,7 @@ class PDFReportGenerator:
         
         # Create story for PDF content
         story = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1f4788'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#1f4788'),
-            spaceAfter=12,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        )
+        styles, title_style, heading_style = self._build_styles()
         
         # Title
         title = Paragraph("EXAM RESULT ANALYSIS REPORT", title_style)
@@ -85,6 +79,8 @@ class PDFReportGenerator:
         metadata_text = f"Generated on {datetime.now().strftime('%d-%m-%Y %H:%M:%S')}"
         metadata = Paragraph(metadata_text, styles['Normal'])
         story.append(metadata)
+        if selection:
+            story.append(Paragraph(f"Students matching: {escape(selection)} ({len(df)} students)", styles['Normal']))
         story.append(Spacer(1, 0.3*inch))
         
         # Statistics section
@@ -224,3 +220,247 @@ class PDFReportGenerator:
         doc.build(story)
         
         return pdf_filename
+    
+    @instrumented()
+    def generate_student_report(self, student, subject_cols: List[str],
+                                target: Union[str, BinaryIO] = None) -> Union[str, BinaryIO]:
+        """
+        Generate a single-page report card for one student
+        
+        Args:
+            student: Processed row for the student (Series or dict)
+            subject_cols: Subject column names to list on the card
+            target: File path or writable binary buffer (defaults to a
+                file named after the roll number in the output directory)
+            
+        Returns:
+            The path or buffer the PDF was written to
+        """
+        if target is None:
+            target = os.path.join(self.output_dir, f"report_card_{student['Roll_No']}.pdf")
+        
+        doc = SimpleDocTemplate(target, pagesize=A4,
+                               rightMargin=0.75*inch, leftMargin=0.75*inch,
+                               topMargin=0.75*inch, bottomMargin=0.75*inch)
+        
+        story = []
+        styles, title_style, heading_style = self._build_styles()
+        
+        story.append(Paragraph("STUDENT REPORT CARD", title_style))
+        
+        details_data = [
+            ['Student Name', str(student['Student_Name'])],
+            ['Roll No', str(student['Roll_No'])]
+        ]
+        if 'Section' in student:
+            details_data.append(['Section', str(student['Section'])])
+        
+        details_table = Table(details_data, colWidths=[2*inch, 3.5*inch])
+        details_table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+        ]))
+        story.append(details_table)
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Subject marks section
+        story.append(Paragraph("SUBJECT MARKS", heading_style))
+        marks_data = [['Subject', 'Marks', 'Result']]
+        for subject in subject_cols:
+            marks = student[subject]
+            passed = marks >= self.policy.subject_pass_mark(subject)
+            marks_data.append([subject, f"{marks:.0f}", 'PASS' if passed else 'FAIL'])
+        
+        marks_table = Table(marks_data, colWidths=[3*inch, 1.25*inch, 1.25*inch])
+        marks_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4788')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+        ]))
+        story.append(marks_table)
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Result summary section
+        story.append(Paragraph("RESULT SUMMARY", heading_style))
+        summary_data = [
+            ['Average', 'Grade', 'GPA', 'Status'],
+            [f"{student['Average']:.2f}", str(student['Grade']),
+             f"{student['GPA']:.2f}", str(student['Status'])]
+        ]
+        status_color = colors.HexColor('#28a745') if student['Status'] == 'PASS' else colors.HexColor('#dc3545')
+        summary_table = Table(summary_data, colWidths=[1.375*inch] * 4)
+        summary_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#17a2b8')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('TEXTCOLOR', (3, 1), (3, 1), status_color),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        story.append(summary_table)
+        
+        doc.build(story)
+        
+        return target
+    
+    @instrumented()
+    def generate_change_report(self, diff, target: Union[str, BinaryIO] = None,
+                               max_students: int = CHANGE_REPORT_MAX_STUDENTS) -> Union[str, BinaryIO]:
+        """
+        Generate a report of the changes between two result sets
+        
+        Args:
+            diff: ResultDiff of the original and revised results
+            target: File path or writable binary buffer (defaults to a
+                timestamped file in the output directory)
+            max_students: Changed students listed individually (the full
+                list is in the Excel change report)
+            
+        Returns:
+            The path or buffer the PDF was written to
+        """
+        if target is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            target = os.path.join(self.output_dir, f"change_report_{timestamp}.pdf")
+        
+        doc = SimpleDocTemplate(target, pagesize=letter,
+                               rightMargin=0.5*inch, leftMargin=0.5*inch,
+                               topMargin=0.5*inch, bottomMargin=0.5*inch)
+        
+        story = []
+        styles, title_style, heading_style = self._build_styles()
+        table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4788')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
+        ])
+        
+        def number(value):
+            return '' if pd.isna(value) else f"{value:,.2f}".rstrip('0').rstrip('.')
+        
+        def change(value):
+            return '' if pd.isna(value) or value == 0 else f"{value:+,.2f}".rstrip('0').rstrip('.')
+        
+        story.append(Paragraph("RESULT CHANGE REPORT", title_style))
+        story.append(Paragraph(f"Generated on {datetime.now().strftime('%d-%m-%Y %H:%M:%S')}", styles['Normal']))
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Summary section
+        story.append(Paragraph("SUMMARY", heading_style))
+        summary_data = [['Metric', 'Students']] + [[metric, f"{value:,}"] for metric, value in diff.summary().items()]
+        summary_table = Table(summary_data, colWidths=[3*inch, 2*inch])
+        summary_table.setStyle(table_style)
+        story.append(summary_table)
+        if diff.added_subjects or diff.removed_subjects:
+            story.append(Spacer(1, 0.1*inch))
+            story.append(Paragraph(
+                f"Subjects added: {escape(', '.join(diff.added_subjects)) or 'none'}; "
+                f"removed: {escape(', '.join(diff.removed_subjects)) or 'none'}", styles['Normal']))
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Class statistics section
+        story.append(Paragraph("CLASS STATISTICS", heading_style))
+        stats_data = [['Metric', 'Before', 'After', 'Change']]
+        for row in diff.statistics_delta().itertuples(index=False):
+            stats_data.append([row.Metric, number(row.Before), number(row.After), change(row.Change)])
+        stats_table = Table(stats_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 1.5*inch])
+        stats_table.setStyle(table_style)
+        story.append(stats_table)
+        story.append(Spacer(1, 0.3*inch))
+        
+        # Subject statistics section
+        story.append(Paragraph("SUBJECT STATISTICS", heading_style))
+        subject_data = [['Subject', 'Metric', 'Before', 'After', 'Change']]
+        for row in diff.subject_delta().itertuples(index=False):
+            subject_data.append([row.Subject, row.Metric, number(row.Before), number(row.After), change(row.Change)])
+        subject_table = Table(subject_data, colWidths=[1.75*inch, 1.5*inch, 1.25*inch, 1.25*inch, 1.25*inch],
+                              repeatRows=1)
+        subject_table.setStyle(table_style)
+        story.append(subject_table)
+        
+        # Grade changes section
+        transitions = diff.grade_transitions()
+        if not transitions.empty:
+            story.append(Spacer(1, 0.3*inch))
+            story.append(Paragraph("GRADE CHANGES", heading_style))
+            grade_data = [['Grade Before', 'Grade After', 'Students']] + [
+                [str(row[0]), str(row[1]), f"{row[2]:,}"] for row in transitions.itertuples(index=False)
+            ]
+            grade_table = Table(grade_data, colWidths=[1.75*inch, 1.75*inch, 1.5*inch], repeatRows=1)
+            grade_table.setStyle(table_style)
+            story.append(grade_table)
+        
+        # Changed students section
+        students = diff.students()
+        if not students.empty:
+            story.append(PageBreak())
+            story.append(Paragraph("CHANGED STUDENTS", heading_style))
+            if len(students) > max_students:
+                story.append(Paragraph(f"First {max_students:,} of {len(students):,} changed students; "
+                                       "see the Excel change report for the full list.", styles['Normal']))
+            columns = [('Roll No', 'Roll_No'), ('Student Name', 'Student_Name'),
+                       ('Subjects Changed', 'Subjects Changed'), ('Average', 'Average'),
+                       ('Grade', 'Grade'), ('Status', 'Status')]
+            student_data = [[label for label, _ in columns]]
+            for row in students.head(max_students).to_dict('records'):
+                student_data.append([
+                    str(row['Roll_No']),
+                    Paragraph(escape(str(row['Student_Name'])), styles['Normal']),
+                    Paragraph(escape(row['Subjects Changed']) or '-', styles['Normal']),
+                    f"{number(row.get('Average Before'))} -> {number(row.get('Average After'))}",
+                    f"{row.get('Grade Before', '')} -> {row.get('Grade After', '')}",
+                    f"{row.get('Status Before', '')} -> {row.get('Status After', '')}"
+                ])
+            student_table = Table(student_data, repeatRows=1,
+                                  colWidths=[0.8*inch, 1.8*inch, 1.8*inch, 1.2*inch, 0.9*inch, 1.1*inch])
+            student_table.setStyle(table_style)
+            story.append(student_table)
+        
+        doc.build(story)
+        
+        return target
+    
+    def _build_styles(self):
+        """
+        Build the paragraph styles shared by all reports
+        
+        Returns:
+            Tuple of (sample stylesheet, title style, heading style)
+        """
+        styles = getSampleStyleSheet()
+        
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#1f4788'),
+            spaceAfter=30,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        )
+        
+        heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor=colors.HexColor('#1f4788'),
+            spaceAfter=12,
+            spaceBefore=12,
+            fontName='Helvetica-Bold'
+        )
+        
+        return styles, title_style, heading_style
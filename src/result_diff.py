@@ -0,0 +1,352 @@
+"""
+Result Diff Module
+Compares two processed result sets of the same cohort (e.g. before and
+after revaluation): students are matched on Roll_No with one hash join and
+every change in marks, grade and status, plus the shift in class and
+subject statistics, is computed with vectorized array operations
+
+Usage:
+    python -m src.result_diff before.xlsx after.xlsx --format xlsx pdf \
+        --output-dir outputs/diffs
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import BinaryIO, Dict, List, Sequence, Union
+
+from src.instrumentation import instrumented
+
+# Report formats written by ResultDiff.export()
+EXPORT_FORMATS = ('xlsx', 'pdf')
+
+
+def _changed(before: np.ndarray, after: np.ndarray) -> np.ndarray:
+    """Element-wise inequality where two missing values count as equal"""
+    changed = before != after
+    if before.dtype.kind in 'fO' or after.dtype.kind in 'fO':
+        changed &= ~(pd.isna(before) & pd.isna(after))
+    return changed
+
+
+class ResultDiff:
+    """Per-student and class-level changes between two result sets"""
+
+    @instrumented('result_diff.compare')
+    def __init__(self, before, after):
+        """
+        Match the two result sets on Roll_No and compute every change
+
+        Args:
+            before: PipelineResult of the original results
+            after: PipelineResult of the revised results
+
+        Raises:
+            ValueError: When either result did not validate
+        """
+        for label, result in (('Original', before), ('Revised', after)):
+            if not result.ok:
+                raise ValueError(f"{label} results are not valid: {result.message}")
+            if not result.processor.roll_index.is_unique:
+                raise ValueError(f"{label} results have duplicate roll numbers")
+        self.before = before
+        self.after = after
+        before_model = before.processor.get_results_model()
+        after_model = after.processor.get_results_model()
+
+        # Hash join: position in the original results of every revised row (-1 when new)
+        matches = before.processor.roll_index.keys.get_indexer(after.processor.roll_index.keys)
+        self.after_positions = np.flatnonzero(matches >= 0)
+        self.before_positions = matches[self.after_positions]
+        kept = np.zeros(len(before_model), dtype=bool)
+        kept[self.before_positions] = True
+        self.added_positions = np.flatnonzero(matches < 0)
+        self.removed_positions = np.flatnonzero(~kept)
+
+        self.subjects = [subject for subject in after_model.subjects if subject in before_model.subjects]
+        self.added_subjects = [subject for subject in after_model.subjects if subject not in before_model.subjects]
+        self.removed_subjects = [subject for subject in before_model.subjects if subject not in after_model.subjects]
+
+        # Marks of matched students, one column per common subject
+        self.marks_before = {subject: before_model.column(subject)[self.before_positions]
+                             for subject in self.subjects}
+        self.marks_after = {subject: after_model.column(subject)[self.after_positions]
+                            for subject in self.subjects}
+        self.mark_changed = {subject: _changed(self.marks_before[subject], self.marks_after[subject])
+                             for subject in self.subjects}
+
+        self.derived_before = {name: values[self.before_positions] for name, values in before_model.derived.items()}
+        self.derived_after = {name: values[self.after_positions] for name, values in after_model.derived.items()}
+        self.derived_changed = {name: _changed(self.derived_before[name], self.derived_after[name])
+                                for name in self.derived_after if name in self.derived_before}
+
+        changed = np.zeros(len(self.after_positions), dtype=bool)
+        for mask in list(self.mark_changed.values()) + list(self.derived_changed.values()):
+            changed |= mask
+        self.changed = changed
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Count the changes
+
+        Returns:
+            Dictionary with matched, added and removed students, students and
+            marks changed, grade and status changes, and status transitions
+        """
+        status_before = self.derived_before.get('Status')
+        status_after = self.derived_after.get('Status')
+        none = np.zeros(len(self.after_positions), dtype=bool)
+        return {
+            'Matched Students': len(self.after_positions),
+            'Added Students': len(self.added_positions),
+            'Removed Students': len(self.removed_positions),
+            'Students Changed': int(self.changed.sum()),
+            'Marks Changed': int(sum(mask.sum() for mask in self.mark_changed.values())),
+            'Grade Changes': int(self.derived_changed.get('Grade', none).sum()),
+            'Status Changes': int(self.derived_changed.get('Status', none).sum()),
+            'FAIL to PASS': int(((status_before == 'FAIL') & (status_after == 'PASS')).sum())
+            if status_before is not None else 0,
+            'PASS to FAIL': int(((status_before == 'PASS') & (status_after == 'FAIL')).sum())
+            if status_before is not None else 0,
+        }
+
+    def _identity(self, model, positions: np.ndarray) -> pd.DataFrame:
+        """Identity columns of some rows of a result"""
+        columns = [col for col in ('Student_Name', 'Roll_No', 'Section') if col in model.identity.columns]
+        return model.identity[columns].iloc[positions].reset_index(drop=True)
+
+    def students(self) -> pd.DataFrame:
+        """
+        One row per matched student whose marks or results changed
+
+        Returns:
+            DataFrame with identity columns, the changed subjects, and
+            Average, GPA, Grade and Status before and after
+        """
+        rows = np.flatnonzero(self.changed)
+        frame = self._identity(self.after.processor.get_results_model(), self.after_positions[rows])
+
+        counts = np.zeros(len(rows), dtype=np.int64)
+        names = np.full(len(rows), '', dtype=object)
+        for subject in self.subjects:
+            mask = self.mark_changed[subject][rows]
+            counts += mask
+            names[mask] = names[mask] + np.where(names[mask] == '', '', ', ') + subject
+        frame['Subjects Changed'] = names
+        frame['Marks Changed'] = counts
+
+        for name in ('Average', 'GPA', 'Grade', 'Status'):
+            if name not in self.derived_changed:
+                continue
+            frame[f'{name} Before'] = self.derived_before[name][rows]
+            frame[f'{name} After'] = self.derived_after[name][rows]
+            if name in ('Average', 'GPA'):
+                frame[f'{name} Change'] = frame[f'{name} After'] - frame[f'{name} Before']
+        return frame
+
+    def mark_changes(self) -> pd.DataFrame:
+        """
+        Every changed mark, one row per student and subject
+
+        Returns:
+            DataFrame with Roll_No, Student_Name, Subject, Before, After and
+            Change, in the revised file's row order
+        """
+        rows, subjects, before, after = [], [], [], []
+        for index, subject in enumerate(self.subjects):
+            changed = np.flatnonzero(self.mark_changed[subject])
+            rows.append(changed)
+            subjects.append(np.full(len(changed), index))
+            before.append(self.marks_before[subject][changed].astype(np.float64))
+            after.append(self.marks_after[subject][changed].astype(np.float64))
+        if not rows:
+            return pd.DataFrame(columns=['Roll_No', 'Student_Name', 'Subject', 'Before', 'After', 'Change'])
+
+        rows, subjects = np.concatenate(rows), np.concatenate(subjects)
+        order = np.lexsort((subjects, rows))
+        identity = self.after.processor.get_results_model().identity
+        positions = self.after_positions[rows[order]]
+        frame = pd.DataFrame({
+            'Roll_No': identity['Roll_No'].to_numpy()[positions],
+            'Student_Name': identity['Student_Name'].to_numpy()[positions],
+            'Subject': np.asarray(self.subjects, dtype=object)[subjects[order]],
+            'Before': np.concatenate(before)[order],
+            'After': np.concatenate(after)[order],
+        })
+        frame['Change'] = frame['After'] - frame['Before']
+        return frame
+
+    def added(self) -> pd.DataFrame:
+        """Students only in the revised results"""
+        return self._identity(self.after.processor.get_results_model(), self.added_positions)
+
+    def removed(self) -> pd.DataFrame:
+        """Students only in the original results"""
+        return self._identity(self.before.processor.get_results_model(), self.removed_positions)
+
+    def grade_transitions(self) -> pd.DataFrame:
+        """
+        Count grade changes
+
+        Returns:
+            DataFrame with one row per (Grade Before, Grade After) pair that
+            occurred, most frequent first
+        """
+        if 'Grade' not in self.derived_changed:
+            return pd.DataFrame(columns=['Grade Before', 'Grade After', 'Students'])
+        changed = self.derived_changed['Grade']
+        pairs = pd.DataFrame({'Grade Before': self.derived_before['Grade'][changed],
+                              'Grade After': self.derived_after['Grade'][changed]})
+        counts = pairs.value_counts().rename('Students').reset_index()
+        return counts.sort_values(['Students', 'Grade Before', 'Grade After'],
+                                  ascending=[False, True, True], kind='stable').reset_index(drop=True)
+
+    def statistics_delta(self) -> pd.DataFrame:
+        """
+        Shift in the class statistics
+
+        Returns:
+            DataFrame with Metric, Before, After and Change for every
+            statistic of either result
+        """
+        before, after = self.before.statistics, self.after.statistics
+        metrics = list(dict.fromkeys(list(before) + list(after)))
+        frame = pd.DataFrame({
+            'Metric': metrics,
+            'Before': [float(before[m]) if m in before else np.nan for m in metrics],
+            'After': [float(after[m]) if m in after else np.nan for m in metrics],
+        })
+        frame['Change'] = frame['After'] - frame['Before']
+        return frame
+
+    def subject_delta(self) -> pd.DataFrame:
+        """
+        Shift in every per-subject metric
+
+        Returns:
+            DataFrame with Subject, Metric, Before, After and Change
+            (subjects in only one result have a missing side)
+        """
+        def long(stats):
+            return stats.melt(id_vars='Subject', var_name='Metric', value_name='Value')
+
+        frame = long(self.before.subject_statistics).merge(
+            long(self.after.subject_statistics), on=['Subject', 'Metric'], how='outer',
+            suffixes=(' Before', ' After'), sort=False
+        ).rename(columns={'Value Before': 'Before', 'Value After': 'After'})
+        frame['Before'] = frame['Before'].astype(np.float64)
+        frame['After'] = frame['After'].astype(np.float64)
+        frame['Change'] = frame['After'] - frame['Before']
+
+        subjects = list(dict.fromkeys(list(self.after.subject_statistics['Subject']) +
+                                      list(self.before.subject_statistics['Subject'])))
+        metrics = [col for col in self.after.subject_statistics.columns if col != 'Subject']
+        frame['_subject'] = frame['Subject'].map({s: i for i, s in enumerate(subjects)})
+        frame['_metric'] = frame['Metric'].map({m: i for i, m in enumerate(metrics)}).fillna(len(metrics))
+        return frame.sort_values(['_subject', '_metric'], kind='stable').drop(
+            columns=['_subject', '_metric']).reset_index(drop=True)
+
+    def write_excel(self, target: Union[str, BinaryIO]) -> None:
+        """
+        Write the change report as a multi-sheet workbook
+
+        Args:
+            target: File path or writable binary buffer
+        """
+        from openpyxl import Workbook
+        from src.excel_exporter import ExcelExporter
+
+        exporter = ExcelExporter()
+        wb = Workbook(write_only=True)
+        summary = self.summary()
+        exporter.write_sheet(wb, 'Summary', pd.DataFrame({'Metric': list(summary), 'Value': list(summary.values())}))
+        exporter.write_sheet(wb, 'Statistics', self.statistics_delta())
+        exporter.write_sheet(wb, 'Subject Statistics', self.subject_delta())
+        exporter.write_sheet(wb, 'Grade Changes', self.grade_transitions())
+        exporter.write_sheet(wb, 'Changed Students', self.students())
+        exporter.write_sheet(wb, 'Mark Changes', self.mark_changes())
+        exporter.write_sheet(wb, 'Added Students', self.added())
+        exporter.write_sheet(wb, 'Removed Students', self.removed())
+        wb.save(target)
+
+    def export(self, output_dir: str, formats: Sequence[str] = EXPORT_FORMATS, name: str = None) -> List[str]:
+        """
+        Write the change report in every requested format
+
+        Args:
+            output_dir: Directory for the files
+            formats: Any of 'xlsx' and 'pdf'
+            name: File name prefix (a timestamped name is used otherwise)
+
+        Returns:
+            List of written file paths
+        """
+        from src.report_generator import PDFReportGenerator
+
+        unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown format(s): {', '.join(unknown)} (use {', '.join(EXPORT_FORMATS)})")
+        os.makedirs(output_dir, exist_ok=True)
+        name = name or f"result_changes_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        paths = []
+
+        def write(file_name, writer):
+            # Sessions comparing the same uploads share the path; readers only ever see a complete file
+            path = os.path.join(output_dir, file_name)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                writer(temp_path)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            paths.append(path)
+
+        if 'xlsx' in formats:
+            write(f"{name}.xlsx", self.write_excel)
+        if 'pdf' in formats:
+            pdf_gen = PDFReportGenerator(output_dir=output_dir, policy=self.after.processor.policy)
+            write(f"{name}.pdf", lambda target: pdf_gen.generate_change_report(self, target=target))
+        return paths
+
+
+def main(argv=None) -> int:
+    """Compare two workbooks and write the change report"""
+    parser = argparse.ArgumentParser(prog="python -m src.result_diff",
+                                     description="Report the changes between two exam results workbooks")
+    parser.add_argument('before', help="original workbook")
+    parser.add_argument('after', help="revised workbook (e.g. after revaluation)")
+    parser.add_argument('--format', nargs='+', choices=EXPORT_FORMATS, default=list(EXPORT_FORMATS),
+                        dest='formats')
+    parser.add_argument('--output-dir', default="outputs/diffs", help="directory for the report files")
+    parser.add_argument('--name', help="file name prefix")
+    args = parser.parse_args(argv)
+
+    from src.cli import EXIT_INVALID, EXIT_OK, to_jsonable
+    from src.pipeline import content_hash, run_pipeline
+
+    results = []
+    for path in (args.before, args.after):
+        with open(path, 'rb') as f:
+            data = f.read()
+        result = run_pipeline(data, key=content_hash(data))
+        if not result.ok:
+            print(json.dumps({'status': 'error', 'file': path, 'message': result.message,
+                              'errors': result.errors}))
+            return EXIT_INVALID
+        results.append(result)
+
+    diff = ResultDiff(*results)
+    paths = diff.export(args.output_dir, args.formats, name=args.name)
+    print(json.dumps({'status': 'ok', 'summary': to_jsonable(diff.summary()), 'files': paths}))
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+"""
+Result Query Module
+Compiles filter expressions such as "Math < 40 and Average > 60" once and
+evaluates them as vectorized column operations over the results model
+"""
+
+import operator
+import re
+import threading
+import numpy as np
+from functools import lru_cache
+from typing import Callable, FrozenSet, List, Optional, Tuple
+
+from src.grading_policy import GradingPolicy, get_grading_policy
+from src.results_model import ResultsModel
+
+# Columns computed from the marks matrix on first use
+VIRTUAL_COLUMNS = {
+    'failed_subjects': "Number of subjects below their pass marks",
+    'passed_subjects': "Number of subjects at or above their pass marks",
+}
+
+# Number of expressions whose compiled form is kept
+MAX_COMPILED_QUERIES = 256
+
+# Number of expressions whose masks are kept per dataset
+MAX_CACHED_MASKS = 32
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<number>\d+(?:\.\d*)?|\.\d+)
+      | (?P<string>"[^"]*"|'[^']*')
+      | (?P<quoted>`[^`]+`)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op><=|>=|==|!=|<>|<|>|=|\+|-|\*|/|\(|\)|\[|\]|,|&|\|)
+    )""", re.VERBOSE)
+
+_KEYWORDS = {'and', 'or', 'not', 'in'}
+
+_COMPARISONS = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    '=': operator.eq, '==': operator.eq, '!=': operator.ne, '<>': operator.ne,
+}
+
+_ARITHMETIC = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+
+# A compiled node: function of the column resolver, and whether it yields booleans
+Node = Tuple[Callable[[Callable[[str], np.ndarray]], np.ndarray], bool]
+
+
+class QueryError(ValueError):
+    """Raised for expressions that cannot be parsed or evaluated"""
+
+
+def _tokenize(text: str) -> List[Tuple[str, object]]:
+    """
+    Split an expression into (kind, value) tokens
+
+    Args:
+        text: Query expression
+
+    Returns:
+        List of tokens ending with ('end', None)
+    """
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise QueryError(f"Unexpected character {text[position:].lstrip()[:1]!r} at position {position + 1}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            tokens.append(('literal', float(value)))
+        elif kind == 'string':
+            tokens.append(('literal', value[1:-1]))
+        elif kind == 'quoted':
+            tokens.append(('name', value[1:-1]))
+        elif kind == 'name' and value.lower() in _KEYWORDS:
+            tokens.append(('op', value.lower()))
+        else:
+            tokens.append((kind, value))
+    tokens.append(('end', None))
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser building closures over column arrays"""
+
+    def __init__(self, text: str):
+        """Tokenize the expression"""
+        self.tokens = _tokenize(text)
+        self.position = 0
+        self.columns = set()
+
+    def peek(self, *ops: str) -> bool:
+        """Whether the next token is one of the given operators"""
+        kind, value = self.tokens[self.position]
+        return kind == 'op' and value in ops
+
+    def take(self) -> Tuple[str, object]:
+        """Consume the next token"""
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expect(self, op: str) -> None:
+        """Consume the given operator or fail"""
+        kind, value = self.take()
+        if kind != 'op' or value != op:
+            raise QueryError(f"Expected {op!r} but found {self._describe(kind, value)}")
+
+    @staticmethod
+    def _describe(kind: str, value) -> str:
+        """Describe a token for error messages"""
+        return "end of expression" if kind == 'end' else repr(value)
+
+    def parse(self) -> Node:
+        """Parse the whole expression, which must be a condition"""
+        node = self.disjunction()
+        kind, value = self.tokens[self.position]
+        if kind != 'end':
+            raise QueryError(f"Unexpected {self._describe(kind, value)}")
+        if not node[1]:
+            raise QueryError("Expression must be a condition, e.g. Math < 40")
+        return node
+
+    def disjunction(self) -> Node:
+        """condition (or condition)*"""
+        node = self.conjunction()
+        while self.peek('or', '|'):
+            self.take()
+            node = self._combine(node, self.conjunction(), operator.or_)
+        return node
+
+    def conjunction(self) -> Node:
+        """negation (and negation)*"""
+        node = self.negation()
+        while self.peek('and', '&'):
+            self.take()
+            node = self._combine(node, self.negation(), operator.and_)
+        return node
+
+    def negation(self) -> Node:
+        """[not] comparison"""
+        if self.peek('not'):
+            self.take()
+            evaluate, is_condition = self.negation()
+            if not is_condition:
+                raise QueryError("'not' must be followed by a condition")
+            return (lambda column: ~evaluate(column)), True
+        return self.comparison()
+
+    def comparison(self) -> Node:
+        """sum [op sum | [not] in (values)]"""
+        left = self.sum()
+        if self.peek(*_COMPARISONS):
+            compare = _COMPARISONS[self.take()[1]]
+            right = self.sum()
+            return self._binary(left, right, compare), True
+        if self.peek('not') and self.tokens[self.position + 1] == ('op', 'in'):
+            self.position += 2
+            values = self.value_list()
+            evaluate = left[0]
+            return (lambda column: ~np.isin(evaluate(column), values)), True
+        if self.peek('in'):
+            self.take()
+            values = self.value_list()
+            evaluate = left[0]
+            return (lambda column: np.isin(evaluate(column), values)), True
+        return left
+
+    def value_list(self) -> List:
+        """(value, ...) or [value, ...]"""
+        closing = ')' if self.peek('(') else ']'
+        self.expect('(' if closing == ')' else '[')
+        values = []
+        while True:
+            kind, value = self.take()
+            if kind != 'literal':
+                raise QueryError(f"Expected a value in list but found {self._describe(kind, value)}")
+            values.append(value)
+            if not self.peek(','):
+                break
+            self.take()
+        self.expect(closing)
+        return values
+
+    def sum(self) -> Node:
+        """product ((+|-) product)*"""
+        node = self.product()
+        while self.peek('+', '-'):
+            combine = _ARITHMETIC[self.take()[1]]
+            node = self._binary(node, self.product(), combine), False
+        return node
+
+    def product(self) -> Node:
+        """unary ((*|/) unary)*"""
+        node = self.unary()
+        while self.peek('*', '/'):
+            combine = _ARITHMETIC[self.take()[1]]
+            node = self._binary(node, self.unary(), combine), False
+        return node
+
+    def unary(self) -> Node:
+        """[-] atom"""
+        if self.peek('-'):
+            self.take()
+            evaluate = self.unary()[0]
+            return (lambda column: -evaluate(column)), False
+        return self.atom()
+
+    def atom(self) -> Node:
+        """value, column or (expression)"""
+        kind, value = self.take()
+        if kind == 'literal':
+            return (lambda column: value), False
+        if kind == 'name':
+            self.columns.add(value)
+            return (lambda column: column(value)), False
+        if kind == 'op' and value == '(':
+            node = self.disjunction()
+            self.expect(')')
+            return node
+        raise QueryError(f"Unexpected {self._describe(kind, value)}")
+
+    @staticmethod
+    def _binary(left: Node, right: Node, combine) -> Callable:
+        """Apply a binary operator to two compiled nodes"""
+        evaluate_left, evaluate_right = left[0], right[0]
+        return lambda column: combine(evaluate_left(column), evaluate_right(column))
+
+    def _combine(self, left: Node, right: Node, combine) -> Node:
+        """Join two conditions with and / or"""
+        if not (left[1] and right[1]):
+            raise QueryError("'and' / 'or' must join conditions, e.g. Math < 40 and Average > 60")
+        return self._binary(left, right, combine), True
+
+
+class CompiledQuery:
+    """Parsed expression, independent of any dataset"""
+
+    def __init__(self, text: str, evaluate: Callable, columns: FrozenSet[str]):
+        """
+        Initialize compiled query
+
+        Args:
+            text: Normalized expression text
+            evaluate: Function of a column resolver returning a boolean array
+            columns: Column names the expression refers to
+        """
+        self.text = text
+        self.columns = columns
+        self._evaluate = evaluate
+
+    def evaluate(self, column: Callable[[str], np.ndarray], length: int) -> np.ndarray:
+        """
+        Evaluate the expression
+
+        Args:
+            column: Function returning the array of a column name
+            length: Number of rows
+
+        Returns:
+            Boolean mask with one value per row
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            try:
+                result = np.asarray(self._evaluate(column), dtype=bool)
+            except QueryError:
+                raise
+            except (TypeError, ValueError) as e:
+                raise QueryError(f"Cannot compare these values: {e}") from e
+        return np.broadcast_to(result, (length,))
+
+
+@lru_cache(maxsize=MAX_COMPILED_QUERIES)
+def compile_query(text: str) -> CompiledQuery:
+    """
+    Parse an expression once; repeated expressions reuse the compiled form
+
+    Supports column comparisons (<, <=, >, >=, ==, !=), arithmetic
+    (+, -, *, /), `in` lists, and/or/not and parentheses. Text values are
+    quoted ('FAIL'); column names with spaces use backticks.
+
+    Args:
+        text: Query expression, e.g. "Math < 40 and Average > 60"
+
+    Returns:
+        CompiledQuery
+
+    Raises:
+        QueryError: When the expression cannot be parsed
+    """
+    parser = _Parser(text)
+    evaluate, _ = parser.parse()
+    return CompiledQuery(text, evaluate, frozenset(parser.columns))
+
+
+class ResultsQuery:
+    """Evaluate compiled expressions against one processed dataset"""
+
+    def __init__(self, model: ResultsModel, policy: GradingPolicy = None):
+        """
+        Initialize query engine
+
+        Args:
+            model: Results model of the processed data
+            policy: Grading policy the data was graded with (defaults to
+                the configured policy)
+        """
+        self.model = model
+        self.policy = policy or get_grading_policy()
+        self._arrays = {}
+        self._masks = {}
+        self._masks_lock = threading.Lock()
+
+        names = list(model.identity.columns) + list(model.subjects) + list(model.derived) + list(VIRTUAL_COLUMNS)
+        self._names = {}
+        for name in names:
+            self._names.setdefault(name, name)
+            self._names.setdefault(name.lower(), name)
+
+    @property
+    def columns(self) -> List[str]:
+        """Column names usable in expressions"""
+        return list(dict.fromkeys(self._names.values()))
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Get (and cache) the array behind a column name
+
+        Args:
+            name: Column name (case-insensitive)
+
+        Returns:
+            Array with one value per student
+
+        Raises:
+            QueryError: When no such column exists
+        """
+        resolved = self._names.get(name) or self._names.get(name.lower())
+        if resolved is None:
+            raise QueryError(f"Unknown column {name!r} (quote text values, e.g. Status == 'FAIL')")
+
+        values = self._arrays.get(resolved)
+        if values is None:
+            model = self.model
+            if resolved in model.subject_index:
+                values = model.column(resolved)
+            elif resolved in model.derived:
+                values = model.derived[resolved]
+            elif resolved in VIRTUAL_COLUMNS:
+                failed = (model.marks < self.policy.pass_marks_for(model.subjects)).sum(axis=1)
+                values = failed if resolved == 'failed_subjects' else len(model.subjects) - failed
+            else:
+                values = model.identity[resolved].to_numpy()
+            self._arrays[resolved] = values
+        return values
+
+    def mask(self, expression: str) -> Optional[np.ndarray]:
+        """
+        Get the rows matching an expression
+
+        Args:
+            expression: Query expression (empty keeps all rows)
+
+        Returns:
+            Read-only boolean mask, or None for an empty expression
+
+        Raises:
+            QueryError: When the expression is invalid for this dataset
+        """
+        text = ' '.join((expression or '').split())
+        if not text:
+            return None
+        with self._masks_lock:
+            mask = self._masks.get(text)
+        if mask is None:
+            mask = compile_query(text).evaluate(self.column, len(self.model))
+            mask = np.array(mask, dtype=bool)
+            mask.flags.writeable = False
+
+            # Query engines are shared by every session viewing the dataset
+            with self._masks_lock:
+                if text not in self._masks and len(self._masks) >= MAX_CACHED_MASKS:
+                    self._masks.pop(next(iter(self._masks)))
+                self._masks[text] = mask
+        return mask
+
+    def positions(self, expression: str) -> np.ndarray:
+        """
+        Get the row positions matching an expression
+
+        Args:
+            expression: Query expression (empty keeps all rows)
+
+        Returns:
+            Array of row positions in file order
+        """
+        mask = self.mask(expression)
+        return np.arange(len(self.model)) if mask is None else np.flatnonzero(mask)
@@ -0,0 +1,254 @@
+"""
+Results Model Module
+Numeric core shared by the processor, analyzer and report generators:
+every student's marks held in one contiguous matrix with its subject
+metadata and the derived result columns
+"""
+
+import warnings
+import numpy as np
+import pandas as pd
+from functools import cached_property
+from typing import Dict, Iterator, List, Optional, Sequence
+
+
+def select_columns(df: pd.DataFrame, columns: Sequence[str]) -> pd.DataFrame:
+    """
+    Select columns of a frame without copying them
+
+    df[columns] copies the selected columns on pandas versions without
+    copy-on-write; this frame wraps the same arrays instead.
+
+    Args:
+        df: Source DataFrame
+        columns: Column names, in the order wanted
+
+    Returns:
+        DataFrame whose columns share memory with df's
+    """
+    return pd.DataFrame({col: df[col].array for col in columns}, index=df.index, copy=False)
+
+
+def _adjacent_columns(columns: List[np.ndarray]) -> Optional[np.ndarray]:
+    """
+    View same-typed columns that lie back to back in one buffer as a matrix
+
+    A frame block stores each column contiguously, one after another, so
+    adjacent columns of one block can be read as a Fortran-ordered matrix
+    without copying them.
+
+    Args:
+        columns: 1-D column arrays
+
+    Returns:
+        Read-only (rows x columns) view, or None when the columns are not
+        laid out that way
+    """
+    first = columns[0]
+    n, itemsize = len(first), first.dtype.itemsize
+    if n == 0 or first.dtype.kind not in 'iuf':
+        return None
+    start = first.__array_interface__['data'][0]
+    for j, col in enumerate(columns):
+        if (col.dtype != first.dtype or len(col) != n or not col.flags.c_contiguous
+                or col.__array_interface__['data'][0] != start + j * n * itemsize):
+            return None
+
+    # Only read across columns inside the allocation the first column lives in
+    owner = first
+    while isinstance(owner.base, np.ndarray):
+        owner = owner.base
+    if not (owner.flags.c_contiguous or owner.flags.f_contiguous):
+        return None
+    low = owner.__array_interface__['data'][0]
+    if start < low or start + len(columns) * n * itemsize > low + owner.nbytes:
+        return None
+    return np.lib.stride_tricks.as_strided(first, shape=(n, len(columns)), strides=(itemsize, n * itemsize),
+                                           writeable=False)
+
+
+def marks_matrix(df: pd.DataFrame, subjects: Sequence[str]) -> np.ndarray:
+    """
+    Get the marks of the given subjects as one read-only matrix
+
+    The matrix is Fortran-ordered (students x subjects), so each subject's
+    marks are contiguous and the frame's own block is reused when the
+    subject columns are adjacent in it; otherwise the columns are copied
+    once.
+
+    Args:
+        df: DataFrame holding the subject columns
+        subjects: Subject column names
+
+    Returns:
+        2-D array of shape (students, subjects)
+    """
+    columns = [df[subject].to_numpy() for subject in subjects]
+    marks = _adjacent_columns(columns) if columns else None
+    if marks is None:
+        marks = np.empty((len(df), len(columns)), dtype=np.result_type(*columns) if columns else np.float64,
+                         order='F')
+        for j, values in enumerate(columns):
+            marks[:, j] = values
+    marks.flags.writeable = False
+    return marks
+
+
+class ResultsModel:
+    """Marks matrix, subject metadata and derived results for one cohort"""
+
+    def __init__(self, identity: pd.DataFrame, subjects: Sequence[str], marks: np.ndarray,
+                 derived: Optional[Dict[str, np.ndarray]] = None):
+        """
+        Initialize results model
+
+        Args:
+            identity: Non-subject columns (Student_Name, Roll_No, Section, ...)
+            subjects: Subject names, in matrix column order
+            marks: Read-only (students x subjects) marks matrix
+            derived: Derived per-student columns (Average, GPA, Grade, Status)
+        """
+        self.identity = identity
+        self.subjects = list(subjects)
+        self.subject_index = {subject: j for j, subject in enumerate(self.subjects)}
+        self.marks = marks
+        self.derived = {}
+        self.set_derived(derived or {})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, subjects: Sequence[str],
+                   derived_columns: Sequence[str] = ()) -> 'ResultsModel':
+        """
+        Build a model over a processed frame
+
+        No marks are copied when the frame was produced by to_frame().
+
+        Args:
+            df: Processed DataFrame
+            subjects: Subject columns
+            derived_columns: Derived result columns present in the frame
+
+        Returns:
+            ResultsModel
+        """
+        derived_columns = [col for col in derived_columns if col in df.columns]
+        identity = select_columns(df, [col for col in df.columns if col not in subjects and col not in derived_columns])
+        derived = {col: df[col].to_numpy() for col in derived_columns}
+        return cls(identity, subjects, marks_matrix(df, subjects), derived)
+
+    def set_derived(self, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Attach derived per-student columns (stored read-only)
+
+        Args:
+            columns: Column name to array with one value per student
+        """
+        for name, values in columns.items():
+            values.flags.writeable = False
+            self.derived[name] = values
+
+    def __len__(self) -> int:
+        """Number of students"""
+        return self.marks.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the marks matrix and derived numeric columns"""
+        return self.marks.nbytes + sum(values.nbytes for values in self.derived.values())
+
+    @cached_property
+    def has_missing(self) -> bool:
+        """Whether any mark is missing (NaN)"""
+        return self.marks.dtype.kind == 'f' and bool(np.isnan(self.marks).any())
+
+    def reduce(self, func: str, axis: int) -> np.ndarray:
+        """
+        Apply a numpy reduction to the marks matrix, skipping missing marks
+
+        Args:
+            func: Reduction name ('mean', 'median', 'max', 'min' or 'std')
+            axis: 0 for one value per subject, 1 for one value per student
+
+        Returns:
+            Reduced array (NaN where every mark is missing)
+        """
+        kwargs = {'ddof': 1} if func == 'std' else {}
+        name = 'nan' + func if self.has_missing else func
+        with warnings.catch_warnings():
+            # All-missing slices and single-student std give NaN, as in pandas
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return getattr(np, name)(self.marks, axis=axis, **kwargs)
+
+    def column(self, subject: str) -> np.ndarray:
+        """
+        Get one subject's marks
+
+        Args:
+            subject: Subject name
+
+        Returns:
+            Read-only view into the marks matrix
+        """
+        return self.marks[:, self.subject_index[subject]]
+
+    def to_frame(self, column_order: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Build the processed DataFrame
+
+        Identity columns wrap the identity frame's arrays, subject columns
+        are views of the marks matrix and the derived columns wrap the
+        model's arrays, so nothing is copied.
+
+        Args:
+            column_order: Column order of the result (defaults to identity,
+                subjects, then derived columns)
+
+        Returns:
+            Processed DataFrame
+        """
+        columns = {col: self.identity[col].array for col in self.identity.columns}
+        columns.update((subject, self.marks[:, j]) for j, subject in enumerate(self.subjects))
+        columns.update(self.derived)
+        order = list(column_order) if column_order is not None else list(columns)
+        return pd.DataFrame({col: columns[col] for col in order}, index=pd.RangeIndex(len(self)), copy=False)
+
+    def subject_means(self) -> np.ndarray:
+        """Mean mark of every subject"""
+        return self.reduce('mean', axis=0)
+
+    def subject_statistics(self, pass_marks) -> Dict[str, np.ndarray]:
+        """
+        Summary statistics of every subject, computed on the matrix
+
+        Args:
+            pass_marks: Marks needed to pass, one value or one per subject
+
+        Returns:
+            Dictionary of statistic name to per-subject array
+        """
+        return {
+            'Average': self.reduce('mean', axis=0),
+            'Median': self.reduce('median', axis=0),
+            'Highest': self.reduce('max', axis=0),
+            'Lowest': self.reduce('min', axis=0),
+            'Std Dev': self.reduce('std', axis=0),
+            'Pass Count': (self.marks >= pass_marks).sum(axis=0)
+        }
+
+    def records(self, positions: Optional[Sequence[int]] = None) -> Iterator[Dict]:
+        """
+        Iterate over students as plain dictionaries (e.g. for report cards)
+
+        Args:
+            positions: Row positions to yield (defaults to every student)
+
+        Yields:
+            Dictionary of identity fields, subject marks and derived results
+        """
+        identity = {col: self.identity[col].to_numpy() for col in self.identity.columns}
+        columns = list(identity.items()) + list(self.derived.items())
+        rows = range(len(self)) if positions is None else positions
+        for i in rows:
+            record = {col: values[i] for col, values in columns}
+            record.update(zip(self.subjects, self.marks[i].tolist()))
+            yield record
@@ -0,0 +1,108 @@
+"""
+Roll Number Index Module
+Hash index over Roll_No for duplicate detection and constant-time lookup
+of a student's row
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+
+def normalize_rolls(values) -> np.ndarray:
+    """
+    Normalize roll numbers so the same roll matches across files
+
+    Integral numbers lose their decimal part (101.0 -> '101') and text is
+    stripped, so 101, 101.0 and ' 101 ' are the same roll.
+
+    Args:
+        values: Roll numbers (Series or array)
+
+    Returns:
+        Object array of roll strings (None for missing rolls)
+    """
+    series = pd.Series(values)
+    missing = series.isna().to_numpy()
+    if pd.api.types.is_float_dtype(series.dtype):
+        numbers = series.to_numpy(dtype=np.float64)
+        integral = ~missing & (np.mod(numbers, 1) == 0)
+        rolls = series.astype(str).to_numpy(dtype=object)
+        rolls[integral] = numbers[integral].astype(np.int64).astype(str)
+    else:
+        rolls = series.astype(str).str.strip().to_numpy(dtype=object)
+    rolls[missing] = None
+    return rolls
+
+
+def normalize_roll(value) -> Optional[str]:
+    """
+    Normalize one roll number the same way as normalize_rolls()
+
+    Args:
+        value: Roll number as typed or stored
+
+    Returns:
+        Roll string, or None when empty
+    """
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    text = str(value).strip()
+    return text or None
+
+
+class RollIndex:
+    """Hash index from roll number to row positions"""
+
+    def __init__(self, rolls):
+        """
+        Build the index
+
+        Args:
+            rolls: Roll_No column in row order
+        """
+        self.keys = pd.Index(normalize_rolls(rolls))
+        self.is_unique = self.keys.is_unique
+
+    def __len__(self) -> int:
+        """Number of indexed rows"""
+        return len(self.keys)
+
+    def duplicates(self) -> Dict[str, np.ndarray]:
+        """
+        Find roll numbers used by more than one row
+
+        Returns:
+            Dictionary of roll to row positions, in order of first appearance
+        """
+        if self.is_unique:
+            return {}
+        repeated = self.keys.duplicated(keep=False) & self.keys.notna()
+        positions = np.flatnonzero(repeated)
+        groups = pd.Series(positions).groupby(self.keys[positions].to_numpy(), sort=False)
+        return {roll: group.to_numpy() for roll, group in groups}
+
+    def lookup(self, roll) -> np.ndarray:
+        """
+        Find the rows of a roll number
+
+        Args:
+            roll: Roll number (normalized like the index)
+
+        Returns:
+            Row positions (empty when the roll is unknown)
+        """
+        key = normalize_roll(roll)
+        if key is None:
+            return np.empty(0, dtype=np.int64)
+        try:
+            loc = self.keys.get_loc(key)
+        except KeyError:
+            return np.empty(0, dtype=np.int64)
+        if isinstance(loc, (int, np.integer)):
+            return np.array([loc], dtype=np.int64)
+        if isinstance(loc, slice):
+            return np.arange(len(self.keys), dtype=np.int64)[loc]
+        return np.flatnonzero(loc)
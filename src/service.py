@@ -0,0 +1,417 @@
+"""
+Processing Service Module
+Local HTTP API over the Python grading engine for the Next.js frontend
+
+Endpoints:
+    GET  /health                      service status
+    POST /upload                      body = raw .xlsx bytes; loads, validates and grades
+    GET  /datasets/<id>/grades        processed rows (?offset=0&limit=100&where=Math<40)
+    GET  /datasets/<id>/stats         statistics, subject statistics and toppers
+    GET  /datasets/<id>/report        PDF report, streamed in chunks
+
+Usage:
+    python -m src.service --port 8800 --workers 4
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from socketserver import ThreadingMixIn
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIServer, make_server
+from wsgiref.util import setup_testing_defaults
+
+from src.cli import to_jsonable
+from src.pipeline import PipelineResult, run_pipeline, content_hash, grading_config_key
+from src.dataset_store import DatasetStore, get_store
+from src.performance import setting
+from src.result_query import QueryError
+
+# Largest upload accepted, in bytes
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+
+# Size of the chunks a report is streamed in
+STREAM_CHUNK_BYTES = 64 * 1024
+
+HTTP_STATUS = {
+    200: '200 OK',
+    201: '201 Created',
+    204: '204 No Content',
+    400: '400 Bad Request',
+    404: '404 Not Found',
+    405: '405 Method Not Allowed',
+    411: '411 Length Required',
+    413: '413 Payload Too Large',
+    503: '503 Service Unavailable',
+}
+
+DATASET_ROUTE = re.compile(r'^/datasets/(?P<dataset_id>[0-9a-f]{64}:[0-9a-f]{16})/(?P<action>grades|stats|report)$')
+
+
+class ServiceBusy(Exception):
+    """Raised when the worker pool and its queue are full"""
+
+
+class ProcessingService:
+    """WSGI application that runs the pipeline on a bounded worker pool"""
+
+    def __init__(self, workers: int = 4, max_pending: int = 16, store: Optional[DatasetStore] = None,
+                 output_dir: str = "outputs/service", allow_origin: str = "*"):
+        """
+        Initialize processing service
+
+        Args:
+            workers: Number of worker threads running pipeline jobs
+            max_pending: Jobs allowed to wait for a worker before requests get 503
+            store: Dataset store (defaults to the process-wide store)
+            output_dir: Directory for reports and charts
+            allow_origin: Value of the Access-Control-Allow-Origin header
+        """
+        self.workers = workers
+        self.store = store if store is not None else get_store()
+        self.output_dir = output_dir
+        self.allow_origin = allow_origin
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def close(self) -> None:
+        """Shut down the worker pool"""
+        self._executor.shutdown(wait=True)
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        """Handle one WSGI request"""
+        method = environ['REQUEST_METHOD']
+        path = environ.get('PATH_INFO', '/')
+
+        try:
+            if method == 'OPTIONS':
+                return self._respond(start_response, 204, b'', 'text/plain')
+            if path == '/health':
+                return self._json(start_response, 200, self.health())
+            if path == '/upload':
+                if method != 'POST':
+                    return self._error(start_response, 405, "Use POST to upload a workbook")
+                return self._upload(environ, start_response)
+
+            match = DATASET_ROUTE.match(path)
+            if not match:
+                return self._error(start_response, 404, f"Unknown endpoint: {path}")
+            if method != 'GET':
+                return self._error(start_response, 405, "Use GET for dataset endpoints")
+
+            result = self._get_dataset(match.group('dataset_id'))
+            if result is None:
+                return self._error(start_response, 404, "Dataset not found; upload it again")
+            if not result.ok:
+                return self._error(start_response, 400, "Dataset did not pass validation")
+
+            action = match.group('action')
+            if action == 'grades':
+                return self._grades(environ, start_response, result)
+            if action == 'stats':
+                return self._json(start_response, 200, self._run(self._stats, result))
+            return self._report(start_response, result)
+        except ServiceBusy:
+            return self._error(start_response, 503, "All workers are busy, retry later")
+
+    def health(self) -> Dict:
+        """
+        Report service status
+
+        Returns:
+            Dictionary with worker and dataset store information
+        """
+        return {'status': 'ok', 'workers': self.workers, 'datasets': self.store.metrics()}
+
+    def _run(self, func: Callable, *args):
+        """
+        Run a job on the worker pool and wait for its result
+
+        Args:
+            func: Job to run
+
+        Returns:
+            The job's return value
+
+        Raises:
+            ServiceBusy: When every worker and queue slot is taken
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusy()
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def _upload(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        """Load, validate and grade an uploaded workbook (cached by content hash)"""
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length <= 0:
+            return self._error(start_response, 411, "Send the workbook bytes with a Content-Length")
+        if length > MAX_UPLOAD_BYTES:
+            return self._error(start_response, 413, f"Uploads are limited to {MAX_UPLOAD_BYTES} bytes")
+
+        data = environ['wsgi.input'].read(length)
+        key = f"{content_hash(data)}:{grading_config_key()}"
+
+        built = []
+
+        def load() -> PipelineResult:
+            built.append(True)
+            return self._run(run_pipeline, data, key)
+
+        # Requests hold no reference between calls, so the dataset stays
+        # evictable once it falls out of the store's memory budget
+        handle = self.store.acquire(key, load)
+        result = handle.value
+        handle.release()
+        cached = not built
+
+        body = {
+            'dataset_id': key,
+            'cached': cached,
+            'loaded': result.loaded,
+            'valid': result.is_valid,
+            'message': result.message,
+            'errors': result.errors,
+            'students': len(result.df) if result.loaded else 0
+        }
+        if not result.loaded:
+            return self._json(start_response, 400, body)
+        return self._json(start_response, 200 if cached else 201, body)
+
+    def _get_dataset(self, key: str) -> Optional[PipelineResult]:
+        """
+        Look up a processed dataset and mark it as recently used
+
+        Args:
+            key: Dataset id
+
+        Returns:
+            PipelineResult or None when it is not stored
+        """
+        return self.store.get(key)
+
+    def _grades(self, environ: dict, start_response: Callable, result: PipelineResult) -> Iterable[bytes]:
+        """Return one page of processed rows, optionally filtered by a query expression"""
+        query = parse_qs(environ.get('QUERY_STRING', ''))
+        try:
+            offset = max(0, int(query.get('offset', ['0'])[0]))
+            limit = min(10000, max(1, int(query.get('limit', ['100'])[0])))
+        except ValueError:
+            return self._error(start_response, 400, "offset and limit must be integers")
+
+        where = query.get('where', [''])[0]
+        if where:
+            try:
+                positions = result.query.positions(where)
+            except QueryError as e:
+                return self._error(start_response, 400, f"Invalid where expression: {e}")
+            total = len(positions)
+            rows = result.df.iloc[positions[offset:offset + limit]]
+        else:
+            total = len(result.df)
+            rows = result.df.iloc[offset:offset + limit]
+        body = ('{"total": %d, "offset": %d, "rows": %s}'
+                % (total, offset, rows.to_json(orient='records'))).encode('utf-8')
+        return self._respond(start_response, 200, body, 'application/json')
+
+    @staticmethod
+    def _stats(result: PipelineResult) -> Dict:
+        """Collect statistics for a dataset (runs on the worker pool)"""
+        return {
+            'statistics': to_jsonable(result.statistics),
+            'subject_statistics': json.loads(result.subject_statistics.to_json(orient='records')),
+            'toppers': json.loads(result.toppers(top_n=10).to_json(orient='records')),
+            'weak_subjects': to_jsonable(result.weak_subjects),
+            'strong_subjects': to_jsonable(result.strong_subjects)
+        }
+
+    def _report(self, start_response: Callable, result: PipelineResult) -> Iterable[bytes]:
+        """Build (once) and stream the PDF report"""
+        pdf_path = self._run(result.report, self.output_dir)
+        headers = [
+            ('Content-Type', 'application/pdf'),
+            ('Content-Length', str(os.path.getsize(pdf_path))),
+            ('Content-Disposition', f'attachment; filename="{os.path.basename(pdf_path)}"')
+        ]
+        start_response(HTTP_STATUS[200], headers + self._cors_headers())
+        return self._stream_file(pdf_path)
+
+    @staticmethod
+    def _stream_file(file_path: str) -> Iterable[bytes]:
+        """Yield a file in fixed-size chunks"""
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(STREAM_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+
+    def _cors_headers(self) -> List[Tuple[str, str]]:
+        """Headers letting the local frontend call the service"""
+        return [
+            ('Access-Control-Allow-Origin', self.allow_origin),
+            ('Access-Control-Allow-Methods', 'GET, POST, OPTIONS'),
+            ('Access-Control-Allow-Headers', 'Content-Type')
+        ]
+
+    def _respond(self, start_response: Callable, status: int, body: bytes,
+                 content_type: str) -> Iterable[bytes]:
+        """Send a complete response body"""
+        headers = [('Content-Type', content_type), ('Content-Length', str(len(body)))]
+        start_response(HTTP_STATUS[status], headers + self._cors_headers())
+        return [body]
+
+    def _json(self, start_response: Callable, status: int, payload: Dict) -> Iterable[bytes]:
+        """Send a JSON response"""
+        return self._respond(start_response, status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+    def _error(self, start_response: Callable, status: int, message: str) -> Iterable[bytes]:
+        """Send a JSON error response"""
+        return self._json(start_response, status, {'error': message})
+
+
+class ServiceResponse:
+    """Response captured by ServiceClient"""
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        """
+        Initialize response
+
+        Args:
+            status: HTTP status code
+            headers: Response headers
+            body: Response body
+        """
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """Decode the body as JSON"""
+        return json.loads(self.body)
+
+
+class ServiceClient:
+    """In-process client that calls the WSGI application directly, for tests"""
+
+    def __init__(self, app: ProcessingService):
+        """
+        Initialize client
+
+        Args:
+            app: WSGI application to call
+        """
+        self.app = app
+
+    def get(self, path: str, query: str = '') -> ServiceResponse:
+        """Send a GET request"""
+        return self.request('GET', path, query=query)
+
+    def post(self, path: str, body: bytes, content_type: str = 'application/octet-stream') -> ServiceResponse:
+        """Send a POST request"""
+        return self.request('POST', path, body=body, content_type=content_type)
+
+    def request(self, method: str, path: str, body: bytes = b'', query: str = '',
+                content_type: str = 'application/octet-stream') -> ServiceResponse:
+        """
+        Send a request and collect the complete response
+
+        Args:
+            method: HTTP method
+            path: Request path
+            body: Request body
+            query: Query string without the leading '?'
+            content_type: Request content type
+
+        Returns:
+            ServiceResponse
+        """
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': content_type,
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body)
+        }
+        setup_testing_defaults(environ)
+
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured['status'] = int(status.split()[0])
+            captured['headers'] = dict(headers)
+
+        chunks = self.app(environ, start_response)
+        try:
+            body = b''.join(chunks)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        return ServiceResponse(captured['status'], captured['headers'], body)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """WSGI server handling each connection on its own thread"""
+    daemon_threads = True
+
+
+def serve(host: str = "127.0.0.1", port: int = 8800, workers: int = 4,
+          max_pending: int = 16, memory_budget_mb: Optional[float] = None) -> None:
+    """
+    Run the service until interrupted
+
+    Args:
+        host: Interface to bind (localhost by default)
+        port: Port to listen on
+        workers: Worker pool size
+        max_pending: Queued jobs allowed before returning 503
+        memory_budget_mb: Memory budget of the dataset store (default: keep its budget)
+    """
+    store = get_store()
+    if memory_budget_mb is not None:
+        store.budget_bytes = int(memory_budget_mb * 1024 * 1024)
+    app = ProcessingService(workers=workers, max_pending=max_pending, store=store)
+    with make_server(host, port, app, server_class=ThreadingWSGIServer) as server:
+        print(f"Processing service listening on http://{host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            app.close()
+
+
+def main(argv=None) -> int:
+    """Parse arguments and start the service"""
+    parser = argparse.ArgumentParser(prog="python -m src.service",
+                                     description="Local HTTP processing service")
+    parser.add_argument('--host', default="127.0.0.1", help="interface to bind (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8800, help="port to listen on (default: 8800)")
+    parser.add_argument('--workers', type=int, default=setting('workers'),
+                        help="worker pool size (default: available CPUs, or the tuned setting)")
+    parser.add_argument('--max-pending', type=int, default=16, help="queued jobs before returning 503")
+    parser.add_argument('--memory-budget-mb', type=float,
+                        help="memory budget for processed datasets before unused ones are evicted")
+    args = parser.parse_args(argv)
+
+    serve(args.host, args.port, args.workers, args.max_pending, args.memory_budget_mb)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Synthetic Cohort Module
+Generates deterministic exam result data for benchmarks and load tests
+"""
+
+import numpy as np
+import pandas as pd
+from typing import BinaryIO, List, Union
+
+from src.data_processor import MIN_MARKS, MAX_MARKS
+
+DEFAULT_SUBJECTS = ['Math', 'English', 'Science', 'History', 'Computer']
+
+
+def subject_names(count: int) -> List[str]:
+    """
+    Build subject column names
+
+    Args:
+        count: Number of subjects
+
+    Returns:
+        List of subject names (the sample subjects first, then Subject_6, ...)
+    """
+    names = DEFAULT_SUBJECTS[:count]
+    names += [f"Subject_{i}" for i in range(len(names) + 1, count + 1)]
+    return names
+
+
+def generate_cohort(students: int = 1000, subjects: Union[int, List[str]] = 5,
+                    invalid_rate: float = 0.0, sections: int = 0,
+                    seed: int = 42) -> pd.DataFrame:
+    """
+    Generate a cohort of students with marks
+
+    The same arguments always produce the same frame. Marks combine a
+    per-student ability with per-subject noise, so subjects are correlated
+    the way real results are.
+
+    Args:
+        students: Number of students (rows)
+        subjects: Number of subjects or explicit subject names
+        invalid_rate: Fraction of rows given a missing or out-of-range mark
+        sections: Number of sections (0 leaves out the Section column)
+        seed: Random seed
+
+    Returns:
+        DataFrame in the upload format (Student_Name, Roll_No, [Section], subjects...)
+    """
+    rng = np.random.default_rng(seed)
+    subject_cols = subject_names(subjects) if isinstance(subjects, int) else list(subjects)
+
+    data = {
+        'Student_Name': [f"Student {i:07d}" for i in range(1, students + 1)],
+        'Roll_No': np.arange(100001, 100001 + students)
+    }
+    if sections:
+        labels = np.array([chr(ord('A') + i % 26) + ('' if i < 26 else str(i // 26)) for i in range(sections)])
+        data['Section'] = labels[rng.integers(0, sections, students)]
+
+    ability = rng.normal(65, 12, size=(students, 1))
+    difficulty = rng.normal(0, 6, size=(1, len(subject_cols)))
+    noise = rng.normal(0, 9, size=(students, len(subject_cols)))
+    marks = np.clip(np.rint(ability + difficulty + noise), MIN_MARKS, MAX_MARKS)
+
+    invalid_count = int(round(students * invalid_rate))
+    if invalid_count:
+        rows = rng.choice(students, size=invalid_count, replace=False)
+        cols = rng.integers(0, len(subject_cols), invalid_count)
+        missing = rng.random(invalid_count) < 0.5
+        marks[rows[missing], cols[missing]] = np.nan
+        marks[rows[~missing], cols[~missing]] = MAX_MARKS + rng.integers(1, 50, int((~missing).sum()))
+        data.update({col: marks[:, j] for j, col in enumerate(subject_cols)})
+    else:
+        data.update({col: marks[:, j].astype(np.int64) for j, col in enumerate(subject_cols)})
+
+    return pd.DataFrame(data)
+
+
+def write_workbook(df: pd.DataFrame, target: Union[str, BinaryIO]) -> None:
+    """
+    Write a cohort to xlsx with openpyxl's streaming writer
+
+    Args:
+        df: Cohort DataFrame
+        target: File path or writable binary buffer
+    """
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append([str(col) for col in df.columns])
+    columns = [df[col].to_numpy(dtype=object) for col in df.columns]
+    for row in zip(*columns):
+        ws.append([None if isinstance(value, float) and value != value else value for value in row])
+    wb.save(target)
@@ -0,0 +1,225 @@
+"""
+Student Table Query Module
+Server-side filtering, sorting and paging over processed results
+"""
+
+import math
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from src.result_query import ResultsQuery
+
+# Columns whose sort orders are computed up front
+DEFAULT_SORT_COLUMNS = ['Roll_No', 'Student_Name', 'Average', 'GPA', 'Grade']
+
+# Number of filter combinations whose masks are kept
+MAX_CACHED_MASKS = 32
+
+
+class TablePage:
+    """One page of a filtered and sorted student table"""
+
+    def __init__(self, rows: pd.DataFrame, total_rows: int, page: int, page_size: int):
+        """
+        Initialize table page
+
+        Args:
+            rows: Rows on this page
+            total_rows: Number of rows matching the filters
+            page: Page number (1-based)
+            page_size: Rows per page
+        """
+        self.rows = rows
+        self.total_rows = total_rows
+        self.page = page
+        self.page_size = page_size
+
+    @property
+    def page_count(self) -> int:
+        """Number of pages for the current filters"""
+        return max(1, math.ceil(self.total_rows / self.page_size))
+
+
+class StudentTable:
+    """Filter, sort and page a processed DataFrame without shipping it whole"""
+
+    def __init__(self, df: pd.DataFrame, sort_columns: List[str] = None,
+                 query_engine: Optional[ResultsQuery] = None):
+        """
+        Initialize student table and precompute sort orders
+
+        Args:
+            df: Processed DataFrame
+            sort_columns: Columns to precompute sort orders for
+            query_engine: Query engine over the same rows, for expression filters
+        """
+        self.df = df
+        self.query_engine = query_engine
+        self._orders = {}
+        self._masks = {}
+        self._masks_lock = threading.Lock()
+
+        names = df['Student_Name'].astype(str).str.lower()
+        rolls = df['Roll_No'].astype(str).str.lower()
+        self._search_text = (names + '\n' + rolls).to_numpy()
+
+        for col in sort_columns or DEFAULT_SORT_COLUMNS:
+            if col in df.columns:
+                self._sort_order(col)
+
+    def filter_mask(self, status: Optional[str] = None, grades: Optional[List[str]] = None,
+                    subject_ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+                    search: Optional[str] = None,
+                    expression: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        Build a boolean row mask for the given filters
+
+        Masks are cached per filter combination, so paging and re-sorting
+        do not re-evaluate the filters.
+
+        Args:
+            status: Keep only this status ('PASS' / 'FAIL'); None or 'All' keeps all
+            grades: Keep only these grades
+            subject_ranges: Mapping of column to (min, max) inclusive marks range
+            search: Case-insensitive substring of the student name or roll number
+            expression: Query expression, e.g. "Math < 40 and Average > 60"
+                (needs a query engine)
+
+        Returns:
+            Read-only boolean mask, or None when no filter is active
+
+        Raises:
+            QueryError: When the expression is invalid
+        """
+        search = (search or '').strip().lower()
+        expression = ' '.join((expression or '').split())
+        key = (
+            status if status and status != 'All' else None,
+            tuple(sorted(grades)) if grades else None,
+            tuple(sorted(subject_ranges.items())) if subject_ranges else None,
+            search or None,
+            expression or None
+        )
+        if key == (None, None, None, None, None):
+            return None
+        with self._masks_lock:
+            cached = self._masks.get(key)
+        if cached is not None:
+            return cached
+
+        mask = np.ones(len(self.df), dtype=bool)
+        if key[0]:
+            mask &= (self.df['Status'] == key[0]).to_numpy()
+        if key[1]:
+            mask &= self.df['Grade'].isin(key[1]).to_numpy()
+        if key[2]:
+            for col, (low, high) in key[2]:
+                values = self.df[col].to_numpy()
+                mask &= (values >= low) & (values <= high)
+        if key[3]:
+            mask &= pd.Series(self._search_text).str.contains(key[3], regex=False).to_numpy()
+        if key[4]:
+            if self.query_engine is None:
+                raise ValueError("Query expressions need a table built with a query engine")
+            mask &= self.query_engine.mask(key[4])
+
+        # Tables are shared by every session viewing the dataset
+        mask.flags.writeable = False
+        with self._masks_lock:
+            if key not in self._masks and len(self._masks) >= MAX_CACHED_MASKS:
+                self._masks.pop(next(iter(self._masks)))
+            self._masks[key] = mask
+        return mask
+
+    def query(self, mask: Optional[np.ndarray] = None, sort_by: Optional[str] = None,
+              ascending: bool = True, page: int = 1, page_size: int = 50) -> TablePage:
+        """
+        Return one page of rows
+
+        Args:
+            mask: Row mask from filter_mask (None keeps all rows)
+            sort_by: Column to sort by (None keeps file order)
+            ascending: Sort direction
+            page: Page number (1-based, clamped to the available pages)
+            page_size: Rows per page
+
+        Returns:
+            TablePage holding only the rows of the requested page
+        """
+        positions = self.positions(mask, sort_by, ascending)
+        total_rows = len(positions)
+        page_count = max(1, math.ceil(total_rows / page_size))
+        page = min(max(1, page), page_count)
+
+        start = (page - 1) * page_size
+        rows = self.df.iloc[positions[start:start + page_size]]
+        return TablePage(rows, total_rows, page, page_size)
+
+    def positions(self, mask: Optional[np.ndarray] = None, sort_by: Optional[str] = None,
+                  ascending: bool = True) -> np.ndarray:
+        """
+        Get row positions matching a mask in sorted order
+
+        Args:
+            mask: Row mask from filter_mask (None keeps all rows)
+            sort_by: Column to sort by (None keeps file order)
+            ascending: Sort direction
+
+        Returns:
+            Array of row positions
+        """
+        if sort_by is None:
+            order = np.arange(len(self.df))
+        else:
+            order = self._sort_order(sort_by, ascending)
+
+        if mask is not None:
+            order = order[mask[order]]
+        return order
+
+    def select(self, mask: Optional[np.ndarray] = None, sort_by: Optional[str] = None,
+               ascending: bool = True) -> pd.DataFrame:
+        """
+        Get all rows matching a mask, e.g. for export
+
+        Args:
+            mask: Row mask from filter_mask (None keeps all rows)
+            sort_by: Column to sort by (None keeps file order)
+            ascending: Sort direction
+
+        Returns:
+            DataFrame of matching rows
+        """
+        if mask is None and sort_by is None:
+            return self.df
+        return self.df.iloc[self.positions(mask, sort_by, ascending)]
+
+    def _sort_order(self, col: str, ascending: bool = True) -> np.ndarray:
+        """
+        Get (and cache) the stable sort order of a column
+
+        Equal values keep their file order in both directions.
+
+        Args:
+            col: Column name
+            ascending: Sort direction
+
+        Returns:
+            Array of row positions in sorted order
+        """
+        key = (col, ascending)
+        order = self._orders.get(key)
+        if order is None:
+            values = self.df[col].to_numpy()
+            if values.dtype == object or not np.issubdtype(values.dtype, np.number):
+                values = self.df[col].astype(str).to_numpy()
+            if ascending:
+                order = np.argsort(values, kind='stable')
+            else:
+                # Sorting the reversed column puts ties in reverse file order,
+                # which reading the result backwards turns around again
+                order = len(values) - 1 - np.argsort(values[::-1], kind='stable')[::-1]
+            self._orders[key] = order
+        return order
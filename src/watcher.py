@@ -0,0 +1,324 @@
+"""
+Watch Folder Module
+Polls a folder for new or changed workbooks, processes each changed one on a
+worker pool and keeps combined statistics up to date incrementally
+
+Usage:
+    python -m src.watcher data --output-dir outputs/watch --workers 4
+    python -m src.watcher data --once        # process pending changes and exit
+
+Only the local filesystem is used: the folder is polled (no network or
+notification service). A workbook is processed again only when its contents
+change, so touching or copying a file over itself does not regenerate its
+report. The manifest (``watch_state.json`` in the output directory) records
+every workbook's hash, outputs and statistics totals and the combined
+statistics, so restarts skip workbooks that were already processed.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.cli import process_file, to_jsonable
+from src.pipeline import content_hash
+from src.performance import setting
+
+MANIFEST_NAME = "watch_state.json"
+MANIFEST_VERSION = 1
+
+# Seconds between polls of the folder
+DEFAULT_INTERVAL = 2.0
+
+
+def is_workbook(name: str) -> bool:
+    """
+    Whether a directory entry is a workbook to watch
+
+    Excel's lock files (``~$name.xlsx``) and hidden files are ignored.
+
+    Args:
+        name: File name
+
+    Returns:
+        True for .xlsx workbooks
+    """
+    return name.lower().endswith('.xlsx') and not name.startswith(('~$', '.'))
+
+
+def _process(path: str, data: bytes, output_dir: str, charts: bool, report: bool,
+             export: bool) -> Dict:
+    """Process one workbook's contents (runs in a worker process)"""
+    try:
+        return process_file(path, output_dir, charts=charts, report=report, export=export,
+                            data=data, totals=True)
+    except Exception as e:
+        return {'file': path, 'status': 'error', 'message': f"Error processing file: {str(e)}",
+                'errors': [], 'statistics': {}, 'timings': {}, 'outputs': {}}
+
+
+class FolderWatcher:
+    """Detect changed workbooks in a folder and process them incrementally"""
+
+    def __init__(self, folder: str = "data", output_dir: str = "outputs/watch",
+                 workers: int = 2, interval: float = DEFAULT_INTERVAL, charts: bool = True,
+                 report: bool = True, export: bool = True, settle: bool = True,
+                 manifest_path: Optional[str] = None):
+        """
+        Initialize folder watcher
+
+        Args:
+            folder: Folder to watch for .xlsx workbooks
+            output_dir: Base output directory (a sub-directory per workbook is used)
+            workers: Number of worker processes
+            interval: Seconds between polls
+            charts: Whether to render charts
+            report: Whether to build PDF reports
+            export: Whether to write Excel exports
+            settle: Wait until a file's size and modification time are unchanged
+                for one poll before reading it, so half-copied files are skipped
+            manifest_path: State file (default: watch_state.json in output_dir)
+        """
+        self.folder = folder
+        self.output_dir = output_dir
+        self.workers = max(1, workers)
+        self.interval = interval
+        self.options = dict(output_dir=output_dir, charts=charts, report=report, export=export)
+        self.settle = settle
+        self.manifest_path = manifest_path or os.path.join(output_dir, MANIFEST_NAME)
+        self.manifest = self._load_manifest()
+        self._seen = {}
+        self._pending: Dict[str, Tuple[Future, str, List[int]]] = {}
+        self._executor = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _load_manifest(self) -> Dict:
+        """Load the state file, starting afresh when it is missing or unreadable"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'version': MANIFEST_VERSION, 'files': {}, 'combined': {}}
+
+    def _save_manifest(self) -> None:
+        """Write the state file atomically"""
+        temp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(to_jsonable(self.manifest), f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def scan(self) -> List[Tuple[str, str, bytes, List[int]]]:
+        """
+        Poll the folder once
+
+        Unchanged files are recognised by size and modification time without
+        being read; files whose stat changed are hashed and skipped when the
+        contents are the same. Workbooks that disappeared are dropped from
+        the combined statistics.
+
+        Returns:
+            List of (name, content hash, contents, stat) for workbooks to process
+        """
+        files = self.manifest['files']
+        found = {}
+        try:
+            entries = list(os.scandir(self.folder))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if entry.is_file() and is_workbook(entry.name):
+                stat = entry.stat()
+                found[entry.name] = [stat.st_size, stat.st_mtime_ns]
+
+        changed = []
+        touched = False
+        for name, stat in found.items():
+            known = files.get(name)
+            if name in self._pending or (known and known.get('stat') == stat):
+                continue
+            if self.settle and self._seen.get(name) != stat:
+                continue  # still being written, or first seen on this poll
+            try:
+                with open(os.path.join(self.folder, name), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            digest = content_hash(data)
+            if known and known.get('hash') == digest:
+                known['stat'] = stat
+                touched = True
+                continue
+            changed.append((name, digest, data, stat))
+
+        removed = [name for name in files if name not in found]
+        for name in removed:
+            del files[name]
+        if removed:
+            self._update_combined()
+        elif touched:
+            self._save_manifest()
+
+        self._seen = found
+        return changed
+
+    def poll(self) -> List[Dict]:
+        """
+        Collect finished jobs, then scan and submit changed workbooks
+
+        Returns:
+            Results of the jobs that finished since the previous poll
+        """
+        finished = self._collect(wait=False)
+        for name, digest, data, stat in self.scan():
+            path = os.path.join(self.folder, name)
+            future = self._pool().submit(_process, path, data, **self.options)
+            self._pending[name] = (future, digest, stat)
+        return finished
+
+    def run_once(self) -> List[Dict]:
+        """
+        Process every new or changed workbook and wait for the results
+
+        Returns:
+            Results of the processed workbooks
+        """
+        settle, self.settle = self.settle, False
+        try:
+            results = self.poll()
+            results += self._collect(wait=True)
+        finally:
+            self.settle = settle
+        return results
+
+    def run(self, stop: Optional[threading.Event] = None, on_result=None) -> None:
+        """
+        Poll until stopped
+
+        Args:
+            stop: Event that ends the loop when set (runs until interrupted otherwise)
+            on_result: Called with each finished job's result
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            for result in self.poll():
+                if on_result is not None:
+                    on_result(result)
+            stop.wait(self.interval)
+
+    @property
+    def combined(self) -> Dict:
+        """Combined statistics and subject averages over every processed workbook"""
+        return self.manifest['combined']
+
+    def close(self) -> None:
+        """Wait for running jobs, record them and stop the worker pool"""
+        self._collect(wait=True)
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """Start the worker pool on first use"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _collect(self, wait: bool) -> List[Dict]:
+        """
+        Record finished jobs in the manifest
+
+        Args:
+            wait: Block until every pending job has finished
+
+        Returns:
+            Results of the finished jobs
+        """
+        finished = []
+        for name, (future, digest, stat) in list(self._pending.items()):
+            if not wait and not future.done():
+                continue
+            del self._pending[name]
+            result = future.result()
+            finished.append(result)
+            if not os.path.exists(os.path.join(self.folder, name)):
+                continue  # deleted while it was being processed
+            self.manifest['files'][name] = {
+                'hash': digest,
+                'stat': stat,
+                'status': result['status'],
+                'message': result['message'],
+                'errors': result['errors'],
+                'statistics': result['statistics'],
+                'totals': result.get('totals'),
+                'outputs': result['outputs'],
+                'processed_at': datetime.now().isoformat(timespec='seconds')
+            }
+
+        if finished:
+            self._update_combined()
+        return finished
+
+    def _update_combined(self) -> None:
+        """Recombine statistics from every workbook's totals and save the manifest"""
+        from src.analyzer import combine_statistics, combine_subject_averages
+
+        totals = [entry['totals'] for entry in self.manifest['files'].values()
+                  if entry['status'] == 'ok' and entry.get('totals')]
+        self.manifest['combined'] = {
+            'workbooks': len(totals),
+            'statistics': combine_statistics(totals),
+            'subject_averages': combine_subject_averages(totals),
+            'updated_at': datetime.now().isoformat(timespec='seconds')
+        }
+        self._save_manifest()
+
+
+def main(argv=None) -> int:
+    """Parse arguments and watch the folder until interrupted"""
+    parser = argparse.ArgumentParser(prog="python -m src.watcher",
+                                     description="Process workbooks dropped into a folder")
+    parser.add_argument('folder', nargs='?', default="data", help="folder to watch (default: data)")
+    parser.add_argument('--output-dir', default="outputs/watch",
+                        help="directory for outputs and the state file (default: outputs/watch)")
+    parser.add_argument('--workers', type=int, default=setting('workers'),
+                        help="number of worker processes (default: available CPUs, or the tuned setting)")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f"seconds between polls (default: {DEFAULT_INTERVAL})")
+    parser.add_argument('--once', action='store_true', help="process pending changes and exit")
+    parser.add_argument('--no-charts', action='store_true', help="skip chart rendering")
+    parser.add_argument('--no-report', action='store_true', help="skip PDF reports")
+    parser.add_argument('--no-export', action='store_true', help="skip Excel exports")
+    args = parser.parse_args(argv)
+
+    watcher = FolderWatcher(args.folder, args.output_dir, workers=args.workers, interval=args.interval,
+                            charts=not args.no_charts, report=not args.no_report,
+                            export=not args.no_export)
+
+    def report_result(result):
+        print(json.dumps({'file': result['file'], 'status': result['status'],
+                          'message': result['message'], 'outputs': result['outputs'],
+                          'combined': watcher.combined.get('statistics', {})}), flush=True)
+
+    try:
+        if args.once:
+            for result in watcher.run_once():
+                report_result(result)
+        else:
+            print(f"Watching {os.path.abspath(args.folder)} (Ctrl+C to stop)", file=sys.stderr)
+            watcher.run(on_result=report_result)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
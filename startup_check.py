@@ -1,10 +1,38 @@
 """
 Startup verification script for Exam Result System
-Ensures all dependencies and modules are properly installed
+Ensures all dependencies and modules are properly installed, checks the
+host's CPU and memory limits, and with --probe measures this host and
+recommends worker counts, chunk sizes and cache budgets
+
+Usage:
+    python startup_check.py [--probe [--save]] [--expected-students 100000]
+                            [--expected-sessions 4]
 """
 
+import argparse
+import math
 import sys
 import os
+import tempfile
+import time
+from datetime import datetime
+
+# Resident memory of an app process with every module loaded and no dataset
+# (measured with benchmarks/load_test.py)
+APP_BASE_MB = 300
+
+# Peak memory while loading a workbook, as a multiple of the processed dataset
+LOAD_PEAK_FACTOR = 3
+
+# Rows converted per export chunk are sized to about this much memory
+EXPORT_CHUNK_TARGET_MB = 16
+
+# Grading the expected load should take at most this long
+MAX_GRADING_SECONDS = 30
+
+# Load assumed when none was given or saved before
+DEFAULT_EXPECTED_STUDENTS = 100000
+DEFAULT_EXPECTED_SESSIONS = 4
 
 def check_dependencies():
     """Check if all required packages are installed"""
@@ -141,8 +169,291 @@ def check_files():
     return True
 
 
-def main():
+def _mb(value):
+    """Format a byte count in MB (or 'no limit')"""
+    return "no limit" if value is None else f"{value / 1024 ** 2:,.0f} MB"
+
+
+def check_host():
+    """Check CPU and memory limits against the performance settings in effect"""
+    print("\n" + "=" * 60)
+    print("🖥️  HOST CHECK")
+    print("=" * 60)
+    
+    from src.performance import get_settings, host_limits, settings_path
+    
+    limits = host_limits()
+    settings = get_settings()
+    path = settings_path()
+    
+    quota = f", quota {limits['cpu_quota']:g}" if limits['cpu_quota'] is not None else ""
+    print(f"✓ CPUs: {limits['available_cpus']} available ({limits['cpu_count']} in host{quota})")
+    print(f"✓ Memory: limit {_mb(limits['memory_limit_bytes'])}, host {_mb(limits['physical_memory_bytes'])}")
+    print(f"✓ Settings: {path if os.path.exists(path) else 'built-in defaults (run --probe --save to tune)'}")
+    for name, value in settings.items():
+        print(f"    {name:18} = {value if value is not None else 'auto'}")
+    
+    warnings = host_warnings(limits, settings)
+    for warning in warnings:
+        print(f"⚠️  {warning}")
+    if not warnings:
+        print("\n✓ Host limits fit the configured load!")
+    return True
+
+
+def host_warnings(limits, settings, probe=None, expected_students=None, expected_sessions=None):
+    """
+    List the ways the host is too small for the configured load
+
+    Args:
+        limits: host_limits() of this host
+        settings: Performance settings to check
+        probe: Measurements from probe_performance() (enables the
+            throughput and memory projections)
+        expected_students: Students in the largest expected cohort
+        expected_sessions: Cohorts processed or held at the same time
+
+    Returns:
+        List of warning messages
+    """
+    from src.data_processor import FAST_READER_ENV
+    
+    warnings = []
+    cpus = limits['available_cpus']
+    memory = limits['memory_limit_bytes'] or limits['physical_memory_bytes']
+    memory_mb = memory / 1024 ** 2 if memory else None
+    
+    if cpus == 1:
+        warnings.append("Only 1 CPU is available: batch workers, parallel workbook reading and "
+                        "concurrent report builds will queue behind each other")
+    for name in ('workers', 'xlsx_workers'):
+        if settings.get(name) and settings[name] > cpus:
+            warnings.append(f"{name} is {settings[name]} but only {cpus} CPU(s) are available")
+    env = os.environ.get(FAST_READER_ENV, '').lower()
+    fast_reader = env not in ('0', 'false', 'no') if env else bool(settings.get('fast_xlsx'))
+    processes = (settings.get('workers') or cpus) * (settings.get('xlsx_workers') or cpus)
+    if fast_reader and processes > cpus:
+        warnings.append(f"With the fast workbook reader on, batch runs can start workers x xlsx_workers = "
+                        f"{processes} processes on {cpus} CPU(s); lower xlsx_workers to "
+                        f"{max(1, cpus // (settings.get('workers') or cpus))}")
+    if memory_mb and APP_BASE_MB + settings['store_budget_mb'] > memory_mb:
+        warnings.append(f"store_budget_mb ({settings['store_budget_mb']:,} MB) plus the app itself "
+                        f"(~{APP_BASE_MB} MB) exceeds the {memory_mb:,.0f} MB memory limit")
+    
+    if probe:
+        dataset_mb = probe['bytes_per_student'] * expected_students / 1024 ** 2
+        required_mb = APP_BASE_MB + dataset_mb * (expected_sessions - 1) + dataset_mb * LOAD_PEAK_FACTOR
+        if memory_mb and required_mb > memory_mb:
+            warnings.append(f"Memory limit {memory_mb:,.0f} MB is below the ~{required_mb:,.0f} MB needed for "
+                            f"{expected_sessions} concurrent cohorts of {expected_students:,} students")
+        grading_s = expected_students / probe['grading_rows_per_s'] * math.ceil(expected_sessions / cpus)
+        if grading_s > MAX_GRADING_SECONDS:
+            warnings.append(f"Grading {expected_sessions} concurrent cohorts of {expected_students:,} students "
+                            f"would take ~{grading_s:,.0f}s on {cpus} CPU(s) (target {MAX_GRADING_SECONDS}s)")
+    return warnings
+
+
+def probe_performance(students):
+    """
+    Measure import times, grading throughput, workbook reading, chart
+    rendering and PDF building on this host
+    
+    Args:
+        students: Size of the synthetic cohort used for the measurements
+    
+    Returns:
+        Dictionary of measurements
+    """
+    print("\n" + "=" * 60)
+    print("⏱️  PERFORMANCE PROBE")
+    print("=" * 60)
+    
+    import io
+    import tracemalloc
+    import pandas as pd
+    from benchmarks.startup_benchmark import benchmark_imports
+    from src.synthetic import generate_cohort, write_workbook
+    from src.data_processor import DataProcessor
+    from src.pipeline import PipelineResult
+    from openpyxl import Workbook
+    from src.excel_exporter import ExcelExporter
+    from src.fast_xlsx import read_sheet
+    
+    probe = {'students': students}
+    
+    imports = benchmark_imports(repeat=1)
+    probe['import_ms'] = {module: timing['median_ms'] for module, timing in imports.items()}
+    for module, ms in probe['import_ms'].items():
+        print(f"✓ import {module:22} {ms:8,.0f} ms")
+    
+    cohort = generate_cohort(students=students, subjects=5, sections=4, seed=42)
+    processor = DataProcessor(fast_reader=False)
+    processor.df = cohort
+    start = time.perf_counter()
+    processor.validate_data()
+    processor.calculate_grades()
+    elapsed = time.perf_counter() - start
+    df = processor.get_processed_data()
+    probe['grading_rows_per_s'] = round(students / elapsed)
+    # Counted the way the dataset store budgets a cached result
+    result = PipelineResult('probe', processor, True, '', True, [], cohort)
+    probe['bytes_per_student'] = round(result.memory_bytes() / students)
+    
+    # Peak memory of exporting one chunk, per row
+    sample_rows = min(students, 2000)
+    sample = df.head(sample_rows)
+    wb = Workbook(write_only=True)
+    tracemalloc.start()
+    ExcelExporter(chunk_size=sample_rows).write_sheet(wb, 'Probe', sample)
+    wb.save(io.BytesIO())
+    probe['export_row_bytes'] = round(tracemalloc.get_traced_memory()[1] / sample_rows)
+    tracemalloc.stop()
+    print(f"✓ grading                {probe['grading_rows_per_s']:12,} students/s")
+    print(f"✓ memory per student     {probe['bytes_per_student']:12,} bytes")
+    
+    buffer = io.BytesIO()
+    write_workbook(cohort.head(min(students, 20000)), buffer)
+    data = buffer.getvalue()
+    start = time.perf_counter()
+    pd.read_excel(io.BytesIO(data))
+    pandas_s = time.perf_counter() - start
+    start = time.perf_counter()
+    read_sheet(data, workers=1)
+    fast_s = time.perf_counter() - start
+    probe['xlsx_mb_per_s'] = {'pandas': round(len(data) / 1024 ** 2 / pandas_s, 2),
+                              'fast_xlsx': round(len(data) / 1024 ** 2 / fast_s, 2)}
+    probe['fast_xlsx_speedup'] = round(pandas_s / fast_s, 2)
+    print(f"✓ workbook reading       {probe['xlsx_mb_per_s']['pandas']:9.2f} MB/s (pandas), "
+          f"{probe['xlsx_mb_per_s']['fast_xlsx']:.2f} MB/s (fast reader, in-process)")
+    
+    from src.analyzer import Analyzer
+    from src.report_generator import PDFReportGenerator
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        analyzer = Analyzer(df, output_dir=os.path.join(work_dir, 'charts'))
+        start = time.perf_counter()
+        charts = analyzer.generate_all_charts()
+        probe['charts_s'] = round(time.perf_counter() - start, 3)
+        print(f"✓ chart rendering        {probe['charts_s']:12.2f} s")
+        
+        pdf_gen = PDFReportGenerator(output_dir=os.path.join(work_dir, 'reports'))
+        start = time.perf_counter()
+        pdf_gen.generate_report(df, analyzer.get_statistics(), analyzer.get_toppers(top_n=5),
+                                analyzer.get_weak_subjects(), analyzer.get_strong_subjects(), charts)
+        probe['pdf_s'] = round(time.perf_counter() - start, 3)
+        print(f"✓ PDF report             {probe['pdf_s']:12.2f} s")
+    
+    return probe
+
+
+def recommend_settings(limits, probe, expected_students, expected_sessions, current):
+    """
+    Derive performance settings from the host limits and measurements
+    
+    The fast workbook reader starts worker processes from inside the
+    server, so it is never switched on here; its current setting is kept.
+    
+    Args:
+        limits: host_limits() of this host
+        probe: Measurements from probe_performance()
+        expected_students: Students in the largest expected cohort
+        expected_sessions: Cohorts processed or held at the same time
+        current: Performance settings in effect
+    
+    Returns:
+        Dictionary of performance settings
+    """
+    cpus = limits['available_cpus']
+    memory = limits['memory_limit_bytes'] or limits['physical_memory_bytes']
+    
+    # Keep every expected cohort resident, within half of what the app leaves free
+    dataset_mb = probe['bytes_per_student'] * expected_students / 1024 ** 2
+    budget_mb = dataset_mb * expected_sessions * 1.25
+    if memory:
+        budget_mb = min(budget_mb, (memory / 1024 ** 2 - APP_BASE_MB) / 2)
+    budget_mb = max(128, int(budget_mb // 64 * 64))
+    
+    chunk_rows = EXPORT_CHUNK_TARGET_MB * 1024 ** 2 // max(1, probe['export_row_bytes'])
+    chunk_rows = int(min(100000, max(1000, chunk_rows // 1000 * 1000)))
+    
+    # Every batch worker reads its workbooks with xlsx_workers processes; keep the total within the CPUs
+    workers = cpus
+    xlsx_workers = max(1, cpus // workers)
+    
+    return {
+        'workers': workers,
+        'xlsx_workers': xlsx_workers,
+        'export_chunk_rows': chunk_rows,
+        'store_budget_mb': budget_mb,
+        'fast_xlsx': bool(current['fast_xlsx']),
+    }
+
+
+def run_probe(args):
+    """Probe the host, print the recommended settings and optionally save them"""
+    from src.data_processor import FAST_READER_ENV
+    from src.performance import get_settings, host_limits, save_settings, settings_path
+    
+    limits = host_limits()
+    probe = probe_performance(args.students)
+    current = get_settings()
+    settings = recommend_settings(limits, probe, args.expected_students, args.expected_sessions, current)
+    
+    print("\n" + "=" * 60)
+    print("🎛️  RECOMMENDED SETTINGS")
+    print("=" * 60)
+    for name, value in settings.items():
+        note = "" if current.get(name) == value else f"  (now {current.get(name) if current.get(name) is not None else 'auto'})"
+        print(f"  {name:18} = {value}{note}")
+    print(f"  for {args.expected_sessions} concurrent cohorts of {args.expected_students:,} students")
+    if not settings['fast_xlsx'] and probe['fast_xlsx_speedup'] >= 1.2:
+        print(f"  The fast workbook reader was {probe['fast_xlsx_speedup']:.1f}x faster than pandas here; "
+              f"it stays off unless you opt in ({FAST_READER_ENV}=1, or \"fast_xlsx\": true in the settings file)")
+    
+    warnings = host_warnings(limits, settings, probe, args.expected_students, args.expected_sessions)
+    for warning in warnings:
+        print(f"⚠️  {warning}")
+    
+    if args.save:
+        path = save_settings(settings, extra={
+            'expected_load': {'students': args.expected_students, 'sessions': args.expected_sessions},
+            'probe': {'measured_at': datetime.now().isoformat(timespec='seconds'),
+                      'host': limits, **probe},
+        })
+        print(f"\n✓ Saved to {path}")
+    else:
+        print(f"\nRun with --save to write these settings to {settings_path()}")
+    return True
+
+
+def _saved_load():
+    """Expected load saved by the last --probe --save, if any"""
+    import json
+    from src.performance import settings_path
+    
+    try:
+        with open(settings_path()) as f:
+            return json.load(f).get('expected_load', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def main(argv=None):
     """Run all checks"""
+    saved = _saved_load()
+    parser = argparse.ArgumentParser(description="Verify the installation and tune performance settings")
+    parser.add_argument('--probe', action='store_true',
+                        help="measure this host and recommend worker counts, chunk sizes and cache budgets")
+    parser.add_argument('--save', action='store_true', help="with --probe, save the recommended settings")
+    parser.add_argument('--students', type=int, default=20000, help="cohort size used by the probe")
+    parser.add_argument('--expected-students', type=int,
+                        default=saved.get('students', DEFAULT_EXPECTED_STUDENTS),
+                        help="students in the largest cohort you expect")
+    parser.add_argument('--expected-sessions', type=int,
+                        default=saved.get('sessions', DEFAULT_EXPECTED_SESSIONS),
+                        help="cohorts processed or kept open at the same time")
+    args = parser.parse_args(argv)
+    
     print("\n")
     print("╔════════════════════════════════════════════════════════════╗")
     print("║  EXAM RESULT SYSTEM - STARTUP VERIFICATION                ║")
@@ -153,8 +464,11 @@ def main():
         'Dependencies': check_dependencies(),
         'Modules': check_modules(),
         'Directories': check_directories(),
-        'Files': check_files()
+        'Files': check_files(),
+        'Host': check_host()
     }
+    if args.probe or args.save:
+        results['Performance Probe'] = run_probe(args)
     
     print("\n" + "=" * 60)
     print("📊 VERIFICATION SUMMARY")
@@ -176,7 +490,7 @@ def main():
         print("✗ SOME CHECKS FAILED - Please fix errors above")
         print("\nTroubleshooting:")
         print("1. Install dependencies: pip install -r requirements.txt")
-        print("2. Verify Python version: python --version (3.7+)")
+        print("2. Verify Python version: python --version (3.11+)")
         print("3. Check file permissions")
         print("4. Ensure all files are in correct locations")
     print("=" * 60)